@@ -1,16 +1,11 @@
 import os
+import asyncio
 import logging
 import re
 import time
 import sys
-from pyrogram import Client, filters
+from pyrogram import Client, filters, idle
 from pyrogram.errors import FloodWait
-from .services.groq_service import GroqService
-from .services.news_service import NewsService
-from .services.web_service import WebService
-from .services.whisper_service import WhisperService
-from .services.downloader_service import DownloaderService
-from pymongo import MongoClient
 from datetime import datetime, timedelta, timezone
 import schedule
 import threading
@@ -28,14 +23,12 @@ from .config.settings import (
 )
 from .handlers.command_handlers import register_command_handlers
 from .handlers.media_handlers import register_media_handlers
-from .handlers.ai_handlers import register_ai_handlers
-from .services.currency_service import CurrencyService
 from .handlers.message_handlers import MessageHandlers
 from .handlers.stats_handler import StatsHandler
-from .services.mongodb_service import MongoDBService
-from .services.stats_service import StatsService
 from .handlers.conversion_handlers import register_conversion_handlers
-from .services.crypto_price_service import CryptoPriceService
+from .services.service_container import ServiceContainer, set_services
+from .services.crypto_price_service import HOT_TICKER_POLL_INTERVAL
+from .services.currency_service import FX_REFRESH_INTERVAL
 
 # Add custom filters to exclude sensitive information
 class SensitiveDataFilter(logging.Filter):
@@ -213,34 +206,16 @@ class TelegramBot:
             "ALLOWED_CHAT_ID": allowed_chat_id,
             "MONGODB_URI": MONGODB_URI,
             "WHISPER_MODEL": WHISPER_MODEL,
-            "WHISPER_LANGUAGE": WHISPER_LANGUAGE
+            "WHISPER_LANGUAGE": WHISPER_LANGUAGE,
+            "WHISPER_WORKERS": int(os.getenv("WHISPER_WORKERS", "1"))
         }
 
-        # Initialize services with secret file paths instead of environment variables
-        time.sleep(2)
-        self.mongodb_service = MongoDBService(self.settings["MONGODB_URI"])
-        time.sleep(1)
-        self.stats_service = StatsService(self.mongodb_service)
-        time.sleep(1)
-        self.groq_service = GroqService('/run/secrets/groq_api_key')
-        time.sleep(1)
-        self.news_service = NewsService('/run/secrets/news_api_key')
-        time.sleep(1)
-        self.web_service = WebService()
-        time.sleep(1)
-        self.whisper_service = WhisperService(model=self.settings["WHISPER_MODEL"])
-        time.sleep(1)
-        self.currency_service = CurrencyService('/run/secrets/fxrates_api_key')
-        time.sleep(1)
-        self.crypto_service = CryptoPriceService('/run/secrets/coinmarketcap_key')
-        time.sleep(1)
-        self.downloader_service = DownloaderService()
-        time.sleep(1)
-
-        # Initialize MongoDB connection
-        self.db_client = MongoClient(self.settings["MONGODB_URI"])
-        self.db = self.db_client['telegram_bot']
-        self.message_collection = self.db['messages']
+        self.started_at = time.perf_counter()
+
+        # Construct every service and client exactly once and share them
+        self.services = ServiceContainer(self.settings)
+        set_services(self.services)
+        self.message_collection = self.services.mongodb_service.messages
 
         # Initialize Pyrogram client
         self.app = Client(
@@ -253,6 +228,7 @@ class TelegramBot:
         # Register handlers and initialize other components
         self._register_handlers()
         self.scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
+        self._schedule_jobs()
 
         # Update audio directory path
         self.audio_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "src", "audio")
@@ -261,8 +237,8 @@ class TelegramBot:
 
     def _register_handlers(self):
         message_handlers = MessageHandlers(
-            mongodb_service=self.mongodb_service,
-            whisper_service=self.whisper_service
+            mongodb_service=self.services.mongodb_service,
+            whisper_service=self.services.whisper_service
         )
 
 
@@ -276,17 +252,12 @@ class TelegramBot:
             await message_handlers.handle_text(client, message)
 
         # Now register command handlers
-        register_command_handlers(
-            self.app,
-            mongodb_service=self.mongodb_service,
-            stats_service=self.stats_service
-        )
+        register_command_handlers(self.app, self.services)
 
         # Register other handlers
 
-        register_media_handlers(self.app)
-        register_ai_handlers(self.app)
-        register_conversion_handlers(self.app, self.currency_service)
+        register_media_handlers(self.app, self.services.downloader_service)
+        register_conversion_handlers(self.app, self.services.currency_service)
 
         # Keep existing sticker/voice/photo handlers
         @self.app.on_message(filters.sticker & filters.chat(self.settings["ALLOWED_CHAT_ID"]))
@@ -328,19 +299,65 @@ class TelegramBot:
         )
         return [msg['message_text'] for msg in messages]
 
+    def _schedule_jobs(self):
+        """Register periodic background jobs"""
+        # Summarize the hour that just closed (and yesterday's rollup) shortly after each hour
+        schedule.every().hour.at(":02").do(
+            self._run_async_job, self.services.summary_store.build_closed_windows
+        )
+        # Fold recent messages of active users into their /me and /you profiles
+        schedule.every().hour.at(":20").do(
+            self._run_async_job, self.services.persona_store.refresh_active_users
+        )
+        # Keep quotes of frequently requested tickers fresh for /p
+        schedule.every(HOT_TICKER_POLL_INTERVAL).seconds.do(
+            self._run_async_job, self.services.crypto_service.refresh_hot_tickers
+        )
+        # Conversions are computed locally from this table
+        schedule.every(FX_REFRESH_INTERVAL).seconds.do(
+            self._run_async_job, self.services.currency_service.refresh_rates
+        )
+
+    def _run_async_job(self, job):
+        """Run a coroutine job on the bot's event loop from the scheduler thread"""
+        if not self.app.is_connected:
+            return
+        future = asyncio.run_coroutine_threadsafe(job(), self.app.loop)
+
+        def log_failure(f):
+            # exception() raises CancelledError for jobs cancelled at shutdown
+            if not f.cancelled() and f.exception():
+                logger.error(f"Background job {job.__name__} failed: {f.exception()}")
+
+        future.add_done_callback(log_failure)
+
     def _run_scheduler(self):
         """Run the scheduler for periodic tasks"""
         while True:
             schedule.run_pending()
             sleep(1)
 
+    async def _main(self):
+        """Connect, start background model loading, then idle until stopped"""
+        await self.app.start()
+        logger.info(f"Bot online after {time.perf_counter() - self.started_at:.2f}s")
+        self.services.whisper_service.start_background_load()
+        # Backfill any hourly summaries missed while the bot was offline
+        asyncio.ensure_future(self.services.summary_store.build_closed_windows())
+        try:
+            await idle()
+        finally:
+            await self.app.stop()
+            await self.services.close()
+
     def run(self):
         """Start the bot"""
         logger.info("Starting bot...")
         self.scheduler_thread.start()
         while True:
             try:
-                self.app.run()
+                self.app.run(self._main())
+                break
             except FloodWait as e:
                 logger.warning(f"Hit flood wait limit. Sleeping for {e.value} seconds")
                 sleep(e.value)
@@ -1,4 +1,3 @@
-import os
 from datetime import datetime, timedelta, timezone
 from PIL import Image
 import requests
@@ -7,17 +6,14 @@ import re
 from pyrogram import Client, filters
 from pyrogram.enums import ParseMode
 from ..config.settings import ALLOWED_CHAT_ID, ADMIN_USER_IDS
-from ..services.news_service import NewsService
-from ..services.groq_service import GroqService, get_messages_last_24_hours
-from ..services.currency_service import CurrencyService
-from ..services.mongodb_service import MongoDBService
-from ..services.stats_service import StatsService
-from ..services.text_to_speech_service import TextToSpeechService
-from ..services.chart_service import ChartService
+from ..services.service_container import ServiceContainer
+from ..services.summary_store import MAX_SUMMARY_RANGE
+from ..services.groq_service import GREENTEXT_CONTEXT_TOKENS
+from ..services.crypto_price_service import MAX_PRICE_TICKERS
+from ..services.currency_service import format_rate_age
 from ..models.group_model import GroupModel
 from ..utils.decorators import group_only
-from ..services.crypto_price_service import CryptoPriceService
-from ..services.weather_service import WeatherService
+from ..utils.stream_utils import stream_to_message
 import logging
 
 logger = logging.getLogger(__name__)
@@ -32,15 +28,32 @@ logger = logging.getLogger(__name__)
 
     # IF YOU ADD NEW HANDLERS PLEASE UPDATE "if group_name in" LINE WITH THE NEW COMMAND.
 
-def register_command_handlers(app: Client, mongodb_service: MongoDBService, stats_service: StatsService):
-    # Initialize services with file paths
-    news_service = NewsService('/run/secrets/news_api_key')
-    groq_service = GroqService('/run/secrets/groq_api_key')
-    currency_service = CurrencyService('/run/secrets/fxrates_api_key')
-    text_to_speech_service = TextToSpeechService('/run/secrets/elevenlabs_api_key')
-    weather_service = WeatherService('/run/secrets/openweather_api_key')
-    crypto_service = CryptoPriceService('/run/secrets/coinmarketcap_key')
-    chart_service = ChartService()
+def _format_metrics(stats, indent=0):
+    """Render nested service metrics as an indented plain-text list"""
+    lines = []
+    pad = "  " * indent
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            lines.append(f"{pad}{key}:")
+            lines.extend(_format_metrics(value, indent + 1))
+        elif isinstance(value, float):
+            lines.append(f"{pad}{key}: {value:.3f}")
+        else:
+            lines.append(f"{pad}{key}: {value}")
+    return lines
+
+def register_command_handlers(app: Client, services: ServiceContainer):
+    # Shared service instances owned by the container
+    mongodb_service = services.mongodb_service
+    stats_service = services.stats_service
+    news_service = services.news_service
+    groq_service = services.groq_service
+    summary_store = services.summary_store
+    persona_store = services.persona_store
+    currency_service = services.currency_service
+    text_to_speech_service = services.text_to_speech_service
+    crypto_service = services.crypto_service
+    chart_service = services.chart_service
 
     # Initialize GroupModel
     group_model = GroupModel(mongodb_service.get_collection('groups'))
@@ -53,7 +66,7 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
             await message.reply_text("Please provide a search term.\nUsage: /news search_term")
             return
         
-        news_result = news_service.fetch_news(user_query)
+        news_result = await news_service.fetch_news(user_query)
         await message.reply_text(news_result, disable_web_page_preview=False)
 
     @app.on_message(filters.command("wiki") & filters.chat(ALLOWED_CHAT_ID))
@@ -67,24 +80,13 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
         waiting_message = await message.reply_text("🔍 Searching Wikipedia...")
         
         try:
-            response = await groq_service.generate_ai_response(
-                prompt=query,
-                force_wiki=True
+            # Stream the answer into the placeholder as it is generated
+            await stream_to_message(
+                waiting_message,
+                groq_service.stream_ai_response(prompt=query, force_wiki=True),
+                empty_text="❌ Received empty response. Please try again."
             )
             
-            # Add validation for empty response
-            if not response or len(response.strip()) == 0:
-                await waiting_message.delete()
-                await message.reply_text("❌ Received empty response. Please try again.")
-                return
-                
-            # Add length check and truncate if necessary
-            if len(response) > 4096:  # Telegram's message length limit
-                response = response[:4093] + "..."
-                
-            await waiting_message.delete()
-            await message.reply_text(response)
-            
         except Exception as e:
             logger.error(f"Error in wiki command: {e}")
             await waiting_message.delete()
@@ -93,34 +95,36 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
     @app.on_message(filters.command("summary") & filters.chat(ALLOWED_CHAT_ID))
     async def handle_summary(client, message):
         try:
+            # Parse optional range argument, e.g. /summary 12h or /summary 7d
+            span = timedelta(hours=24)
+            time_range = "the last 24 hours"
+            if len(message.command) > 1:
+                match = re.fullmatch(r'(\d{1,3})([hd])', message.command[1].lower())
+                if not match or int(match.group(1)) == 0:
+                    await message.reply_text("Usage: /summary [range]\nExamples: /summary, /summary 12h, /summary 7d")
+                    return
+                amount, unit = int(match.group(1)), match.group(2)
+                span = timedelta(hours=amount) if unit == 'h' else timedelta(days=amount)
+                span = min(span, MAX_SUMMARY_RANGE)
+                hours = int(span.total_seconds() // 3600)
+                time_range = f"the last {hours // 24} days" if hours % 24 == 0 and hours > 24 else f"the last {hours} hours"
+
             # Send initial status
             status_message = await message.reply_text("Generating summary, please wait...")
             
-            # Get messages from the last 24 hours
-            cutoff_time = datetime.now(timezone.utc) - timedelta(hours=24)
-            
-            # Modified query to only filter by timestamp
-            messages = mongodb_service.messages.find(
-                {'timestamp': {'$gte': cutoff_time}},
-                {'message_text': 1}
-            ).sort('timestamp', -1).limit(1000)  # Limit to 1000 most recent messages
-            
-            message_texts = [msg['message_text'] for msg in messages if msg.get('message_text')]
+            # Cached hourly/daily window summaries plus the currently open hour
+            summary = await summary_store.summarize_range(span)
             
-            if not message_texts:
+            if not summary:
                 await status_message.edit_text("No messages found to summarize.")
                 return
-                
-            groq_service = GroqService('/run/secrets/groq_api_key')
-            summary = await groq_service.generate_summary(
-                message_texts,
-                time_range="the last 24 hours"
-            )
+
+            summary = groq_service.format_summary(summary)
             
             if isinstance(summary, list):
                 # Handle multi-part summary
                 for i, part in enumerate(summary, 1):
-                    await message.reply_text(f"Summary Part {i}/{len(summary)}:\n\n{part}")
+                    await message.reply_text(f"Summary of {time_range} - Part {i}/{len(summary)}:\n\n{part}")
                 await status_message.delete()
             else:
                 await status_message.edit_text(summary)
@@ -157,32 +161,19 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
             full_prompt = f"{context}Question: {query}" if context else query
 
             # Check if this is a reply to a message with an image
-            image_path = None
+            image = None
             if message.reply_to_message and message.reply_to_message.photo:
-                # Download the image
-                photo = message.reply_to_message.photo.file_id
-                download_path = os.path.join("./downloads", f"{photo}.jpg")
-                await client.download_media(message.reply_to_message, download_path)
-                image_path = download_path
+                # Fetch the photo into memory; nothing is written to disk
+                buffer = await client.download_media(message.reply_to_message, in_memory=True)
+                image = buffer.getvalue()
 
             waiting_message = await message.reply_text("🤔 Thinking...")
             
-            # Generate response with context and/or image
-            response = await groq_service.generate_ai_response(full_prompt, image_path)
-            
-            # Clean up downloaded image
-            if image_path and os.path.exists(image_path):
-                os.remove(image_path)
-
-            await waiting_message.delete()
-
-            # Handle potentially split responses
-            if isinstance(response, list):
-                for i, part in enumerate(response, 1):
-                    part_text = f"Part {i}/{len(response)}:\n\n{part}" if len(response) > 1 else part
-                    await message.reply_text(part_text)
-            else:
-                await message.reply_text(response)
+            # Stream the response with context and/or image into the placeholder
+            await stream_to_message(
+                waiting_message,
+                groq_service.stream_ai_response(full_prompt, image)
+            )
             
         except Exception as e:
             logger.error(f"Error in ask command: {e}")
@@ -201,9 +192,10 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
                 await message.reply_text("Error: Unexpected API response format")
                 return
                 
-            response = "💱 Latest Exchange Rates (USD base):\n\n"
+            response = f"💱 Latest Exchange Rates ({rates['base']} base):\n\n"
             for currency, rate in rates['rates'].items():
                 response += f"{currency}: {rate:.4f}\n"
+            response += f"\n🕒 Rates updated {format_rate_age(rates['fetched_at'])}"
             await message.reply_text(response)
         except Exception as e:
             logger.error(f"Error in latest_command: {str(e)}")
@@ -226,12 +218,13 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
             from_currency = args[1].upper()
             to_currency = args[3].upper()
             
-            waiting_msg = await message.reply_text("💱 Converting...")
+            # Computed from the local rate table, no API call on the request path
             result = await currency_service.convert_currency(from_currency, to_currency, amount)
-            await waiting_msg.delete()
             
             response = f"💱 Currency Conversion:\n\n"
             response += f"{amount:,.2f} {from_currency} = {result['result']:,.2f} {to_currency}\n"
+            response += f"1 {from_currency} = {result['rate']:,.4f} {to_currency}\n"
+            response += f"\n🕒 Rates updated {format_rate_age(result['fetched_at'])}"
             await message.reply_text(response)
                 
         except Exception as e:
@@ -279,19 +272,12 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
                 await message.reply_text("Please provide text after the /audio command or reply to a message with text.")
                 return
                 
-            # Generate a unique filename
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            audio_path = os.path.join("src", "audio", f"speech_{timestamp}.mp3")
+            # Synthesized (or cached) audio is uploaded straight from memory
+            audio = io.BytesIO(await text_to_speech_service.generate_speech(text))
+            audio.name = "speech.mp3"
             
-            # Generate the audio file
-            await text_to_speech_service.generate_speech(text, audio_path)
-            
-            # Send the audio file as a voice message
-            await message.reply_voice(audio_path)
-            
-            # Delete the audio file after sending
-            if os.path.exists(audio_path):
-                os.remove(audio_path)
+            # Send the audio as a voice message
+            await message.reply_voice(audio)
                 
         except Exception as e:
             logger.error(f"Error in audio command: {e}")
@@ -302,23 +288,15 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
         try:
             user_id = message.from_user.id
             
-            # Get messages from MongoDB for this specific user
-            messages = mongodb_service.get_collection('messages').find(
-                {'user_id': user_id},
-                {'message_text': 1, 'timestamp': 1}
-            ).sort('timestamp', -1).limit(1000)  # Get last 1000 messages
+            # Stored profile, updated with any messages since its last checkpoint
+            summary = await persona_store.get_summary(user_id)
             
-            # Convert cursor to list of message texts
-            message_texts = [msg['message_text'] for msg in messages if 'message_text' in msg]
-            
-            if not message_texts:
+            if not summary:
                 await message.reply_text("No messages found to summarize.")
                 return
                 
-            # Generate summary using GroqService
-            summary = await groq_service.generate_summary(message_texts)
-            
             # Handle potentially split responses
+            summary = groq_service.format_summary(summary)
             if isinstance(summary, list):
                 for i, part in enumerate(summary, 1):
                     part_text = f"Part {i}/{len(summary)}:\n\n{part}" if len(summary) > 1 else part
@@ -341,23 +319,15 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
             target_user_id = message.reply_to_message.from_user.id
             target_user_name = message.reply_to_message.from_user.first_name
             
-            # Get messages from MongoDB for the target user
-            messages = mongodb_service.get_collection('messages').find(
-                {'user_id': target_user_id},
-                {'message_text': 1, 'timestamp': 1}
-            ).sort('timestamp', -1).limit(1000)  # Get last 1000 messages
+            # Stored profile, updated with any messages since its last checkpoint
+            summary = await persona_store.get_summary(target_user_id)
             
-            # Convert cursor to list of message texts
-            message_texts = [msg['message_text'] for msg in messages if 'message_text' in msg]
-            
-            if not message_texts:
+            if not summary:
                 await message.reply_text(f"No messages found to summarize for {target_user_name}.")
                 return
                 
-            # Generate summary using GroqService
-            summary = await groq_service.generate_summary(message_texts)
-            
             # Handle potentially split responses
+            summary = groq_service.format_summary(summary)
             if isinstance(summary, list):
                 for i, part in enumerate(summary, 1):
                     part_text = f"Part {i}/{len(summary)}:\n\n{part}" if len(summary) > 1 else part
@@ -371,6 +341,7 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
 
     @app.on_message(filters.command("tldr") & filters.chat(ALLOWED_CHAT_ID))
     async def tldr_command(client, message):
+        waiting_message = None
         try:
             if message.reply_to_message and message.reply_to_message.text:
                 text_to_summarize = message.reply_to_message.text
@@ -382,19 +353,18 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
                 return
 
             waiting_message = await message.reply_text("🤔 Summarizing...")
-            summary = await groq_service.generate_summary([text_to_summarize])
-            await waiting_message.delete()
-            
-            if isinstance(summary, list):
-                for i, part in enumerate(summary, 1):
-                    prefix = "TL;DR (Part {i}/{len(summary)}):\n" if len(summary) > 1 else "TL;DR:\n"
-                    await message.reply_text(f"{prefix}{part}")
-            else:
-                await message.reply_text(f"TL;DR:\n{summary}")
+            await stream_to_message(
+                waiting_message,
+                groq_service.stream_summary([text_to_summarize], cache_as="tldr"),
+                render=lambda text: f"TL;DR:\n{text}"
+            )
                 
         except Exception as e:
             logger.error(f"Error in tldr command: {e}")
-            await message.reply_text("An error occurred while generating the summary.")
+            if waiting_message:
+                await waiting_message.edit_text("An error occurred while generating the summary.")
+            else:
+                await message.reply_text("An error occurred while generating the summary.")
 
     @app.on_message(filters.command("4chan") & filters.chat(ALLOWED_CHAT_ID))
     async def greentext_command(client, message):
@@ -420,8 +390,10 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
                     {'message_text': 1, 'timestamp': 1}
                 ).sort('timestamp', -1).limit(100)  # Get last 100 messages
                 
-                # Convert cursor to list of message texts
-                message_texts = [msg['message_text'] for msg in user_messages if 'message_text' in msg]
+                # Convert cursor to list of message texts, oldest first
+                message_texts = [msg['message_text'] for msg in user_messages if 'message_text' in msg][::-1]
+                # Keep a representative, noise-free subset of the history
+                message_texts = await groq_service.preselect("greentext", message_texts, GREENTEXT_CONTEXT_TOKENS)
                 
                 if not message_texts:
                     await message.reply_text("No messages found in your history to create a greentext story.")
@@ -433,15 +405,12 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
             # Send a waiting message
             waiting_message = await message.reply_text("🤔 Generating greentext story...")
             
-            # Generate greentext using GroqService
-            greentext = await groq_service.generate_greentext(prompt)
-            
-            # Delete the waiting message
-            await waiting_message.delete()
-            
-            # Format the response in a code block to preserve formatting
-            formatted_response = f"```\n{greentext}\n```"
-            await message.reply_text(formatted_response)
+            # Stream the greentext into the placeholder, formatted in a code block to preserve formatting
+            await stream_to_message(
+                waiting_message,
+                groq_service.stream_greentext(prompt),
+                render=lambda text: f"```\n{text}\n```"
+            )
             
         except Exception as e:
             logger.error(f"Error in greentext command: {e}")
@@ -539,7 +508,7 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
 • `/ask [question]` - Ask the AI a question
 • `/ask [question about weather]` - Ask about weather
 • `/wiki [factual question]` - Query Wikipedia using Groq
-• `/summary` - Get chat summary
+• `/summary [12h|7d]` - Get chat summary (default: last 24 hours)
 • `/tldr` - Summarize text
 • `/me` - Generate AI response about yourself
 • `/you` - Generate AI response about another user
@@ -553,7 +522,7 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
 **Information Commands:**
 • `/news [topic]` - Get latest news
 • `/convert [amount] [from] [to]` - Currency conversion
-• `/p [crypto ticker]` - Get latest crypto price
+• `/p [crypto tickers]` - Get latest crypto prices (e.g. `/p BTC ETH SOL`)
 
 **Media Commands:**
 • `/audio` - Convert text to speech
@@ -564,6 +533,7 @@ def register_command_handlers(app: Client, mongodb_service: MongoDBService, stat
 • `/leavegroup <GroupName>` - Leave a mention group
 • `/rmgroup <GroupName>` - Delete a group (admin only)
 • `/groups` - List all groups and members
+• `/metrics` - Show service metrics (admin only)
 • Use `/<GroupName>` to mention group members
 
 The bot also supports automatic media downloads from various websites.
@@ -571,6 +541,23 @@ The bot also supports automatic media downloads from various websites.
         await message.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
 
 
+    @app.on_message(filters.command("metrics") & filters.chat(ALLOWED_CHAT_ID))
+    async def metrics_command(client, message):
+        """Show service metrics and connection pools (admin only)"""
+        try:
+            if message.from_user.id not in ADMIN_USER_IDS:
+                await message.reply_text("❌ This command is only available to group administrators.")
+                return
+
+            response = "📈 Service Metrics:\n\n" + "\n".join(_format_metrics(services.get_stats()))
+            if len(response) > 4096:
+                response = response[:4093] + "..."
+            await message.reply_text(response)
+
+        except Exception as e:
+            logger.error(f"Error in metrics command: {e}")
+            await message.reply_text("❌ An error occurred while collecting metrics.")
+
     @app.on_message(filters.command("joingroup") & filters.chat(ALLOWED_CHAT_ID))
     @group_only
     async def join_group_command(client, message):
@@ -704,7 +691,8 @@ The bot also supports automatic media downloads from various websites.
             
             # Skip if it's a known command
             if group_name in ["join", "leavegroup", "stats", "ask", "summary", "news", 
-                            "convert", "audio", "me", "you", "tldr", "4chan", "pie", "top10", "rmgroup", "help"]:
+                            "convert", "audio", "me", "you", "tldr", "4chan", "pie", "top10", "rmgroup", "help",
+                            "metrics"]:
                 return
                 
             # Get group info
@@ -739,36 +727,45 @@ The bot also supports automatic media downloads from various websites.
     async def price_command(client, message):
         """Get cryptocurrency price information"""
         try:
-            if len(message.command) != 2:
-                await message.reply_text("Usage: /p <ticker>\nExample: /p BTC")
+            if len(message.command) < 2:
+                await message.reply_text("Usage: /p <ticker> [ticker ...]\nExample: /p BTC ETH SOL")
                 return
 
-            ticker = message.command[1]
-            logger.debug(f"Processing price command for ticker: {ticker}")
-            
-            waiting_msg = await message.reply_text("💰 Fetching price data...")
-            
-            result = await crypto_service.get_price(ticker)
+            tickers = message.command[1:MAX_PRICE_TICKERS + 1]
+            logger.debug(f"Processing price command for tickers: {tickers}")
+
+            # Hot tickers are kept fresh by the background poller and answered from memory
+            result = crypto_service.get_table_quotes(tickers)
+            from_table = result is not None
+            if not from_table:
+                waiting_msg = await message.reply_text("💰 Fetching price data...")
+
+                # All tickers are fetched in a single API call
+                result = await crypto_service.get_prices(tickers)
+                await waiting_msg.delete()
             logger.debug(f"Price command result: {result}")
             
-            await waiting_msg.delete()
-            
             if result['status'] == 'error':
                 await message.reply_text(f"❌ {result['message']}")
                 return
 
-            data = result['data']
-            change_emoji = "📈" if data['percent_change_24h'] > 0 else "📉"
-            
-            response = (
-                f"💎 {data['name']} ({data['symbol']})\n\n"
-                f"💵 Price: ${data['price']:,.2f}\n"
-                f"{change_emoji} 24h Change: {data['percent_change_24h']:,.2f}%\n"
-                f"💰 Market Cap: ${data['market_cap']:,.0f}\n"
-                f"📊 24h Volume: ${data['volume_24h']:,.0f}"
-            )
+            blocks = []
+            for data in result['data'].values():
+                change_emoji = "📈" if data['percent_change_24h'] > 0 else "📉"
+                blocks.append(
+                    f"💎 {data['name']} ({data['symbol']})\n\n"
+                    f"💵 Price: ${data['price']:,.2f}\n"
+                    f"{change_emoji} 24h Change: {data['percent_change_24h']:,.2f}%\n"
+                    f"💰 Market Cap: ${data['market_cap']:,.0f}\n"
+                    f"📊 24h Volume: ${data['volume_24h']:,.0f}"
+                )
+            blocks.extend(f"❌ {error}" for error in result['errors'].values())
+            if from_table:
+                oldest = min(data['fetched_at'] for data in result['data'].values())
+                age = int((datetime.now(timezone.utc) - oldest).total_seconds())
+                blocks.append(f"🕒 Updated {age}s ago")
             
-            await message.reply_text(response)
+            await message.reply_text("\n\n".join(blocks))
             
         except Exception as e:
             logger.error(f"Error in price command: {e}", exc_info=True)
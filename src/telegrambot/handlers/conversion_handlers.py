@@ -2,6 +2,7 @@
 import logging
 from pyrogram import Client, filters
 from ..config.settings import ALLOWED_CHAT_ID
+from ..services.currency_service import format_rate_age
 from ..utils.decorators import group_only
 
 logger = logging.getLogger(__name__)
@@ -18,9 +19,10 @@ def register_conversion_handlers(app: Client, currency_service):
                 await message.reply_text("Error: Unexpected API response format")
                 return
                 
-            response = "💱 Latest Exchange Rates (USD base):\n\n"
+            response = f"💱 Latest Exchange Rates ({rates['base']} base):\n\n"
             for currency, rate in rates['rates'].items():
                 response += f"{currency}: {rate:.4f}\n"
+            response += f"\n🕒 Rates updated {format_rate_age(rates['fetched_at'])}"
             await message.reply_text(response)
         except Exception as e:
             logger.error(f"Error in latest_command: {str(e)}")
@@ -44,12 +46,13 @@ def register_conversion_handlers(app: Client, currency_service):
             from_currency = args[1].upper()
             to_currency = args[3].upper()
             
-            waiting_msg = await message.reply_text("💱 Converting...")
+            # Computed from the local rate table, no API call on the request path
             result = await currency_service.convert_currency(from_currency, to_currency, amount)
-            await waiting_msg.delete()
             
             response = f"💱 Currency Conversion:\n\n"
             response += f"{amount:,.2f} {from_currency} = {result['result']:,.2f} {to_currency}\n"
+            response += f"1 {from_currency} = {result['rate']:,.4f} {to_currency}\n"
+            response += f"\n🕒 Rates updated {format_rate_age(result['fetched_at'])}"
             await message.reply_text(response)
                 
         except Exception as e:
@@ -7,9 +7,8 @@ from ..config.settings import ALLOWED_CHAT_ID
 from ..services.downloader_service import DownloaderService
 
 logger = logging.getLogger(__name__)
-downloader = DownloaderService()
 
-def register_media_handlers(app: Client):
+def register_media_handlers(app: Client, downloader: DownloaderService):
     @app.on_message(filters.text & filters.chat(ALLOWED_CHAT_ID))
     async def handle_downloads(client, message):
         # Move URL check before any other processing
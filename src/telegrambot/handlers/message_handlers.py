@@ -108,7 +108,7 @@ class MessageHandlers:
             
             if voice_file:
                 try:
-                    transcription = self.whisper.transcribe(voice_file)
+                    transcription = await self.whisper.transcribe_async(voice_file, user_id=message.from_user.id)
                     if transcription:
                         await message.reply_text(
                             f"🎙️ Transcription:\n{transcription}",
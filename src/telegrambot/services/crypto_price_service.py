@@ -1,12 +1,25 @@
+import time
 import aiohttp
 import logging
 import os
-from typing import Dict, Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from .http_client import HttpClient
+from ..utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+CRYPTO_QUOTE_TTL = 45  # Seconds a quote is served from memory; CMC refreshes every minute
+MAX_PRICE_TICKERS = 10  # Symbols accepted by one /p command
+HOT_TICKER_POLL_INTERVAL = 30  # Seconds between background refreshes of hot tickers
+HOT_TICKER_HALF_LIFE = 600  # Seconds for a ticker's request count to halve
+HOT_TICKER_MIN_SCORE = 3  # Decayed requests needed to count as hot
+HOT_TICKER_MAX = 10  # Hot tickers refreshed per call
+HOT_QUOTE_MAX_AGE = 2 * HOT_TICKER_POLL_INTERVAL  # Older table entries are fetched on demand
+
 class CryptoPriceService:
-    def __init__(self, api_key_file: str):
+    def __init__(self, api_key_file: str, http_client: HttpClient):
+        self.http = http_client
         try:
             with open(api_key_file, 'r') as f:
                 self.api_key = f.read().strip()
@@ -15,9 +28,131 @@ class CryptoPriceService:
             logger.error(f"Failed to read API key from {api_key_file}: {e}")
             self.api_key = None
         self.base_url = 'https://pro-api.coinmarketcap.com/v1'
+        self.quote_cache = TTLCache(maxsize=256, ttl=CRYPTO_QUOTE_TTL)
+        # Decayed request counts and the quote table kept fresh by the poller
+        self.demand: Dict[str, Tuple[float, float]] = {}
+        self.quote_table: Dict[str, Dict] = {}
+        self.stats = {"api_calls": 0, "cache_hits": 0, "cache_misses": 0, "table_hits": 0, "table_refreshes": 0}
 
-    async def get_price(self, ticker: str) -> Dict:
-        """Get latest price for a cryptocurrency"""
+    @staticmethod
+    def _parse_quote(ticker: str, ticker_data: Dict) -> Optional[Dict]:
+        quote = ticker_data.get('quote', {}).get('USD', {})
+        if not quote:
+            return None
+        return {
+            'name': ticker_data.get('name', ''),
+            'symbol': ticker_data.get('symbol', ticker),
+            'price': quote.get('price', 0.0),
+            'percent_change_24h': quote.get('percent_change_24h', 0.0),
+            'market_cap': quote.get('market_cap', 0.0),
+            'volume_24h': quote.get('volume_24h', 0.0),
+            'last_updated': quote.get('last_updated')
+        }
+
+    async def _fetch_quotes(self, symbols: List[str]) -> Tuple[Dict[str, Dict], Dict[str, str]]:
+        """One batched quotes/latest call; returns quotes and per-symbol errors"""
+        url = f'{self.base_url}/cryptocurrency/quotes/latest'
+        headers = {
+            'X-CMC_PRO_API_KEY': self.api_key,
+            'Accept': 'application/json'
+        }
+        params = {
+            'symbol': ','.join(symbols),
+            'convert': 'USD',
+            'skip_invalid': 'true'  # Unknown symbols are left out instead of failing the batch
+        }
+
+        logger.debug(f"Making request to CoinMarketCap API for tickers: {symbols}")
+        self.stats["api_calls"] += 1
+        async with self.http.session.get(url, headers=headers, params=params) as response:
+            logger.debug(f"Response status: {response.status}")
+            data = await response.json()
+            logger.debug(f"Raw API response: {data}")
+
+        # Check for API error response
+        if 'status' in data and data['status'].get('error_code', 0) != 0:
+            error_msg = data['status'].get('error_message', f"No data found for {', '.join(symbols)}")
+            logger.error(f"API error: {error_msg}")
+            return {}, {symbol: error_msg for symbol in symbols}
+
+        quotes, errors = {}, {}
+        fetched_at = datetime.now(timezone.utc)
+        for symbol in symbols:
+            ticker_data = (data.get('data') or {}).get(symbol)
+            quote = self._parse_quote(symbol, ticker_data) if ticker_data else None
+            if quote is None:
+                logger.error(f"No USD quote data found for {symbol}")
+                errors[symbol] = f'No data found for {symbol}'
+                continue
+            quote['fetched_at'] = fetched_at
+            self.quote_cache.set(symbol, quote)
+            quotes[symbol] = quote
+        return quotes, errors
+
+    def _record_demand(self, symbols: List[str]) -> None:
+        """Bump each symbol's exponentially decaying request counter"""
+        now = time.monotonic()
+        for symbol in symbols:
+            score, updated = self.demand.get(symbol, (0.0, now))
+            self.demand[symbol] = (score * 0.5 ** ((now - updated) / HOT_TICKER_HALF_LIFE) + 1, now)
+
+    def hot_tickers(self) -> List[str]:
+        """Most requested symbols whose decayed request count is still high"""
+        now = time.monotonic()
+        scores = {
+            symbol: score * 0.5 ** ((now - updated) / HOT_TICKER_HALF_LIFE)
+            for symbol, (score, updated) in self.demand.items()
+        }
+        # Forget symbols nobody asks for any more
+        for symbol, score in scores.items():
+            if score < 0.1:
+                del self.demand[symbol]
+        hot = [symbol for symbol, score in scores.items() if score >= HOT_TICKER_MIN_SCORE]
+        return sorted(hot, key=scores.get, reverse=True)[:HOT_TICKER_MAX]
+
+    async def refresh_hot_tickers(self) -> None:
+        """Background job: refresh the quote table for hot tickers in one call"""
+        hot = self.hot_tickers()
+        for symbol in list(self.quote_table):
+            if symbol not in hot:
+                del self.quote_table[symbol]
+        if not hot or not self.api_key:
+            return
+        try:
+            quotes, errors = await self._fetch_quotes(hot)
+        except Exception as e:
+            logger.warning(f"Hot ticker refresh failed: {e}")
+            return
+        self.quote_table.update(quotes)
+        self.stats["table_refreshes"] += 1
+        logger.debug(f"Refreshed hot tickers {list(quotes)}; errors: {errors}")
+
+    def get_table_quotes(self, tickers: List[str]) -> Optional[Dict]:
+        """
+        Answer from the in-memory quote table if every ticker is hot and fresh.
+
+        Args:
+            tickers (List[str]): Requested symbols
+
+        Returns:
+            Optional[Dict]: get_prices-style result, or None if any ticker must be fetched
+        """
+        symbols = list(dict.fromkeys(ticker.upper() for ticker in tickers if ticker))
+        now = datetime.now(timezone.utc)
+        quotes = {}
+        for symbol in symbols:
+            quote = self.quote_table.get(symbol)
+            if quote is None or (now - quote['fetched_at']).total_seconds() > HOT_QUOTE_MAX_AGE:
+                return None
+            quotes[symbol] = quote
+        if not quotes:
+            return None
+        self._record_demand(symbols)
+        self.stats["table_hits"] += len(quotes)
+        return {'status': 'success', 'data': quotes, 'errors': {}}
+
+    async def get_prices(self, tickers: List[str]) -> Dict:
+        """Get latest prices for several cryptocurrencies in one API call"""
         try:
             if not self.api_key:
                 logger.error("No API key available")
@@ -26,78 +161,41 @@ class CryptoPriceService:
                     'message': 'API key not configured'
                 }
 
-            if not ticker:
+            symbols = list(dict.fromkeys(ticker.upper() for ticker in tickers if ticker))
+            if not symbols:
                 return {
                     'status': 'error',
                     'message': 'No ticker symbol provided'
                 }
+            self._record_demand(symbols)
 
-            url = f'{self.base_url}/cryptocurrency/quotes/latest'
-            headers = {
-                'X-CMC_PRO_API_KEY': self.api_key,
-                'Accept': 'application/json'
-            }
-            params = {
-                'symbol': ticker.upper(),
-                'convert': 'USD'
-            }
+            quotes, errors = {}, {}
+            missing = []
+            for symbol in symbols:
+                cached = self.quote_cache.get(symbol)
+                if cached is not None:
+                    quotes[symbol] = cached
+                else:
+                    missing.append(symbol)
+            self.stats["cache_hits"] += len(quotes)
+            self.stats["cache_misses"] += len(missing)
 
-            logger.debug(f"Making request to CoinMarketCap API for ticker: {ticker}")
-            logger.debug(f"Request URL: {url}")
-            logger.debug(f"Request params: {params}")
-
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, headers=headers, params=params) as response:
-                    logger.debug(f"Response status: {response.status}")
-                    data = await response.json()
-                    logger.debug(f"Raw API response: {data}")
-                    
-                    # Check for API error response
-                    if 'status' in data and data['status'].get('error_code', 0) != 0:
-                        error_msg = data['status'].get('error_message', f'No data found for {ticker}')
-                        logger.error(f"API error: {error_msg}")
-                        return {
-                            'status': 'error',
-                            'message': error_msg
-                        }
-
-                    # Get the first coin data (API returns object with numeric keys)
-                    if not data.get('data'):
-                        logger.error(f"No data field in response for ticker {ticker}")
-                        return {
-                            'status': 'error',
-                            'message': f'No data found for {ticker}'
-                        }
-
-                    ticker_data = data['data'].get(ticker.upper())
-                    if not ticker_data:
-                        logger.error(f"No ticker data found for {ticker}")
-                        return {
-                            'status': 'error',
-                            'message': f'No data found for {ticker}'
-                        }
-
-                    quote = ticker_data.get('quote', {}).get('USD', {})
-                    if not quote:
-                        logger.error(f"No USD quote data found for {ticker}")
-                        return {
-                            'status': 'error',
-                            'message': f'No USD price data available for {ticker}'
-                        }
-
-                    result = {
-                        'status': 'success',
-                        'data': {
-                            'name': ticker_data.get('name', ''),
-                            'symbol': ticker_data.get('symbol', ticker.upper()),
-                            'price': quote.get('price', 0.0),
-                            'percent_change_24h': quote.get('percent_change_24h', 0.0),
-                            'market_cap': quote.get('market_cap', 0.0),
-                            'volume_24h': quote.get('volume_24h', 0.0)
-                        }
-                    }
-                    logger.debug(f"Processed result: {result}")
-                    return result
+            if missing:
+                fetched, errors = await self._fetch_quotes(missing)
+                quotes.update(fetched)
+
+            if not quotes:
+                return {
+                    'status': 'error',
+                    'message': '; '.join(dict.fromkeys(errors.values()))
+                }
+
+            # Keep the order the user asked for
+            return {
+                'status': 'success',
+                'data': {symbol: quotes[symbol] for symbol in symbols if symbol in quotes},
+                'errors': errors
+            }
 
         except aiohttp.ClientError as e:
             logger.error(f"Network error fetching crypto price: {e}")
@@ -111,3 +209,32 @@ class CryptoPriceService:
                 'status': 'error',
                 'message': 'Unexpected error while fetching price data'
             }
+
+    async def get_price(self, ticker: str) -> Dict:
+        """Get latest price for a cryptocurrency"""
+        if not ticker:
+            return {
+                'status': 'error',
+                'message': 'No ticker symbol provided'
+            }
+        result = await self.get_prices([ticker])
+        if result['status'] == 'error':
+            return result
+        symbol = ticker.upper()
+        if symbol not in result['data']:
+            return {
+                'status': 'error',
+                'message': result['errors'].get(symbol, f'No data found for {ticker}')
+            }
+        return {
+            'status': 'success',
+            'data': result['data'][symbol]
+        }
+
+    def get_stats(self) -> Dict:
+        lookups = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["cache_hits"] / lookups if lookups else 0.0,
+            "hot_tickers": list(self.quote_table)
+        }
@@ -1,13 +1,42 @@
-import http.client
+import asyncio
 import json
 import os
 import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from .http_client import HttpClient
+from .mongodb_service import MongoDBService
 
 logger = logging.getLogger(__name__)
 
+FX_BASE_CURRENCY = "USD"
+FX_REFRESH_INTERVAL = 3600  # Seconds between background refreshes of the rate table
+FX_MAX_AGE = 6 * 3600  # Seconds; an older table is refreshed before it is used
+FX_DEFAULT_CURRENCIES = ['EUR', 'GBP', 'JPY']
+
+
+def format_rate_age(fetched_at: datetime) -> str:
+    """Human-readable age of a rate table, e.g. "12 min ago" """
+    seconds = int((datetime.now(timezone.utc) - fetched_at).total_seconds())
+    if seconds < 60:
+        return "just now"
+    if seconds < 3600:
+        return f"{seconds // 60} min ago"
+    return f"{seconds // 3600} h {seconds % 3600 // 60} min ago"
+
+
 class CurrencyService:
-    def __init__(self, api_key_file: str):
+    """Currency conversion from a locally held rate table.
+
+    The full USD-based table is fetched by a background job and kept in
+    memory and in Mongo, so restarts don't need an API call. Conversions
+    and /latest are computed locally as cross rates.
+    """
+
+    def __init__(self, api_key_file: str, http_client: HttpClient, mongodb_service: MongoDBService):
+        self.http = http_client
+        self.base_url = "https://api.fxratesapi.com"
         try:
             with open(api_key_file, 'r') as f:
                 self.api_key = f.read().strip()
@@ -15,77 +44,121 @@ class CurrencyService:
         except Exception as e:
             logger.error(f"Failed to read API key from {api_key_file}: {e}")
             self.api_key = None
+        self.collection = mongodb_service.get_collection('fx_rates')
+        # {'rates': {currency: units per base}, 'fetched_at': datetime}
+        self.table: Optional[Dict] = None
+        self._refreshing: Optional[asyncio.Task] = None
+        self.stats = {"api_calls": 0, "api_errors": 0, "mongo_loads": 0, "conversions": 0}
+
+    async def _fetch_table(self) -> Dict:
+        headers = {
+            "Accept": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        endpoint = f"/latest?api_key={self.api_key}&base={FX_BASE_CURRENCY}"
+        logger.debug(f"Making request to: {endpoint}")
 
-    async def get_latest_rates(self, base='USD', currencies=['EUR', 'GBP', 'JPY']):
+        self.stats["api_calls"] += 1
+        async with self.http.session.get(f"{self.base_url}{endpoint}", headers=headers) as res:
+            data = await res.text()
+
+        if res.status != 200:
+            raise Exception(f"API Error: {res.status} - {data}")
+
+        response_data = json.loads(data)
+        if 'error' in response_data:
+            raise Exception(f"API Error: {response_data['error']}")
+        if not response_data.get('rates'):
+            raise Exception("API Error: response contains no rates")
+
+        rates = {currency: float(rate) for currency, rate in response_data['rates'].items()}
+        rates[FX_BASE_CURRENCY] = 1.0
+        return {'rates': rates, 'fetched_at': datetime.now(timezone.utc)}
+
+    async def refresh_rates(self) -> Optional[Dict]:
+        """Fetch the rate table and store it in memory and Mongo; keeps the old table on failure"""
+        # Coalesce the background job with an on-demand refresh
+        if self._refreshing is None:
+            self._refreshing = asyncio.ensure_future(self._refresh())
+            self._refreshing.add_done_callback(lambda _: setattr(self, '_refreshing', None))
+        return await asyncio.shield(self._refreshing)
+
+    async def _refresh(self) -> Optional[Dict]:
         try:
-            conn = http.client.HTTPSConnection("api.fxratesapi.com")
-            currencies_str = ','.join(currencies)
-            
-            headers = {
-                "Accept": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
+            table = await self._fetch_table()
+        except Exception as e:
+            self.stats["api_errors"] += 1
+            logger.warning(f"Could not refresh FX rates: {e}")
+            return self.table
 
-            endpoint = f"/latest?api_key={self.api_key}&base={base}&currencies={currencies_str}"
-            logger.debug(f"Making request to: {endpoint}")
-            
-            conn.request("GET", endpoint, headers=headers)
-            res = conn.getresponse()
-            data = res.read().decode("utf-8")
-            
-            logger.debug(f"API Response: {data}")
-            
-            if res.status != 200:
-                raise Exception(f"API Error: {res.status} - {data}")
-                
-            response_data = json.loads(data)
-            if 'error' in response_data:
-                raise Exception(f"API Error: {response_data['error']}")
-                
-            return response_data
-            
+        self.table = table
+        self.collection.update_one({'_id': FX_BASE_CURRENCY}, {'$set': table}, upsert=True)
+        logger.info(f"Refreshed FX rate table with {len(table['rates'])} currencies")
+        return table
+
+    async def get_table(self) -> Dict:
+        """
+        Return the current rate table, loading or refreshing it if needed.
+
+        Returns:
+            Dict: 'rates' relative to the base currency and 'fetched_at'
+
+        Raises:
+            Exception: If no rate table is available at all
+        """
+        if self.table is None:
+            doc = self.collection.find_one({'_id': FX_BASE_CURRENCY})
+            if doc and doc.get('rates'):
+                self.stats["mongo_loads"] += 1
+                # Mongo hands back naive UTC datetimes
+                self.table = {'rates': doc['rates'], 'fetched_at': doc['fetched_at'].replace(tzinfo=timezone.utc)}
+
+        if self.table is None or \
+                (datetime.now(timezone.utc) - self.table['fetched_at']).total_seconds() > FX_MAX_AGE:
+            await self.refresh_rates()
+
+        if self.table is None:
+            raise Exception("Exchange rates are not available yet")
+        return self.table
+
+    def _rate(self, table: Dict, from_currency: str, to_currency: str) -> float:
+        rates = table['rates']
+        for currency in (from_currency, to_currency):
+            if currency not in rates:
+                raise ValueError(f"Unknown currency: {currency}")
+        return rates[to_currency] / rates[from_currency]
+
+    async def get_latest_rates(self, base: str = FX_BASE_CURRENCY, currencies: List[str] = FX_DEFAULT_CURRENCIES) -> Dict:
+        """Rates of the given currencies against base, computed from the local table"""
+        try:
+            table = await self.get_table()
+            return {
+                'base': base,
+                'rates': {currency: self._rate(table, base, currency) for currency in currencies},
+                'fetched_at': table['fetched_at']
+            }
         except Exception as e:
             logger.error(f"Error in get_latest_rates: {str(e)}")
             raise
-        finally:
-            conn.close()
 
     async def convert_currency(self, from_currency: str, to_currency: str, amount: float) -> dict:
         try:
-            conn = http.client.HTTPSConnection("api.fxratesapi.com")
-            
-            endpoint = f"/convert?from={from_currency}&to={to_currency}&amount={amount}&format=json"
-            logger.debug(f"Making conversion request to: {endpoint}")
-            
-            headers = {
-                "Accept": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            conn.request("GET", endpoint, headers=headers)
-            res = conn.getresponse()
-            data = res.read().decode("utf-8")
-            
-            logger.debug(f"API Response: {data}")
-            
-            if res.status != 200:
-                raise Exception(f"API Error: {res.status} - {data}")
-                
-            response_data = json.loads(data)
-            if 'error' in response_data:
-                raise Exception(f"API Error: {response_data['error']}")
-                
-            # Extract rate from response
-            rate = float(response_data.get('rate', 0))
-            result = float(response_data.get('result', 0))
-            
+            table = await self.get_table()
+            rate = self._rate(table, from_currency, to_currency)
+            self.stats["conversions"] += 1
             return {
                 'rate': rate,
-                'result': result
+                'result': amount * rate,
+                'fetched_at': table['fetched_at']
             }
-            
+
         except Exception as e:
             logger.error(f"Error in convert_currency: {str(e)}")
             raise
-        finally:
-            conn.close()
\ No newline at end of file
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            "currencies": len(self.table['rates']) if self.table else 0,
+            "table_age": (datetime.now(timezone.utc) - self.table['fetched_at']).total_seconds() if self.table else None
+        }
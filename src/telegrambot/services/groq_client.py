@@ -0,0 +1,328 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import re
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+from groq import AsyncGroq, APIConnectionError, APIStatusError
+from ..utils.token_utils import count_message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Request priorities; lower values are dispatched first
+PRIORITY_INTERACTIVE = 0  # A user is waiting for the answer
+PRIORITY_BATCH = 1  # Background and fan-out work (summary chunks, rollups)
+
+# Per-model limits used until Groq's response headers tell us the real ones
+DEFAULT_REQUESTS_PER_MINUTE = 30
+DEFAULT_TOKENS_PER_MINUTE = 6000
+OUTPUT_TOKEN_ESTIMATE = 512  # Completion tokens reserved per request before usage is known
+TPM_HEADROOM = 0.8  # Share of a model's tokens-per-minute budget a single request may use
+
+MAX_RETRIES = 4
+BACKOFF_BASE = 1.0  # Seconds, doubled on every attempt
+BACKOFF_MAX = 30.0
+QUEUE_WAIT_SAMPLES = 500
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Parse Groq's reset headers ("7.66s", "2m59.56s", "120ms") into seconds.
+
+    Args:
+        value (Optional[str]): Header value
+
+    Returns:
+        Optional[float]: Seconds until reset, or None if unparseable
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class RequestTooLargeError(ValueError):
+    """A request needs more tokens than the model's per-minute budget can ever admit"""
+
+    def __init__(self, model: str, tokens: int, limit: float):
+        super().__init__(
+            f"Request for {model} needs ~{tokens} tokens but the limit is {limit:.0f} tokens per minute; "
+            f"split the input into smaller chunks"
+        )
+        self.model = model
+        self.tokens = tokens
+        self.limit = limit
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class TokenBucket:
+    """Refills continuously at capacity per minute; may go negative after a correction"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.capacity / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount can be taken"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) * 60.0 / self.capacity
+
+    def take(self, amount: float) -> None:
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float) -> None:
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, remaining: Optional[float], reset_seconds: Optional[float] = None,
+             limit: Optional[float] = None) -> None:
+        """Align the bucket with the server's view of our remaining budget"""
+        self._refill()
+        if limit:
+            self.capacity = float(limit)
+        if remaining is None:
+            return
+        self.level = min(self.level, float(remaining))
+        if self.level <= 0 and reset_seconds:
+            # Empty until the server's window resets
+            self.level = -self.capacity * reset_seconds / 60.0
+
+    def drain(self, seconds: float) -> None:
+        """Block the bucket for the given number of seconds (e.g. after a 429)"""
+        self._refill()
+        self.level = min(self.level, -self.capacity * seconds / 60.0)
+
+
+class RateLimitedGroqClient:
+    """AsyncGroq wrapper that stays inside our RPM/TPM limits.
+
+    Requests wait in a per-model priority queue (interactive before batch)
+    until the model's request and token buckets allow them through, so a
+    model that is out of budget never holds up requests for another one. Buckets are kept in
+    sync with Groq's x-ratelimit-* response headers, and 429/5xx responses are
+    retried with jittered exponential backoff.
+    """
+
+    def __init__(self, client: AsyncGroq, requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE, max_retries: int = MAX_RETRIES):
+        self.client = client
+        self.max_retries = max_retries
+        self._request_buckets = defaultdict(lambda: TokenBucket(requests_per_minute))
+        self._token_buckets = defaultdict(lambda: TokenBucket(tokens_per_minute))
+        # Per-model heaps of (priority, sequence, tokens, future, queued_at), each with its own dispatcher
+        self._waiters = defaultdict(list)
+        self._counter = itertools.count()
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._dispatchers: Dict[str, asyncio.Task] = {}
+        self._queue_waits = {
+            PRIORITY_INTERACTIVE: deque(maxlen=QUEUE_WAIT_SAMPLES),
+            PRIORITY_BATCH: deque(maxlen=QUEUE_WAIT_SAMPLES),
+        }
+        self.stats = {"requests": 0, "retries": 0, "rate_limited": 0, "server_errors": 0, "failures": 0,
+                      "too_large": 0}
+
+    async def create(self, priority: int = PRIORITY_INTERACTIVE, max_retries: Optional[int] = None,
+                     timings: Optional[Dict[str, float]] = None, **params) -> Any:
+        """
+        Queue a chat completion and return the parsed response (or stream).
+
+        Args:
+            priority (int): PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            max_retries (Optional[int]): Override the client's retry count
+            timings (Optional[Dict[str, float]]): Receives the perf_counter() time the
+                last attempt was admitted by the rate limiter, under "admitted"
+            **params: Arguments for chat.completions.create
+
+        Returns:
+            Any: ChatCompletion, or an async stream of chunks when stream=True
+
+        Raises:
+            RequestTooLargeError: If the request exceeds the model's tokens-per-minute budget
+        """
+        model = params.get("model")
+        tokens = count_message_tokens(params.get("messages", [])) + min(
+            params.get("max_tokens") or OUTPUT_TOKEN_ESTIMATE, OUTPUT_TOKEN_ESTIMATE
+        )
+        # Such a request would wait forever for the bucket or be rejected by Groq
+        limit = self._token_buckets[model].capacity
+        if tokens > limit:
+            self.stats["too_large"] += 1
+            raise RequestTooLargeError(model, tokens, limit)
+
+        max_retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            await self._acquire(priority, model, tokens)
+            if timings is not None:
+                timings["admitted"] = time.perf_counter()
+            self.stats["requests"] += 1
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(**params)
+            except APIStatusError as e:
+                self._update_limits(model, e.response.headers)
+                if e.status_code != 429 and e.status_code < 500:
+                    self.stats["failures"] += 1
+                    raise
+                retry_after = parse_reset(e.response.headers.get("retry-after"))
+                if e.status_code == 429:
+                    self.stats["rate_limited"] += 1
+                    self._token_buckets[model].drain(retry_after or BACKOFF_BASE)
+                else:
+                    self.stats["server_errors"] += 1
+                error = e
+            except APIConnectionError as e:
+                retry_after = None
+                error = e
+            else:
+                self._update_limits(model, raw.headers)
+                response = raw.parse()
+                self._settle_usage(model, tokens, response)
+                return response
+
+            if attempt == max_retries:
+                self.stats["failures"] += 1
+                raise error
+            delay = self._backoff(attempt, retry_after)
+            self.stats["retries"] += 1
+            logger.warning(f"Groq request for {model} failed ({error}); retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[float]) -> float:
+        # Full jitter so concurrent retries don't line up again
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    async def _acquire(self, priority: int, model: str, tokens: int) -> None:
+        """Wait in the priority queue until the model's buckets admit the request"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        heapq.heappush(self._waiters[model], (priority, next(self._counter), tokens, future, time.monotonic()))
+        wakeup = self._wakeups.setdefault(model, asyncio.Event())
+        wakeup.set()
+        dispatcher = self._dispatchers.get(model)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[model] = asyncio.ensure_future(self._dispatch(model))
+        await future
+
+    async def _dispatch(self, model: str) -> None:
+        """Release a model's queued requests in priority order as its budget becomes available"""
+        waiters = self._waiters[model]
+        wakeup = self._wakeups[model]
+        while waiters:
+            wakeup.clear()
+            priority, _, tokens, future, queued_at = waiters[0]
+            if future.cancelled():
+                heapq.heappop(waiters)
+                continue
+
+            wait = max(self._request_buckets[model].wait_time(1), self._token_buckets[model].wait_time(tokens))
+            if wait > 0:
+                # Wake early if a higher-priority request arrives
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(waiters)
+            self._request_buckets[model].take(1)
+            self._token_buckets[model].take(tokens)
+            self._queue_waits[priority].append(time.monotonic() - queued_at)
+            future.set_result(None)
+
+    def _update_limits(self, model: str, headers) -> None:
+        """Sync the buckets with Groq's x-ratelimit-* headers"""
+        try:
+            # Groq reports daily request limits and per-minute token limits
+            self._request_buckets[model].sync(
+                remaining=_to_float(headers.get("x-ratelimit-remaining-requests")),
+                reset_seconds=parse_reset(headers.get("x-ratelimit-reset-requests"))
+            )
+            self._token_buckets[model].sync(
+                remaining=_to_float(headers.get("x-ratelimit-remaining-tokens")),
+                reset_seconds=parse_reset(headers.get("x-ratelimit-reset-tokens")),
+                limit=_to_float(headers.get("x-ratelimit-limit-tokens"))
+            )
+        except Exception as e:
+            logger.debug(f"Could not parse Groq rate limit headers: {e}")
+
+    def _settle_usage(self, model: str, reserved: int, response) -> None:
+        """Refund or charge the difference between reserved and actual tokens"""
+        usage = getattr(response, "usage", None)
+        if usage is not None and usage.total_tokens:
+            self._token_buckets[model].give_back(reserved - usage.total_tokens)
+
+    def max_input_tokens(self, model: str, max_tokens: Optional[int] = None) -> int:
+        """
+        Largest prompt a request can carry and still fit the model's TPM budget with headroom.
+
+        Args:
+            model (str): Model name
+            max_tokens (Optional[int]): Completion cap of the request
+
+        Returns:
+            int: Prompt token budget
+        """
+        reserved = min(max_tokens or OUTPUT_TOKEN_ESTIMATE, OUTPUT_TOKEN_ESTIMATE)
+        return int(self._token_buckets[model].capacity * TPM_HEADROOM) - reserved
+
+    def is_limited(self, model: str) -> bool:
+        """Whether a request for this model would have to wait right now"""
+        return self._request_buckets[model].wait_time(1) > 0 or self._token_buckets[model].wait_time(1) > 0
+
+    async def close(self) -> None:
+        for dispatcher in self._dispatchers.values():
+            dispatcher.cancel()
+        await self.client.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        queue_wait = {}
+        for priority, name in ((PRIORITY_INTERACTIVE, "interactive"), (PRIORITY_BATCH, "batch")):
+            samples = self._queue_waits[priority]
+            queue_wait[name] = {
+                "count": len(samples),
+                "p50": _percentile(samples, 0.5),
+                "p95": _percentile(samples, 0.95),
+                "max": max(samples, default=0.0),
+            }
+        return {
+            **self.stats,
+            "queued": {model: len(waiters) for model, waiters in self._waiters.items() if waiters},
+            "queue_wait_seconds": queue_wait,
+            "token_budget": {model: round(bucket.level) for model, bucket in self._token_buckets.items()},
+        }
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
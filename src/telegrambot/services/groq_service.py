@@ -1,28 +1,148 @@
-import os
+import asyncio
 import logging
-import aiohttp
 import json
+import time
 from dotenv import load_dotenv
 from groq import AsyncGroq
 from datetime import datetime, timedelta
-from pymongo import MongoClient
-from ..config.settings import GROQ_API_KEY, MONGODB_URI
 from .base_service import BaseService
 import base64
+from .mongodb_service import MongoDBService
 from .weather_service import WeatherService
 from .wiki_service import WikiService  # Add this import
-from ..utils.file_utils import clear_directory  # Add this import
+from .groq_client import RateLimitedGroqClient
+from .model_router import ModelRouter, TEXT_MODEL
+from .llm_cache import LLMResponseCache, digest
+from .tool_results import compact_tool_result
+from .summary_engine import MapReduceSummarizer, MAP_PROMPT, SUMMARY_MAX_TOKENS, EMPTY_SUMMARY_MESSAGE
+from ..utils.token_utils import TokenBudgetChunker, count_tokens
+from ..utils.image_utils import prepare_vision_image
+from ..utils.message_selection import select_messages
 
 logger = logging.getLogger(__name__)
 
-VISION_MODEL = "llama-3.2-90b-vision-preview"
-TEXT_MODEL = "llama-3.3-70b-versatile"
-TEXT_MODEL_MAX_TOKENS = 32768  # Max output tokens for TEXT_MODEL
-VISION_MODEL_MAX_TOKENS = 4096  # Default max tokens for vision model
 TELEGRAM_MAX_LENGTH = 4096
+MAX_SUMMARY_MESSAGES = 1000  # Maximum messages to process per summary
+# Upper bounds only: both are lowered to what the models' current tokens-per-minute
+# limits can admit in one request (see summary_chunk_tokens)
+SUMMARY_MAX_CHUNK_TOKENS = 16000
+SUMMARY_SELECT_TOKENS = 12000  # Representative messages kept per summary (one chunk)
+SUMMARY_PROMPT_TOKENS = count_tokens(MAP_PROMPT) + 64  # System prompt plus the "Summarize these messages..." wrapper
+GREENTEXT_CONTEXT_TOKENS = 1500  # User history sent to /4chan without a prompt
+MAX_TOOL_ITERATIONS = 3  # Rounds of tool calls before the model must answer
+TOOL_TIMEOUT = 15  # Seconds a single tool call may take
+
+WIKI_FORMAT_PROMPT = """Format Wikipedia content clearly:
+1. Use bold for article titles and section headings
+2. Keep emojis provided in the content
+3. Maintain proper paragraph breaks
+4. Include source links at the end
+5. For disambiguation pages, list alternatives with bullet points
+6. Highlight important dates and facts"""
+
+ASK_SYSTEM_PROMPT = """Provide brief, focused responses in 2-3 sentences unless specifically asked for more detail. Be direct and highlight only the most important points.
+
+Only use tools for:
+1. Weather and Air Quality Queries:
+   - Use weather/air quality tools for current conditions
+   - Show temperatures in both °C and °F
+   - Include relevant weather emojis
+   - Format air quality data with appropriate units
+
+For all other queries (philosophical, historical, analytical, etc.), provide a concise response without using any tools."""
+
+FORECAST_FORMAT_PROMPT = """Format forecast data clearly:
+1. Group by date with clear headings
+2. Show temperatures in both units
+3. Include weather emojis for conditions
+4. Show precipitation chances
+5. Use one short line per day"""
+
+AIR_QUALITY_FORMAT_PROMPT = """Format air quality data clearly:
+1. Show AQI rating with emoji
+2. List all pollutants with units
+3. Include health recommendations if available
+4. Use proper spacing and formatting"""
+
+GREENTEXT_PROMPT = """You are a 4chan greentext story generator. Create a short, humorous story in greentext format following these rules:
+1. Each line must start with '>'
+2. Keep it concise and entertaining
+3. Use first-person perspective
+4. Include typical 4chan storytelling elements and humor
+5. Keep it relatively short (5-10 lines)
+6. Make it relate to the given prompt
+7. Use common 4chan terminology and style
+8. End with some kind of punchline or twist"""
+
+WIKI_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "wiki_search",
+            "description": "Search Wikipedia for information",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Search term"},
+                    "limit": {"type": "integer", "default": 3}
+                },
+                "required": ["query"]
+            }
+        }
+    }
+]
+
+WEATHER_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_weather",
+            "description": "Get current weather information for a location",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "location": {"type": "string", "description": "City name or coordinates"},
+                    "units": {"type": "string", "enum": ["metric", "imperial"], "default": "metric"}
+                },
+                "required": ["location"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_forecast",
+            "description": "Get weather forecast for a location",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "location": {"type": "string", "description": "City name or coordinates"},
+                    "units": {"type": "string", "enum": ["metric", "imperial"], "default": "metric"}
+                },
+                "required": ["location"]
+            }
+        }
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_air_quality",
+            "description": "Get current air quality information for a location",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "location": {"type": "string", "description": "City name or coordinates"}
+                },
+                "required": ["location"]
+            }
+        }
+    }
+]
 
 class GroqService(BaseService):
-    def __init__(self, api_key_file: str):
+    def __init__(self, api_key_file: str, mongodb_service: MongoDBService,
+                 weather_service: WeatherService, wiki_service: WikiService,
+                 response_cache: LLMResponseCache):
         super().__init__()
         load_dotenv()
         try:
@@ -33,28 +153,50 @@ class GroqService(BaseService):
             logger.error(f"Failed to read API key from {api_key_file}: {e}")
             self.api_key = None
             
-        # Initialize other services with correct secret paths
-        self.weather_service = WeatherService('/run/secrets/openweather_api_key')
-        self.wiki_service = WikiService()
+        # Shared services are injected by the ServiceContainer
+        self.weather_service = weather_service
+        self.wiki_service = wiki_service
+        self.response_cache = response_cache
         
-        self.client = AsyncGroq(api_key=self.api_key)
-        self.db_client = MongoClient(MONGODB_URI)
-        self.db = self.db_client['telegram_bot']
-        self.message_collection = self.db['messages']
-        self.downloads_dir = "./downloads"
-        os.makedirs(self.downloads_dir, exist_ok=True)
-
-    def encode_image(self, image_path):
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
-
-    def cleanup_downloads(self):
-        """Clean up the downloads directory"""
-        try:
-            clear_directory(self.downloads_dir)
-            logger.debug("Cleaned up downloads directory")
-        except Exception as e:
-            logger.error(f"Error cleaning up downloads directory: {e}")
+        # Retries are handled by the wrapper, which knows our rate limits
+        self.client = RateLimitedGroqClient(AsyncGroq(api_key=self.api_key, max_retries=0))
+        self.router = ModelRouter(self.client)
+        self.summarizer = MapReduceSummarizer(self.router)
+        self.chunker = TokenBudgetChunker(
+            TEXT_MODEL,
+            prompt_tokens=SUMMARY_PROMPT_TOKENS,
+            output_tokens=SUMMARY_MAX_TOKENS,
+            max_chunk_tokens=SUMMARY_MAX_CHUNK_TOKENS
+        )
+        self.message_collection = mongodb_service.messages
+        self.vision_stats = {"images": 0, "original_bytes": 0, "payload_bytes": 0, "prepare_seconds": 0.0}
+        self.selection_stats = {}
+        self.tool_result_stats = {}
+
+    async def preselect(self, command: str, messages: list, token_budget: int) -> list:
+        """Reduce raw chat messages to a representative subset that fits token_budget"""
+        # TF-IDF and the MMR loop are CPU-bound; keep them off the event loop
+        selection = await asyncio.to_thread(select_messages, messages, token_budget)
+        stats = self.selection_stats.setdefault(command, {"calls": 0, "input_tokens": 0, "selected_tokens": 0})
+        stats["calls"] += 1
+        stats["input_tokens"] += selection.input_tokens
+        stats["selected_tokens"] += selection.output_tokens
+        logger.info(
+            f"Preselected {len(selection.messages)}/{len(messages)} messages for {command}: "
+            f"{selection.input_tokens} -> {selection.output_tokens} tokens"
+        )
+        return selection.messages
+
+    async def _encode_image(self, image: bytes) -> str:
+        """Downscale an in-memory photo in a worker thread and base64 it for the vision model"""
+        started = time.perf_counter()
+        payload = await asyncio.to_thread(prepare_vision_image, image)
+        self.vision_stats["images"] += 1
+        self.vision_stats["original_bytes"] += len(image)
+        self.vision_stats["payload_bytes"] += len(payload)
+        self.vision_stats["prepare_seconds"] += time.perf_counter() - started
+        logger.debug(f"Prepared vision image: {len(image)} -> {len(payload)} bytes")
+        return base64.b64encode(payload).decode('utf-8')
 
     def _split_response(self, text: str) -> list[str]:
         """Split long responses into Telegram-friendly chunks"""
@@ -79,214 +221,237 @@ class GroqService(BaseService):
             
         return parts
 
-    async def generate_ai_response(self, prompt: str, image_path: str = None, force_wiki: bool = False) -> str | list[str]:
-        try:
-            if not prompt or not prompt.strip():
-                return "Please provide a valid question or prompt."
+    def _build_request(self, prompt: str, base64_image: str = None, force_wiki: bool = False):
+        """Build the chat messages and request parameters for an /ask or /wiki prompt"""
+        messages = []
+        
+        # Prepare request parameters; the router picks the model and max tokens
+        request_params = {
+            "temperature": 0.7,  # Add temperature for more natural responses
+        }
 
-            messages = []
+        if base64_image:
+            messages.append({
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": prompt},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                ]
+            })
+        else:
+            # Add system message only for non-image requests
+            messages.append({
+                "role": "system",
+                "content": WIKI_FORMAT_PROMPT if force_wiki else ASK_SYSTEM_PROMPT
+            })
+            messages.append({"role": "user", "content": prompt})
             
-            # Choose model and max tokens based on whether we're processing an image
-            model = VISION_MODEL if image_path else TEXT_MODEL
-            max_tokens = VISION_MODEL_MAX_TOKENS if image_path else TEXT_MODEL_MAX_TOKENS
-            
-            # Prepare request parameters
-            request_params = {
-                "model": model,
-                "max_tokens": max_tokens,
-                "temperature": 0.7,  # Add temperature for more natural responses
-            }
+            # Define available tools based on force_wiki
+            request_params["tools"] = WIKI_TOOLS if force_wiki else WEATHER_TOOLS
+            request_params["tool_choice"] = "auto"
 
-            if image_path:
-                try:
-                    base64_image = self.encode_image(image_path)
-                    messages.append({
-                        "role": "user",
-                        "content": [
-                            {"type": "text", "text": prompt},
-                            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                        ]
-                    })
-                finally:
-                    self.cleanup_downloads()
-            else:
-                # Add system message only for non-image requests
-                if force_wiki:
-                    messages.append({
-                        "role": "system",
-                        "content": """Format Wikipedia content clearly:
-1. Use bold for article titles and section headings
-2. Keep emojis provided in the content
-3. Maintain proper paragraph breaks
-4. Include source links at the end
-5. For disambiguation pages, list alternatives with bullet points
-6. Highlight important dates and facts"""
-                    })
-                else:
-                    messages.append({
-                        "role": "system",
-                        "content": """Provide brief, focused responses in 2-3 sentences unless specifically asked for more detail. Be direct and highlight only the most important points.
+        request_params["messages"] = messages
+        return messages, request_params
 
-Only use tools for:
-1. Weather and Air Quality Queries:
-   - Use weather/air quality tools for current conditions
-   - Show temperatures in both °C and °F
-   - Include relevant weather emojis
-   - Format air quality data with appropriate units
+    async def _run_tool(self, name: str, args: dict):
+        if name == "wiki_search":
+            return await self.wiki_service.search_wikipedia(
+                query=args["query"],
+                limit=args.get("limit", 3)
+            )
+        elif name == "get_weather":
+            return await self.weather_service.get_current_weather(
+                location=args["location"],
+                units=args.get("units", "metric")
+            )
+        elif name == "get_forecast":
+            return await self.weather_service.get_forecast(
+                location=args["location"],
+                units=args.get("units", "metric")
+            )
+        elif name == "get_air_quality":
+            return await self.weather_service.get_air_quality(
+                location=args["location"]
+            )
+        return None
 
-For all other queries (philosophical, historical, analytical, etc.), provide a concise response without using any tools."""
-                    })
-                messages.append({"role": "user", "content": prompt})
-                
-                # Define available tools based on force_wiki
-                tools = []
-                if force_wiki:
-                    tools.append({
-                        "type": "function",
-                        "function": {
-                            "name": "wiki_search",
-                            "description": "Search Wikipedia for information",
-                            "parameters": {
-                                "type": "object",
-                                "properties": {
-                                    "query": {"type": "string", "description": "Search term"},
-                                    "limit": {"type": "integer", "default": 3}
-                                },
-                                "required": ["query"]
-                            }
-                        }
-                    })
-                else:
-                    tools.extend([
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "get_weather",
-                                "description": "Get current weather information for a location",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {
-                                        "location": {"type": "string", "description": "City name or coordinates"},
-                                        "units": {"type": "string", "enum": ["metric", "imperial"], "default": "metric"}
-                                    },
-                                    "required": ["location"]
-                                }
-                            }
-                        },
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "get_forecast",
-                                "description": "Get weather forecast for a location",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {
-                                        "location": {"type": "string", "description": "City name or coordinates"},
-                                        "units": {"type": "string", "enum": ["metric", "imperial"], "default": "metric"}
-                                    },
-                                    "required": ["location"]
-                                }
-                            }
-                        },
-                        {
-                            "type": "function",
-                            "function": {
-                                "name": "get_air_quality",
-                                "description": "Get current air quality information for a location",
-                                "parameters": {
-                                    "type": "object",
-                                    "properties": {
-                                        "location": {"type": "string", "description": "City name or coordinates"}
-                                    },
-                                    "required": ["location"]
-                                }
-                            }
-                        }
-                    ])
-                
-                if tools:
-                    request_params["tools"] = tools
-                    request_params["tool_choice"] = "auto"
+    async def _run_tool_calls(self, tool_calls: list) -> list:
+        """Run every tool call concurrently, each under its own timeout"""
+        async def run(tool_call):
+            name = tool_call["function"]["name"]
+            try:
+                args = json.loads(tool_call["function"]["arguments"] or "{}")
+                result = await asyncio.wait_for(self._run_tool(name, args), timeout=TOOL_TIMEOUT)
+                if result is None:
+                    return {"status": "error", "message": f"Unknown tool: {name}"}
+                return result
+            except asyncio.TimeoutError:
+                logger.warning(f"Tool {name} timed out after {TOOL_TIMEOUT}s")
+                return {"status": "error", "message": f"{name} timed out"}
+            except Exception as e:
+                # Let the model explain the failure instead of failing the whole answer
+                logger.error(f"Error running tool {name}: {e}")
+                return {"status": "error", "message": str(e)}
 
-            request_params["messages"] = messages
-            chat_completion = await self.client.chat.completions.create(**request_params)
+        return await asyncio.gather(*(run(tool_call) for tool_call in tool_calls))
 
-            # Handle tool calls only for non-image requests
-            if (not image_path and 
-                hasattr(chat_completion.choices[0].message, 'tool_calls') and 
-                chat_completion.choices[0].message.tool_calls):
-                
-                tool_call = chat_completion.choices[0].message.tool_calls[0]
-                args = json.loads(tool_call.function.arguments)
-                
-                tool_response = None
-                if tool_call.function.name == "wiki_search":
-                    tool_response = await self.wiki_service.search_wikipedia(
-                        query=args["query"],
-                        limit=args.get("limit", 3)
-                    )
-                elif tool_call.function.name == "get_weather":
-                    tool_response = await self.weather_service.get_current_weather(
-                        location=args["location"],
-                        units=args.get("units", "metric")
-                    )
-                elif tool_call.function.name == "get_forecast":
-                    tool_response = await self.weather_service.get_forecast(
-                        location=args["location"],
-                        units=args.get("units", "metric")
-                    )
-                elif tool_call.function.name == "get_air_quality":
-                    tool_response = await self.weather_service.get_air_quality(
-                        location=args["location"]
-                    )
-
-                if tool_response:
-                    if tool_call.function.name.startswith("wiki_"):
-                        messages.append({
-                            "role": "system",
-                            "content": """Format Wikipedia content clearly:
-1. Use bold for article titles and section headings
-2. Keep emojis provided in the content
-3. Maintain proper paragraph breaks
-4. Include source links at the end
-5. For disambiguation pages, list alternatives with bullet points
-6. Highlight important dates and facts"""
-                        })
-                    elif tool_call.function.name == "get_forecast":
-                        messages.append({
-                            "role": "system",
-                            "content": """Format forecast data clearly:
-1. Group by date with clear headings
-2. Show temperatures in both units
-3. Include weather emojis for conditions
-4. Show precipitation chances
-5. Use proper spacing and time periods"""
-                        })
-                    
-                    messages.extend([
-                        {"role": "assistant", "content": None, "tool_calls": [tool_call]},
-                        {"role": "tool", "tool_call_id": tool_call.id, "content": json.dumps(tool_response)}
-                    ])
-                    
-                    # Add system message for formatting air quality responses
-                    if tool_call.function.name == "get_air_quality":
-                        messages.append({
-                            "role": "system",
-                            "content": """Format air quality data clearly:
-1. Show AQI rating with emoji
-2. List all pollutants with units
-3. Include health recommendations if available
-4. Use proper spacing and formatting"""
-                        })
-                    
-                    final_response = await self.client.chat.completions.create(
-                        messages=messages,
-                        model=TEXT_MODEL  # Use TEXT_MODEL for final response
-                    )
-                    return final_response.choices[0].message.content
+    def _append_tool_messages(self, messages: list, tool_calls: list, tool_responses: list,
+                              state: dict = None) -> None:
+        """Add the tool calls, their results and tool-specific formatting instructions"""
+        if state is not None and any(
+                isinstance(response, dict) and response.get("status") == "error" for response in tool_responses):
+            state["tool_error"] = True
+        names = {tool_call["function"]["name"] for tool_call in tool_calls}
+        if any(name.startswith("wiki_") for name in names):
+            messages.append({"role": "system", "content": WIKI_FORMAT_PROMPT})
+        if "get_forecast" in names:
+            messages.append({"role": "system", "content": FORECAST_FORMAT_PROMPT})
+        
+        messages.append({"role": "assistant", "content": None, "tool_calls": tool_calls})
+        for tool_call, tool_response in zip(tool_calls, tool_responses):
+            name = tool_call["function"]["name"]
+            content, tokens_before, tokens_after = compact_tool_result(name, tool_response)
+            stats = self.tool_result_stats.setdefault(name, {"calls": 0, "tokens_before": 0, "tokens_after": 0})
+            stats["calls"] += 1
+            stats["tokens_before"] += tokens_before
+            stats["tokens_after"] += tokens_after
+            logger.debug(f"Compacted {name} result: {tokens_before} -> {tokens_after} tokens")
+            messages.append({"role": "tool", "tool_call_id": tool_call["id"], "content": content})
+        
+        # Add system message for formatting air quality responses
+        if "get_air_quality" in names:
+            messages.append({"role": "system", "content": AIR_QUALITY_FORMAT_PROMPT})
+
+    async def stream_ai_response(self, prompt: str, image: bytes = None, force_wiki: bool = False):
+        """Yield the response text as it is generated, running a tool if the model asks for one"""
+        if not prompt or not prompt.strip():
+            raise ValueError("Please provide a valid question or prompt.")
+
+        if force_wiki:
+            key = self.response_cache.make_key("wiki", prompt, TEXT_MODEL, WIKI_FORMAT_PROMPT)
+            state = {}
+            async for delta in self._cached_stream(
+                    "wiki", key, lambda: self._stream_answer(prompt, None, True, state), state):
+                yield delta
+            return
+
+        async for delta in self._stream_answer(prompt, image, False):
+            yield delta
+
+    async def _stream_answer(self, prompt: str, image: bytes = None, force_wiki: bool = False, state: dict = None):
+        """Stream an /ask, /wiki or vision answer; state["tool_error"] is set if any tool call failed"""
+        state = {} if state is None else state
+        base64_image = await self._encode_image(image) if image else None
+        messages, request_params = self._build_request(prompt, base64_image, force_wiki)
+        
+        # Reuse the tool plan of an identical recent weather question
+        plan_key = None
+        tool_calls = []
+        if not image and not force_wiki:
+            plan_key = self.response_cache.make_key("ask_plan", prompt, TEXT_MODEL, ASK_SYSTEM_PROMPT)
+            tool_calls = self.response_cache.get("ask_plan", plan_key) or []
+
+        command = "vision" if image else "wiki" if force_wiki else "ask"
+        if not tool_calls:
+            async for delta in self._stream_completion(command, request_params, tool_calls, state):
+                yield delta
+            # Only tool-backed answers are deterministic enough to cache
+            if plan_key and tool_calls and not state.get("degraded"):
+                self.response_cache.set("ask_plan", plan_key, tool_calls)
+
+        # Handle tool calls only for non-image requests
+        if image or not tool_calls:
+            return
+
+        tool_responses = await self._run_tool_calls(tool_calls)
+        self._append_tool_messages(messages, tool_calls, tool_responses, state)
+        followup = lambda: self._stream_after_tools(
+            "wiki" if force_wiki else "ask_tools", messages, request_params.get("tools"), state
+        )
+
+        if force_wiki:
+            # The whole /wiki answer is cached by stream_ai_response
+            async for delta in followup():
+                yield delta
+            return
+
+        key = self.response_cache.make_key(
+            "ask_tools", prompt, TEXT_MODEL, ASK_SYSTEM_PROMPT, digest(tool_responses)
+        )
+        async for delta in self._cached_stream("ask_tools", key, followup, state):
+            yield delta
+
+    async def _stream_after_tools(self, command: str, messages: list, tools: list = None, state: dict = None):
+        """Stream follow-up completions, running further tool rounds up to MAX_TOOL_ITERATIONS"""
+        # The first tool round already ran in _stream_answer
+        for iteration in range(2, MAX_TOOL_ITERATIONS + 2):
+            request_params = {"messages": messages}
+            # Offer tools again until the budget is spent, then force a plain answer
+            if tools and iteration <= MAX_TOOL_ITERATIONS:
+                request_params["tools"] = tools
+                request_params["tool_choice"] = "auto"
+
+            tool_calls = []
+            async for delta in self._stream_completion(command, request_params, tool_calls, state):
+                yield delta
+            if not tool_calls:
+                return
+
+            logger.debug(f"Tool round {iteration}: {[call['function']['name'] for call in tool_calls]}")
+            tool_responses = await self._run_tool_calls(tool_calls)
+            self._append_tool_messages(messages, tool_calls, tool_responses, state)
+
+    async def _cached_stream(self, command: str, key: str, stream_factory, state: dict = None):
+        """Serve a cached response in one piece, or stream and cache a fresh one.
+
+        Nothing is cached if the stream set state["tool_error"] or state["degraded"]:
+        an answer built on a failed tool call, or served by a fallback model, must
+        not be served for the whole TTL under the primary model's key.
+        """
+        cached = self.response_cache.get(command, key)
+        if cached is not None:
+            yield cached
+            return
+
+        parts = []
+        async for delta in stream_factory():
+            parts.append(delta)
+            yield delta
+        text = "".join(parts).strip()
+        if text and not (state and (state.get("tool_error") or state.get("degraded"))):
+            self.response_cache.set(command, key, text)
+
+    async def _stream_completion(self, command: str, request_params: dict, tool_calls: list, state: dict = None):
+        """Stream a routed completion and collect any tool calls into the given list"""
+        calls = {}
+        stream = await self.router.create(command, stream=True, state=state, **request_params)
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            for call in delta.tool_calls or []:
+                entry = calls.setdefault(call.index, {
+                    "id": None, "type": "function", "function": {"name": "", "arguments": ""}
+                })
+                if call.id:
+                    entry["id"] = call.id
+                if call.function and call.function.name:
+                    entry["function"]["name"] += call.function.name
+                if call.function and call.function.arguments:
+                    entry["function"]["arguments"] += call.function.arguments
+            if delta.content:
+                yield delta.content
+        tool_calls.extend(calls[index] for index in sorted(calls))
+
+    async def generate_ai_response(self, prompt: str, image: bytes = None, force_wiki: bool = False) -> str | list[str]:
+        try:
+            if not prompt or not prompt.strip():
+                return "Please provide a valid question or prompt."
+
+            parts = [delta async for delta in self.stream_ai_response(prompt, image, force_wiki)]
 
             # Add validation for the response
-            response = chat_completion.choices[0].message.content
+            response = "".join(parts)
             if not response or not response.strip():
                 return "I received an empty response. Please try asking your question differently."
 
@@ -300,112 +465,93 @@ For all other queries (philosophical, historical, analytical, etc.), provide a c
             logger.error(f"Error generating AI response: {e}")
             return f"I encountered an error while processing your request: {str(e)}"
 
+    def summary_chunk_tokens(self) -> int:
+        """Message tokens per map call: the context-based cap, lowered to fit the TPM limits"""
+        return max(1, min(
+            self.chunker.chunk_budget,
+            self.router.max_input_tokens("summary_map") - SUMMARY_PROMPT_TOKENS
+        ))
+
+    async def summarize_messages(self, messages, time_range=None) -> str:
+        """Chunk and summarize messages, returning a single summary string"""
+        chunk_tokens = self.summary_chunk_tokens()
+        # Take only the most recent messages if we have too many
+        messages = messages[-MAX_SUMMARY_MESSAGES:]
+        # Drop noise and near-duplicates, keeping a representative subset
+        messages = await self.preselect("summary", messages, min(SUMMARY_SELECT_TOKENS, chunk_tokens))
+        
+        # Pack whole messages into chunks that fit the context window and TPM budget
+        chunks = self.chunker.chunk(messages, max_tokens=chunk_tokens)
+        logger.debug(
+            f"Summarizing {len(messages)} messages in {len(chunks)} chunks "
+            f"(~{sum(chunk.tokens for chunk in chunks)} tokens)"
+        )
+            
+        # Summarize chunks concurrently and reduce the partial summaries
+        return await self.summarizer.summarize([chunk.text for chunk in chunks], time_range)
+
+    async def stream_summary(self, messages, time_range=None, cache_as: str = None):
+        """Yield the final summary text as it is generated, optionally cached per command"""
+        messages = messages[-MAX_SUMMARY_MESSAGES:]
+        chunks = self.chunker.chunk(messages, max_tokens=self.summary_chunk_tokens())
+        state = {}
+        stream_factory = lambda: self.summarizer.summarize_stream([chunk.text for chunk in chunks], time_range, state)
+
+        if not cache_as:
+            async for delta in stream_factory():
+                yield delta
+            return
+
+        key = self.response_cache.make_key(cache_as, "\n".join(messages), TEXT_MODEL, MAP_PROMPT, time_range or "")
+        async for delta in self._cached_stream(cache_as, key, stream_factory, state):
+            yield delta
+
     async def generate_summary(self, messages, time_range=None):
         if not messages:
             return "No messages to summarize."
             
         try:
-            # Limit and chunk messages for processing
-            MAX_MESSAGES = 1000  # Maximum messages to process
-            MAX_CHUNK_SIZE = 15000  # Characters per chunk
-            
-            # Take only the most recent messages if we have too many
-            messages = messages[-MAX_MESSAGES:]
-            
-            # Join messages and split into chunks
-            input_text = " ".join(messages)
-            chunks = []
-            current_chunk = ""
-            
-            for message in input_text.split('\n'):
-                if len(current_chunk) + len(message) > MAX_CHUNK_SIZE:
-                    chunks.append(current_chunk)
-                    current_chunk = message
-                else:
-                    current_chunk += "\n" + message if current_chunk else message
-                    
-            if current_chunk:
-                chunks.append(current_chunk)
-                
-            # Process each chunk
-            summaries = []
-            for chunk in chunks:
-                system_prompt = """Provide a very concise summary of this chat conversation fragment.
-Focus on main topics and key points only.
-Keep the summary short and direct.
-Avoid mentioning timestamps or specific details."""
-
-                response = await self.client.chat.completions.create(
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": f"Summarize these messages{f' from {time_range}' if time_range else ''}:\n\n{chunk}"}
-                    ],
-                    model=TEXT_MODEL,
-                    max_tokens=2000,
-                    temperature=0.7
-                )
-                
-                summaries.append(response.choices[0].message.content.strip())
-                
-            # If we have multiple summaries, combine them
-            if len(summaries) > 1:
-                final_summary = await self.client.chat.completions.create(
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Combine these summary fragments into one coherent, concise summary. Focus on the main points and remove any redundancy."
-                        },
-                        {
-                            "role": "user",
-                            "content": "\n\n".join(summaries)
-                        }
-                    ],
-                    model=TEXT_MODEL,
-                    max_tokens=2000,
-                    temperature=0.7
-                )
-                summary = final_summary.choices[0].message.content.strip()
-            else:
-                summary = summaries[0] if summaries else "No meaningful content to summarize."
-                
-            # Split if exceeds Telegram's limit
-            if len(summary) > TELEGRAM_MAX_LENGTH:
-                return self._split_response(summary)
-            return summary
+            summary = await self.summarize_messages(messages, time_range)
+            return self.format_summary(summary or EMPTY_SUMMARY_MESSAGE)
                 
         except Exception as e:
             logger.error(f"Error generating summary: {e}", exc_info=True)
             # Return a more specific error message
             return f"Could not generate summary: {str(e)[:100]}... Please try with a shorter time range or fewer messages."
 
+    def format_summary(self, summary: str) -> str | list[str]:
+        """Split a summary if it exceeds Telegram's limit"""
+        if len(summary) > TELEGRAM_MAX_LENGTH:
+            return self._split_response(summary)
+        return summary
+
+    def get_stats(self):
+        return {
+            "client": self.client.get_stats(),
+            "router": self.router.get_stats(),
+            "vision": dict(self.vision_stats),
+            "tool_results": dict(self.tool_result_stats),
+            "preselection": {
+                command: {**stats, "reduction": 1 - stats["selected_tokens"] / stats["input_tokens"]
+                          if stats["input_tokens"] else 0.0}
+                for command, stats in self.selection_stats.items()
+            },
+            "summarizer": self.summarizer.get_stats()
+        }
+
+    async def stream_greentext(self, prompt: str):
+        """Yield a greentext story as it is generated"""
+        messages = [
+            {"role": "system", "content": GREENTEXT_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+        async for delta in self._stream_completion("greentext", {"messages": messages}, []):
+            yield delta
+
     async def generate_greentext(self, prompt: str) -> str:
-        # Update greentext generation to use TEXT_MODEL
         try:
-            messages = [
-                {
-                    "role": "system",
-                    "content": """You are a 4chan greentext story generator. Create a short, humorous story in greentext format following these rules:
-1. Each line must start with '>'
-2. Keep it concise and entertaining
-3. Use first-person perspective
-4. Include typical 4chan storytelling elements and humor
-5. Keep it relatively short (5-10 lines)
-6. Make it relate to the given prompt
-7. Use common 4chan terminology and style
-8. End with some kind of punchline or twist"""
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ]
-
-            response = await self.client.chat.completions.create(
-                messages=messages,
-                model=TEXT_MODEL,  # Use TEXT_MODEL for greentext
-            )
-
-            return response.choices[0].message.content.strip()
+            parts = [delta async for delta in self.stream_greentext(prompt)]
+            return "".join(parts).strip()
 
         except Exception as e:
             logger.error(f"Error generating greentext: {e}")
@@ -434,16 +580,3 @@ Avoid mentioning timestamps or specific details."""
         except Exception as e:
             logger.error(f"Error retrieving messages: {e}")
             return []
-
-# Create functions for direct import
-def generate_ai_response(prompt):
-    service = GroqService()
-    return service.generate_ai_response(prompt)
-
-def get_user_messages(user_id, limit=50):
-    service = GroqService()
-    return service.get_user_messages(user_id, limit)
-
-def get_messages_last_24_hours():
-    service = GroqService()
-    return service.get_messages_last_24_hours()
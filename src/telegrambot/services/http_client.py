@@ -0,0 +1,90 @@
+import time
+import logging
+from collections import defaultdict, deque
+from typing import Any, Dict, Optional
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HTTP_MAX_CONNECTIONS = 100
+HTTP_MAX_CONNECTIONS_PER_HOST = 10
+HTTP_DNS_CACHE_TTL = 300  # Seconds
+HTTP_KEEPALIVE_TIMEOUT = 30  # Seconds an idle pooled connection is kept open
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=15, connect=5, sock_read=10)
+HTTP_USER_AGENT = "TelegramBot/1.0"
+LATENCY_SAMPLES = 200  # Recent requests kept per host
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class HttpClient:
+    """One pooled aiohttp session shared by every HTTP-based service.
+
+    Connections are kept alive and reused per host, DNS lookups are cached
+    and every request gets default timeouts. Request latency is traced per
+    host. The session is created lazily on the running event loop and closed
+    by the ServiceContainer on shutdown.
+    """
+
+    def __init__(self, limit: int = HTTP_MAX_CONNECTIONS, limit_per_host: int = HTTP_MAX_CONNECTIONS_PER_HOST,
+                 timeout: aiohttp.ClientTimeout = HTTP_TIMEOUT):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+        self._counts = defaultdict(lambda: {"requests": 0, "errors": 0})
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            trace_config = aiohttp.TraceConfig()
+            trace_config.on_request_start.append(self._on_request_start)
+            trace_config.on_request_end.append(self._on_request_end)
+            trace_config.on_request_exception.append(self._on_request_exception)
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.limit,
+                    limit_per_host=self.limit_per_host,
+                    ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                    keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+                ),
+                timeout=self.timeout,
+                headers={"User-Agent": HTTP_USER_AGENT},
+                trace_configs=[trace_config]
+            )
+        return self._session
+
+    async def _on_request_start(self, session, context, params) -> None:
+        context.started = time.perf_counter()
+
+    async def _on_request_end(self, session, context, params) -> None:
+        host = params.url.host
+        self._latencies[host].append(time.perf_counter() - context.started)
+        self._counts[host]["requests"] += 1
+        if params.response.status >= 500:
+            self._counts[host]["errors"] += 1
+
+    async def _on_request_exception(self, session, context, params) -> None:
+        host = params.url.host
+        self._counts[host]["requests"] += 1
+        self._counts[host]["errors"] += 1
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            host: {
+                **counts,
+                "p50": _percentile(self._latencies[host], 0.5),
+                "p95": _percentile(self._latencies[host], 0.95),
+            }
+            for host, counts in self._counts.items()
+        }
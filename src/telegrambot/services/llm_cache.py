@@ -0,0 +1,99 @@
+import re
+import json
+import hashlib
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+from pymongo import ASCENDING
+from .mongodb_service import MongoDBService
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached response stays valid, per command
+LLM_CACHE_TTLS = {
+    "wiki": 24 * 3600,  # Wikipedia articles rarely change within a day
+    "tldr": 7 * 24 * 3600,  # Same text, same summary
+    "ask_tools": 10 * 60,  # Weather and air quality refresh every ~10 minutes
+    "ask_plan": 3600,  # Which tools a question needs
+}
+LLM_CACHE_MAX_ENTRIES = 512
+
+
+def normalize_prompt(text: str) -> str:
+    """Normalize case and whitespace so trivially different prompts share a key"""
+    return re.sub(r"\s+", " ", text or "").strip().lower()
+
+
+def digest(value: Any) -> str:
+    """Stable digest of a JSON-serialisable value (e.g. tool results)"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-level cache for deterministic LLM responses.
+
+    L1 is a bounded in-memory LRU; L2 is a Mongo collection with a TTL index so
+    entries survive restarts and expire on their own.
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, maxsize: int = LLM_CACHE_MAX_ENTRIES):
+        self.memory = TTLCache(maxsize=maxsize)
+        self.collection = mongodb_service.get_collection('llm_cache')
+        self.collection.create_index([('expires_at', ASCENDING)], expireAfterSeconds=0)
+        self.stats = defaultdict(lambda: {"l1_hits": 0, "l2_hits": 0, "misses": 0, "stores": 0})
+
+    @staticmethod
+    def make_key(command: str, prompt: str, model: str, system_prompt: str = "", tool_digest: str = "") -> str:
+        return digest([command, normalize_prompt(prompt), model, system_prompt, tool_digest])
+
+    def get(self, command: str, key: str) -> Optional[Any]:
+        """Return a cached value from memory or Mongo, or None"""
+        stats = self.stats[command]
+        value = self.memory.get(key)
+        if value is not None:
+            stats["l1_hits"] += 1
+            return value
+
+        try:
+            doc = self.collection.find_one({'_id': key})
+        except Exception as e:
+            logger.error(f"Error reading LLM cache: {e}")
+            doc = None
+
+        # Mongo's TTL monitor runs once a minute, so check expiry ourselves too
+        if doc and doc['expires_at'].replace(tzinfo=timezone.utc) > datetime.now(timezone.utc):
+            remaining = (doc['expires_at'].replace(tzinfo=timezone.utc) - datetime.now(timezone.utc)).total_seconds()
+            self.memory.set(key, doc['value'], ttl=remaining)
+            stats["l2_hits"] += 1
+            return doc['value']
+
+        stats["misses"] += 1
+        return None
+
+    def set(self, command: str, key: str, value: Any) -> None:
+        """Store a value in both levels with the command's TTL"""
+        ttl = LLM_CACHE_TTLS.get(command, 3600)
+        self.memory.set(key, value, ttl=ttl)
+        try:
+            self.collection.update_one(
+                {'_id': key},
+                {'$set': {
+                    'command': command,
+                    'value': value,
+                    'expires_at': datetime.now(timezone.utc) + timedelta(seconds=ttl)
+                }},
+                upsert=True
+            )
+            self.stats[command]["stores"] += 1
+        except Exception as e:
+            logger.error(f"Error writing LLM cache: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {"memory": self.memory.get_stats()}
+        for command, counters in self.stats.items():
+            lookups = counters["l1_hits"] + counters["l2_hits"] + counters["misses"]
+            hits = counters["l1_hits"] + counters["l2_hits"]
+            stats[command] = {**counters, "hit_rate": hits / lookups if lookups else 0.0}
+        return stats
@@ -0,0 +1,243 @@
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+from groq import APIConnectionError, APIStatusError
+from .groq_client import RateLimitedGroqClient, PRIORITY_INTERACTIVE
+from .summary_engine import SUMMARY_MAX_TOKENS
+from ..utils.token_utils import count_message_tokens, fit_max_tokens
+
+logger = logging.getLogger(__name__)
+
+TEXT_MODEL = "llama-3.3-70b-versatile"
+FAST_TEXT_MODEL = "llama-3.1-8b-instant"
+VISION_MODEL = "llama-3.2-90b-vision-preview"
+
+HEALTH_WINDOW = 50  # Recent calls per model used for latency and error rates
+HEALTH_MAX_AGE = 600  # Seconds a call counts towards a model's health
+HEALTH_PROBE_INTERVAL = 60  # Seconds between trial calls to a primary demoted for latency or errors
+ROUTE_LATENCY_SAMPLES = 500
+MIN_HEALTH_SAMPLES = 5  # Calls needed before a model can be judged slow or failing
+MAX_ERROR_RATE = 0.3
+FALLBACK_RETRIES = 1  # Retries on the primary when a fallback model is available
+
+
+class Route(NamedTuple):
+    primary: str
+    fallback: Optional[str]
+    max_tokens: int  # Output cap for the command
+    latency_budget: float  # Seconds; a primary slower than this at p95 is skipped
+    max_fast_input_tokens: Optional[int] = None  # Larger inputs go to the fallback model
+
+
+# Per-command routing. Short, low-stakes generations go to the fast model
+# unless their input is large; user-facing answers prefer the large model.
+ROUTES = {
+    "ask": Route(TEXT_MODEL, FAST_TEXT_MODEL, max_tokens=1024, latency_budget=4.0),
+    "ask_tools": Route(TEXT_MODEL, FAST_TEXT_MODEL, max_tokens=1024, latency_budget=4.0),
+    "wiki": Route(TEXT_MODEL, FAST_TEXT_MODEL, max_tokens=2048, latency_budget=6.0),
+    "vision": Route(VISION_MODEL, None, max_tokens=1024, latency_budget=10.0),
+    "greentext": Route(FAST_TEXT_MODEL, TEXT_MODEL, max_tokens=1024, latency_budget=3.0,
+                       max_fast_input_tokens=2000),
+    "summary_map": Route(FAST_TEXT_MODEL, TEXT_MODEL, max_tokens=SUMMARY_MAX_TOKENS, latency_budget=8.0,
+                         max_fast_input_tokens=16000),
+    "summary_reduce": Route(TEXT_MODEL, FAST_TEXT_MODEL, max_tokens=SUMMARY_MAX_TOKENS, latency_budget=8.0),
+    "persona": Route(TEXT_MODEL, FAST_TEXT_MODEL, max_tokens=1024, latency_budget=8.0),
+}
+DEFAULT_ROUTE = ROUTES["ask"]
+
+
+def _percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ModelHealth:
+    """Latency and error rate of one model over its recent calls"""
+
+    def __init__(self, window: int = HEALTH_WINDOW, max_age: float = HEALTH_MAX_AGE):
+        self.max_age = max_age
+        self.samples = deque(maxlen=window)  # (monotonic time, latency, ok)
+        self.last_chosen = time.monotonic()
+
+    def record(self, latency: float, ok: bool) -> None:
+        self.samples.append((time.monotonic(), latency, ok))
+
+    def _recent(self):
+        # Old samples expire, so a model judged slow or failing is re-evaluated
+        cutoff = time.monotonic() - self.max_age
+        while self.samples and self.samples[0][0] < cutoff:
+            self.samples.popleft()
+        return self.samples
+
+    @property
+    def calls(self) -> int:
+        return len(self._recent())
+
+    @property
+    def error_rate(self) -> float:
+        samples = self._recent()
+        return sum(1 for _, _, ok in samples if not ok) / len(samples) if samples else 0.0
+
+    def latencies(self):
+        return [latency for _, latency, ok in self._recent() if ok]
+
+    def p95(self) -> float:
+        return _percentile(self.latencies(), 0.95)
+
+    def probe_due(self) -> bool:
+        """Whether a demoted model has gone unused long enough to deserve a trial call"""
+        return time.monotonic() - self.last_chosen >= HEALTH_PROBE_INTERVAL
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "error_rate": self.error_rate,
+            "p50": _percentile(self.latencies(), 0.5),
+            "p95": self.p95(),
+        }
+
+
+class ModelRouter:
+    """Chooses the model and output cap for each LLM call.
+
+    The choice depends on the command's route, the input size and the recent
+    latency and error rate of each model. A rate-limited, slow or failing
+    primary is swapped for the route's fallback, and a request that errors
+    on the chosen model is retried once on the alternate.
+    """
+
+    def __init__(self, client: RateLimitedGroqClient):
+        self.client = client
+        self.health = defaultdict(ModelHealth)
+        self._route_latencies = defaultdict(lambda: deque(maxlen=ROUTE_LATENCY_SAMPLES))
+        self._decisions = defaultdict(lambda: defaultdict(int))
+
+    def _unhealthy(self, model: str, route: Route) -> Optional[str]:
+        """Why a model should be avoided right now, or None"""
+        if self.client.is_limited(model):
+            return "rate-limited"
+        health = self.health[model]
+        if health.calls >= MIN_HEALTH_SAMPLES:
+            if health.error_rate > MAX_ERROR_RATE:
+                return f"error rate {health.error_rate:.0%}"
+            if health.p95() > route.latency_budget:
+                return f"p95 {health.p95():.1f}s"
+        return None
+
+    def choose(self, command: str, input_tokens: int) -> Tuple[str, Optional[str], int]:
+        """
+        Pick the model for a command.
+
+        Args:
+            command (str): Route name, e.g. "ask" or "summary_map"
+            input_tokens (int): Estimated prompt tokens
+
+        Returns:
+            Tuple[str, Optional[str], int]: Chosen model, alternate model, output cap
+        """
+        route = ROUTES.get(command, DEFAULT_ROUTE)
+        model, alternate = self._sized(route, input_tokens)
+        reason = "primary" if model == route.primary else f"input {input_tokens} tokens"
+
+        if model == route.primary and alternate:
+            problem = self._unhealthy(model, route)
+            if problem and problem != "rate-limited" and self.health[model].probe_due():
+                # Without a trial call now and then a demoted primary would never get new samples
+                reason = f"probe ({problem})"
+                self._decisions[command]["probes"] += 1
+            elif problem and not self._unhealthy(alternate, route):
+                model, alternate = alternate, model
+                reason = f"primary {problem}"
+
+        self.health[model].last_chosen = time.monotonic()
+
+        logger.debug(f"Route {command}: {model} ({reason}, input {input_tokens} tokens)")
+        return model, alternate, route.max_tokens
+
+    @staticmethod
+    def _sized(route: Route, input_tokens: int) -> Tuple[str, Optional[str]]:
+        """The route's (model, alternate) for this input size, ignoring model health"""
+        if route.max_fast_input_tokens and route.fallback and input_tokens > route.max_fast_input_tokens:
+            return route.fallback, route.primary
+        return route.primary, route.fallback
+
+    def max_input_tokens(self, command: str) -> int:
+        """Largest prompt that fits the TPM budget of every model the command may be routed to"""
+        route = ROUTES.get(command, DEFAULT_ROUTE)
+        return min(
+            self.client.max_input_tokens(model, route.max_tokens)
+            for model in (route.primary, route.fallback) if model
+        )
+
+    async def create(self, command: str, priority: int = PRIORITY_INTERACTIVE, state: Optional[Dict] = None,
+                     **params) -> Any:
+        """
+        Send a chat completion on the model chosen for the command.
+
+        Latency is measured from when the client admits the request (so time
+        spent waiting for rate limit budget is excluded) until the response
+        (or, for streams, the response headers) arrives, so streamed calls are
+        compared by time to first byte.
+
+        Args:
+            command (str): Route name
+            priority (int): Queue priority passed to the client
+            state (Optional[Dict]): Gets state["degraded"] = True if a model other than
+                the route's choice for this input size served the call
+            **params: chat.completions.create arguments without model/max_tokens
+
+        Returns:
+            Any: ChatCompletion or stream
+        """
+        messages = params["messages"]
+        input_tokens = count_message_tokens(messages)
+        model, alternate, cap = self.choose(command, input_tokens)
+
+        for candidate in (model, alternate):
+            if candidate is None:
+                break
+            timings = {}
+            try:
+                response = await self.client.create(
+                    priority=priority,
+                    timings=timings,
+                    max_retries=FALLBACK_RETRIES if candidate == model and alternate else None,
+                    model=candidate,
+                    max_tokens=fit_max_tokens(candidate, messages, cap),
+                    **params
+                )
+            except (APIStatusError, APIConnectionError) as e:
+                if "admitted" in timings:
+                    self.health[candidate].record(time.perf_counter() - timings["admitted"], ok=False)
+                if candidate != model or alternate is None or (
+                        isinstance(e, APIStatusError) and e.status_code < 500 and e.status_code != 429):
+                    raise
+                logger.warning(f"Route {command}: {candidate} failed ({e}), falling back to {alternate}")
+                self._decisions[command]["fallbacks"] += 1
+                continue
+
+            latency = time.perf_counter() - timings["admitted"]
+            self.health[candidate].record(latency, ok=True)
+            self._route_latencies[(command, candidate)].append(latency)
+            self._decisions[command][candidate] += 1
+            logger.info(f"Route {command}: {candidate} answered in {latency:.2f}s")
+            if state is not None and candidate != self._sized(ROUTES.get(command, DEFAULT_ROUTE), input_tokens)[0]:
+                state["degraded"] = True
+            return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        routes = {}
+        for (command, model), samples in self._route_latencies.items():
+            routes[f"{command}:{model}"] = {
+                "count": len(samples),
+                "p50": _percentile(samples, 0.5),
+                "p95": _percentile(samples, 0.95),
+            }
+        return {
+            "decisions": {command: dict(counts) for command, counts in self._decisions.items()},
+            "routes": routes,
+            "models": {model: health.get_stats() for model, health in self.health.items()},
+        }
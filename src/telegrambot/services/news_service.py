@@ -1,16 +1,55 @@
-import os
-import time
-from typing import Optional, Dict
-import requests
-from datetime import datetime, timedelta
+import re
+from typing import Dict, List, Set
+import aiohttp
 import logging
-from ..config.settings import NEWS_API_KEY
+from ..utils.cache import TTLCache
 from .base_service import BaseService
+from .http_client import HttpClient
 
 logger = logging.getLogger(__name__)
 
+NEWS_CACHE_TTL = 600  # Seconds a query's articles are reused
+NEWS_TIMEOUT = aiohttp.ClientTimeout(total=8, connect=3)
+NEWS_FETCH_FACTOR = 4  # Articles fetched per article shown, to leave room for duplicates
+NEWS_MAX_PAGE_SIZE = 50
+TITLE_SIMILARITY = 0.6  # Word-set Jaccard at which two titles count as the same story
+WORD_PATTERN = re.compile(r"[^\W_]+")
+
+
+def _title_words(title: str) -> Set[str]:
+    # NewsAPI titles usually end in " - Publisher"
+    title = re.sub(r"\s+[-|–]\s+[^-|–]+$", "", title or "")
+    return set(WORD_PATTERN.findall(title.lower()))
+
+
+def dedupe_articles(articles: List[Dict], limit: int) -> List[Dict]:
+    """
+    Drop syndicated copies of the same story, keeping the first (newest) one.
+
+    Args:
+        articles (List[Dict]): NewsAPI articles, newest first
+        limit (int): Maximum number of articles to return
+
+    Returns:
+        List[Dict]: Up to limit articles with distinct titles
+    """
+    kept, kept_words = [], []
+    for article in articles:
+        words = _title_words(article.get('title'))
+        if not words or article.get('title') == '[Removed]':
+            continue
+        if any(len(words & other) / len(words | other) >= TITLE_SIMILARITY for other in kept_words):
+            continue
+        kept.append(article)
+        kept_words.append(words)
+        if len(kept) >= limit:
+            break
+    return kept
+
+
 class NewsService(BaseService):
-    def __init__(self, api_key_file: str):
+    def __init__(self, api_key_file: str, http_client: HttpClient):
+        self.http = http_client
         try:
             with open(api_key_file, 'r') as f:
                 self.api_key = f.read().strip()
@@ -20,32 +59,52 @@ class NewsService(BaseService):
             self.api_key = None
         super().__init__()
         self.base_url = "https://newsapi.org/v2/everything"
+        self.cache = TTLCache(maxsize=256, ttl=NEWS_CACHE_TTL)
+        self.stats = {"api_calls": 0, "articles_fetched": 0}
 
-    def fetch_news(self, query, limit=5):
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        return re.sub(r"\s+", " ", query or "").strip().lower()
+
+    async def _fetch_articles(self, query: str, limit: int) -> List[Dict]:
+        params = {
+            'q': query,
+            'apiKey': self.api_key,
+            'language': 'en',
+            'sortBy': 'publishedAt',
+            'pageSize': min(limit * NEWS_FETCH_FACTOR, NEWS_MAX_PAGE_SIZE)
+        }
+        self.stats["api_calls"] += 1
+        async with self.http.session.get(self.base_url, params=params, timeout=NEWS_TIMEOUT) as response:
+            data = await response.json()
+            if response.status != 200:
+                raise Exception(data.get('message', f"HTTP {response.status}"))
+
+        articles = data.get('articles', [])
+        self.stats["articles_fetched"] += len(articles)
+        return dedupe_articles(articles, limit)
+
+    async def fetch_news(self, query, limit=5):
         """Fetch news articles based on query"""
         try:
-            params = {
-                'q': query,
-                'apiKey': self.api_key,
-                'language': 'en',
-                'sortBy': 'publishedAt',
-                'pageSize': limit
-            }
-            
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            
-            articles = response.json().get('articles', [])
-            
+            key = (self.normalize_query(query), limit)
+            articles = self.cache.get(key)
+            if articles is None:
+                articles = await self._fetch_articles(key[0], limit)
+                self.cache.set(key, articles)
+
             if not articles:
                 return f"No news found for: {query}"
-            
+
             news_text = f"📰 Latest news for: {query}\n\n"
             for article in articles:
                 news_text += f"• {article['title']}\n{article['url']}\n\n"
-            
+
             return news_text.strip()
-            
+
         except Exception as e:
             self.logger.error(f"Error fetching news: {e}")
             return f"Error fetching news: {str(e)}"
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "cache": self.cache.get_stats()}
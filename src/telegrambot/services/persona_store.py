@@ -0,0 +1,129 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING
+from .mongodb_service import MongoDBService
+from .groq_client import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from .model_router import ROUTES, TEXT_MODEL
+from ..utils.token_utils import TokenBudgetChunker, count_tokens
+
+logger = logging.getLogger(__name__)
+
+PERSONA_MAX_NEW_MESSAGES = 1000  # Most recent unseen messages folded in per update
+PERSONA_FOLD_TOKENS = 6000  # Upper bound on message tokens per fold call; lowered to fit the TPM limit
+PERSONA_BACKGROUND_MIN_NEW = 20  # New messages before the background job refreshes a profile
+PERSONA_ACTIVE_WINDOW = timedelta(hours=1)
+
+PERSONA_PROMPT = """You maintain a short profile of one chat member based on their messages.
+Update the existing profile with the new messages: their main topics and interests, opinions,
+tone and typical way of writing. Keep what is still true, drop what the new messages contradict.
+Reply with the updated profile only, in a few short paragraphs."""
+
+
+class UserPersonaStore:
+    """Per-user profile summaries, updated incrementally from a message checkpoint.
+
+    Each profile stores the timestamp of the last message folded into it; an
+    update only sends the messages written since then together with the
+    current profile, so /me and /you cost one small call or a database read.
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, groq_service):
+        self.messages = mongodb_service.messages
+        self.collection = mongodb_service.get_collection('user_personas')
+        self.groq_service = groq_service
+        # Prompt plus the current profile, which is at most one completion long
+        self.prompt_tokens = count_tokens(PERSONA_PROMPT) + ROUTES["persona"].max_tokens + 64
+        self.chunker = TokenBudgetChunker(
+            TEXT_MODEL,
+            prompt_tokens=self.prompt_tokens,
+            output_tokens=ROUTES["persona"].max_tokens,
+            max_chunk_tokens=PERSONA_FOLD_TOKENS
+        )
+        self._inflight: Dict[int, asyncio.Task] = {}
+        self.stats = {"cache_reads": 0, "updates": 0, "fold_calls": 0, "messages_folded": 0}
+        self.collection.create_index([('last_timestamp', ASCENDING)])
+
+    def _new_messages(self, user_id: int, since: Optional[datetime]) -> List[Dict]:
+        query = {'user_id': user_id, 'message_text': {'$exists': True, '$ne': ''}}
+        if since:
+            query['timestamp'] = {'$gt': since}
+        cursor = self.messages.find(query, {'message_text': 1, 'timestamp': 1}) \
+            .sort('timestamp', DESCENDING).limit(PERSONA_MAX_NEW_MESSAGES)
+        return list(reversed(list(cursor)))
+
+    async def get_summary(self, user_id: int) -> Optional[str]:
+        """Return the user's profile, folding in any messages since its checkpoint"""
+        doc = await self.update(user_id)
+        return doc.get('summary') if doc else None
+
+    async def update(self, user_id: int, min_new: int = 1, priority: int = PRIORITY_INTERACTIVE) -> Optional[Dict]:
+        """Fold new messages into the stored profile if at least min_new arrived"""
+        # Coalesce concurrent updates of the same user (background job vs. /me)
+        task = self._inflight.get(user_id)
+        if task is None:
+            task = asyncio.ensure_future(self._update(user_id, min_new, priority))
+            self._inflight[user_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(user_id, None))
+        return await asyncio.shield(task)
+
+    async def _update(self, user_id: int, min_new: int, priority: int) -> Optional[Dict]:
+        doc = self.collection.find_one({'_id': user_id})
+        new_messages = self._new_messages(user_id, doc.get('last_timestamp') if doc else None)
+        if doc and len(new_messages) < min_new:
+            self.stats["cache_reads"] += 1
+            return doc
+        if not new_messages:
+            return None
+
+        summary = doc.get('summary', '') if doc else ''
+        fold_tokens = max(1, min(
+            self.chunker.chunk_budget,
+            self.groq_service.router.max_input_tokens("persona") - self.prompt_tokens
+        ))
+        # Usually fits a single fold call once noise and repeats are dropped
+        texts = await self.groq_service.preselect(
+            "persona", [msg['message_text'] for msg in new_messages], fold_tokens
+        )
+        for chunk in self.chunker.chunk(texts, max_tokens=fold_tokens):
+            summary = await self._fold(summary, chunk.text, priority)
+
+        doc = {
+            'summary': summary,
+            'last_timestamp': new_messages[-1]['timestamp'],
+            'message_count': (doc.get('message_count', 0) if doc else 0) + len(new_messages),
+            'updated_at': datetime.now(timezone.utc)
+        }
+        self.collection.update_one({'_id': user_id}, {'$set': doc}, upsert=True)
+        self.stats["updates"] += 1
+        self.stats["messages_folded"] += len(new_messages)
+        return doc
+
+    async def _fold(self, summary: str, messages: str, priority: int) -> str:
+        """One LLM call merging a batch of messages into the current profile"""
+        self.stats["fold_calls"] += 1
+        response = await self.groq_service.router.create(
+            "persona",
+            priority=priority,
+            messages=[
+                {"role": "system", "content": PERSONA_PROMPT},
+                {"role": "user", "content": f"Current profile:\n{summary or '(none yet)'}\n\nNew messages:\n{messages}"}
+            ],
+            temperature=0.5
+        )
+        return response.choices[0].message.content.strip()
+
+    async def refresh_active_users(self) -> None:
+        """Background job: update profiles of users who wrote enough since their checkpoint"""
+        since = datetime.now(timezone.utc) - PERSONA_ACTIVE_WINDOW
+        user_ids = self.messages.distinct('user_id', {'timestamp': {'$gte': since}})
+        for user_id in user_ids:
+            try:
+                await self.update(user_id, min_new=PERSONA_BACKGROUND_MIN_NEW, priority=PRIORITY_BATCH)
+            except Exception as e:
+                logger.warning(f"Could not update persona for user {user_id}: {e}")
+        logger.info(f"Persona store updated: {self.stats}")
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
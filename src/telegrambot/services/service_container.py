@@ -0,0 +1,118 @@
+import logging
+from typing import Any, Dict, Optional
+from .mongodb_service import MongoDBService
+from .http_client import HttpClient
+from .stats_service import StatsService
+from .groq_service import GroqService
+from .news_service import NewsService
+from .web_service import WebService
+from .whisper_service import WhisperService
+from .currency_service import CurrencyService
+from .crypto_price_service import CryptoPriceService
+from .downloader_service import DownloaderService
+from .text_to_speech_service import TextToSpeechService
+from .chart_service import ChartService
+from .weather_service import WeatherService
+from .wiki_service import WikiService
+from .summary_store import ChatSummaryStore
+from .persona_store import UserPersonaStore
+from .llm_cache import LLMResponseCache
+
+logger = logging.getLogger(__name__)
+
+_services: Optional["ServiceContainer"] = None
+
+
+class ServiceContainer:
+    """Owns the single instance of every service and client used by the bot.
+
+    Handlers receive their dependencies from here instead of constructing
+    their own, so there is one MongoClient, one AsyncGroq client, one pooled
+    HTTP session and one copy of each secret-backed service per process.
+    """
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.settings = settings
+
+        # Shared clients
+        self.mongodb_service = MongoDBService(settings["MONGODB_URI"])
+        self.http_client = HttpClient()
+
+        # Services
+        self.stats_service = StatsService(self.mongodb_service)
+        self.weather_service = WeatherService(
+            '/run/secrets/openweather_api_key', self.http_client, self.mongodb_service
+        )
+        self.wiki_service = WikiService(self.http_client)
+        self.response_cache = LLMResponseCache(self.mongodb_service)
+        self.groq_service = GroqService(
+            '/run/secrets/groq_api_key',
+            mongodb_service=self.mongodb_service,
+            weather_service=self.weather_service,
+            wiki_service=self.wiki_service,
+            response_cache=self.response_cache
+        )
+        self.summary_store = ChatSummaryStore(self.mongodb_service, self.groq_service)
+        self.persona_store = UserPersonaStore(self.mongodb_service, self.groq_service)
+        self.news_service = NewsService('/run/secrets/news_api_key', self.http_client)
+        self.web_service = WebService(self.http_client)
+        # The Whisper model itself is loaded in the background once the bot is online
+        self.whisper_service = WhisperService(
+            model=settings["WHISPER_MODEL"],
+            language=settings["WHISPER_LANGUAGE"],
+            workers=settings["WHISPER_WORKERS"]
+        )
+        self.currency_service = CurrencyService('/run/secrets/fxrates_api_key', self.http_client, self.mongodb_service)
+        self.crypto_service = CryptoPriceService('/run/secrets/coinmarketcap_key', self.http_client)
+        self.text_to_speech_service = TextToSpeechService('/run/secrets/elevenlabs_api_key')
+        self.chart_service = ChartService()
+        self.downloader_service = DownloaderService()
+
+        logger.info(f"Service container initialised: {self.connection_pools()}")
+
+    def connection_pools(self) -> Dict[str, Any]:
+        """Clients owned by the container and their pool sizes"""
+        mongo_client = self.mongodb_service.client
+        return {
+            "mongo_clients": 1,
+            "mongo_max_pool_size": mongo_client.options.pool_options.max_pool_size,
+            "groq_clients": 1,
+            "http_sessions": 1,
+            "http_max_connections_per_host": self.http_client.limit_per_host,
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Collect metrics from every service that exposes get_stats()"""
+        stats = {"connection_pools": self.connection_pools()}
+        for name, service in vars(self).items():
+            if name != "settings" and hasattr(service, "get_stats"):
+                try:
+                    stats[name] = service.get_stats()
+                except Exception as e:
+                    logger.error(f"Error collecting stats from {name}: {e}")
+        return stats
+
+    async def close(self) -> None:
+        """Release every client owned by the container"""
+        self.whisper_service.shutdown()
+        try:
+            await self.groq_service.client.close()
+        except Exception as e:
+            logger.error(f"Error closing Groq client: {e}")
+        try:
+            await self.http_client.close()
+        except Exception as e:
+            logger.error(f"Error closing HTTP session: {e}")
+        self.mongodb_service.close()
+
+
+def set_services(services: ServiceContainer) -> None:
+    global _services
+    _services = services
+
+
+def get_services() -> ServiceContainer:
+    """Return the process-wide service container"""
+    if _services is None:
+        raise RuntimeError("Service container has not been initialised")
+    return _services
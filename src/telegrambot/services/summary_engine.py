@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+from .groq_client import PRIORITY_BATCH, PRIORITY_INTERACTIVE
+from ..utils.token_utils import count_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_MAX_CONCURRENCY = 4  # Chunk calls in flight at once
+SUMMARY_REDUCE_FANOUT = 6  # Partial summaries combined per reduce call
+SUMMARY_MAX_TOKENS = 2000
+EMPTY_SUMMARY_MESSAGE = "No meaningful content to summarize."
+
+MAP_PROMPT = """Provide a very concise summary of this chat conversation fragment.
+Focus on main topics and key points only.
+Keep the summary short and direct.
+Avoid mentioning timestamps or specific details."""
+
+REDUCE_PROMPT = "Combine these summary fragments into one coherent, concise summary. Focus on the main points and remove any redundancy."
+
+
+class MapReduceSummarizer:
+    """Summarizes chunks concurrently, then reduces partial summaries hierarchically.
+
+    Map and reduce calls are queued at batch priority, so interactive requests
+    sharing the client are served first. The router picks the model and
+    output cap of each call ("summary_map" / "summary_reduce").
+    """
+
+    def __init__(self, router, max_concurrency: int = SUMMARY_MAX_CONCURRENCY,
+                 reduce_fanout: int = SUMMARY_REDUCE_FANOUT):
+        self.router = router
+        self.reduce_fanout = max(2, reduce_fanout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.stats = {"runs": 0, "llm_calls": 0, "failed_calls": 0, "last_run": {}}
+
+    async def _complete(self, system_prompt: str, user_content: str, state: Optional[Dict] = None) -> str:
+        async with self._semaphore:
+            self.stats["llm_calls"] += 1
+            response = await self.router.create(
+                "summary_map" if system_prompt == MAP_PROMPT else "summary_reduce",
+                priority=PRIORITY_BATCH,
+                state=state,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=0.7
+            )
+            return response.choices[0].message.content.strip()
+
+    async def _stream_complete(self, system_prompt: str, user_content: str, state: Optional[Dict] = None):
+        """Like _complete, but yields content deltas as they arrive"""
+        async with self._semaphore:
+            self.stats["llm_calls"] += 1
+            # Only the final, user-visible call is streamed
+            stream = await self.router.create(
+                "summary_map" if system_prompt == MAP_PROMPT else "summary_reduce",
+                priority=PRIORITY_INTERACTIVE,
+                state=state,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content}
+                ],
+                temperature=0.7,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+    async def _gather(self, calls, state: Optional[Dict] = None) -> List[str]:
+        """Run calls concurrently, dropping failed ones as long as one succeeds (marking state degraded)"""
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        succeeded = [r for r in results if not isinstance(r, BaseException)]
+        failures = [r for r in results if isinstance(r, BaseException)]
+        self.stats["failed_calls"] += len(failures)
+        if failures:
+            if state is not None:
+                state["degraded"] = True
+            logger.warning(f"{len(failures)}/{len(results)} summary calls failed: {failures[0]}")
+            if not succeeded:
+                raise failures[0]
+        return succeeded
+
+    async def summarize(self, chunks: List[str], time_range: Optional[str] = None) -> str:
+        """Map every chunk to a partial summary, then reduce until one summary is left.
+
+        Returns "" when there is nothing to summarize, so callers never store or
+        reduce a placeholder as if it were content.
+        """
+        if not chunks:
+            return ""
+
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        range_text = f" from {time_range}" if time_range else ""
+
+        partials = await self._gather([
+            self._complete(MAP_PROMPT, f"Summarize these messages{range_text}:\n\n{chunk}")
+            for chunk in chunks
+        ])
+        timings["map"] = time.perf_counter() - started
+
+        summary = (await self._reduce(partials, timings))[0]
+
+        timings["total"] = time.perf_counter() - started
+        self.stats["runs"] += 1
+        self.stats["last_run"] = {"chunks": len(chunks), **timings}
+        logger.info(f"Summarized {len(chunks)} chunks in {timings['total']:.2f}s: {timings}")
+        return summary
+
+    async def reduce(self, partials: List[str]) -> str:
+        """Combine already-summarized fragments into a single summary ("" if all are empty)"""
+        partials = [partial for partial in partials if partial and partial != EMPTY_SUMMARY_MESSAGE]
+        if not partials:
+            return ""
+        return (await self._reduce(partials, {}))[0]
+
+    def _batches(self, partials: List[str]) -> List[List[str]]:
+        """Group partials for reduce calls by count and by the reduce route's TPM budget"""
+        budget = self.router.max_input_tokens("summary_reduce") - count_tokens(REDUCE_PROMPT)
+        batches, current, current_tokens = [], [], 0
+        for partial in partials:
+            tokens = count_tokens(partial) + 2
+            # Every batch takes at least two partials so each level shrinks the list
+            if len(current) >= self.reduce_fanout or (len(current) >= 2 and current_tokens + tokens > budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(partial)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _reduce(self, partials: List[str], timings: Dict[str, float], stream_last: bool = False,
+                      state: Optional[Dict] = None) -> List[str]:
+        """Reduce partials level by level until one is left, or one batch if stream_last"""
+        level = 0
+        while len(partials) > 1:
+            batches = self._batches(partials)
+            if stream_last and len(batches) == 1:
+                break
+            level += 1
+            stage_started = time.perf_counter()
+            partials = await self._gather([
+                self._complete(REDUCE_PROMPT, "\n\n".join(batch), state) if len(batch) > 1
+                else self._passthrough(batch[0])
+                for batch in batches
+            ], state)
+            timings[f"reduce_{level}"] = time.perf_counter() - stage_started
+        return partials
+
+    async def summarize_stream(self, chunks: List[str], time_range: Optional[str] = None,
+                               state: Optional[Dict] = None):
+        """Like summarize, but streams the final call so text appears as it is generated.
+
+        state["degraded"] is set if a fallback model served a call or a chunk was dropped.
+        """
+        if not chunks:
+            yield EMPTY_SUMMARY_MESSAGE
+            return
+
+        range_text = f" from {time_range}" if time_range else ""
+        self.stats["runs"] += 1
+        if len(chunks) == 1:
+            async for delta in self._stream_complete(
+                    MAP_PROMPT, f"Summarize these messages{range_text}:\n\n{chunks[0]}", state):
+                yield delta
+            return
+
+        partials = await self._gather([
+            self._complete(MAP_PROMPT, f"Summarize these messages{range_text}:\n\n{chunk}", state)
+            for chunk in chunks
+        ], state)
+        # Reduce until the remaining partials fit one call, then stream that call
+        partials = await self._reduce(partials, {}, stream_last=True, state=state)
+        if len(partials) == 1:
+            yield partials[0]
+            return
+        async for delta in self._stream_complete(REDUCE_PROMPT, "\n\n".join(partials), state):
+            yield delta
+
+    @staticmethod
+    async def _passthrough(summary: str) -> str:
+        return summary
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
@@ -0,0 +1,242 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from pymongo import ASCENDING
+from .mongodb_service import MongoDBService
+from .summary_engine import EMPTY_SUMMARY_MESSAGE
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+MAX_SUMMARY_RANGE = timedelta(days=7)
+BACKFILL_HOURS = 24  # Closed hours the background job makes sure are summarized
+MAX_MESSAGES_PER_WINDOW = 2000
+# Missing hours a request builds one by one; beyond this a day (or the rest of
+# the range) is summarized from its messages in a single pass instead
+MAX_SYNC_HOUR_BUILDS = 12
+MAX_DIRECT_MESSAGES = 1000  # Messages spread evenly over a span summarized in one pass
+
+
+def _floor_hour(dt: datetime) -> datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _floor_day(dt: datetime) -> datetime:
+    return dt.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _has_content(doc: Dict) -> bool:
+    # Older windows may hold the summarizer's placeholder instead of ""
+    return bool(doc.get('summary')) and doc['summary'] != EMPTY_SUMMARY_MESSAGE
+
+
+def _describe(start: datetime, end: datetime) -> str:
+    """Time range text for the summarizer prompt, e.g. "2024-05-01 13:00 to 17:00 UTC" """
+    end_format = "%H:%M" if start.date() == end.date() else "%Y-%m-%d %H:%M"
+    return f"{start:%Y-%m-%d %H:%M} to {end:{end_format}} UTC"
+
+
+def _runs(starts: List[datetime]) -> List[Tuple[datetime, datetime]]:
+    """Merge sorted hourly window starts into contiguous (start, end) spans"""
+    spans = []
+    for start in starts:
+        if spans and spans[-1][1] == start:
+            spans[-1] = (spans[-1][0], start + HOUR)
+        else:
+            spans.append((start, start + HOUR))
+    return spans
+
+
+def _spread(texts: List[str], limit: int) -> List[str]:
+    """Keep at most limit texts, evenly spaced so no part of the span is left out"""
+    if len(texts) <= limit:
+        return texts
+    step = len(texts) / limit
+    return [texts[int(i * step)] for i in range(limit)]
+
+
+class ChatSummaryStore:
+    """Stores summaries of closed hourly windows and daily rollups built from them.
+
+    A /summary request only has to summarize the currently open hour and merge
+    it with cached window summaries, instead of re-summarizing the whole range.
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, groq_service):
+        self.messages = mongodb_service.messages
+        self.collection = mongodb_service.get_collection('chat_summaries')
+        self.groq_service = groq_service
+        self._inflight: Dict[Tuple[str, datetime], asyncio.Task] = {}
+        self.stats = {
+            "hours_built": 0,
+            "days_built": 0,
+            "windows_reused": 0,
+            "messages_summarized": 0,
+            "messages_reused": 0,
+            "direct_builds": 0,
+        }
+        self.collection.create_index([('period', ASCENDING), ('start', ASCENDING)], unique=True)
+
+    def _message_texts(self, start: datetime, end: datetime, limit: int = MAX_MESSAGES_PER_WINDOW) -> List[str]:
+        cursor = self.messages.find(
+            {'timestamp': {'$gte': start, '$lt': end}},
+            {'message_text': 1}
+        ).sort('timestamp', ASCENDING).limit(limit)
+        return [msg['message_text'] for msg in cursor if msg.get('message_text')]
+
+    def _stored_hours(self, starts: List[datetime]) -> Set[datetime]:
+        """Starts of the given hourly windows that already have a stored summary"""
+        if not starts:
+            return set()
+        cursor = self.collection.find({'period': 'hour', 'start': {'$in': starts}}, {'start': 1})
+        # Mongo hands back naive UTC datetimes
+        return {doc['start'].replace(tzinfo=timezone.utc) for doc in cursor}
+
+    async def _summarize_direct(self, start: datetime, end: datetime) -> Tuple[str, int]:
+        """Summarize the messages of a span in one pass; returns summary and message count"""
+        texts = self._message_texts(start, end, limit=MAX_MESSAGES_PER_WINDOW * 24)
+        if not texts:
+            return "", 0
+        summary = await self.groq_service.summarize_messages(
+            _spread(texts, MAX_DIRECT_MESSAGES), time_range=_describe(start, end)
+        )
+        self.stats["messages_summarized"] += len(texts)
+        self.stats["direct_builds"] += 1
+        return summary, len(texts)
+
+    async def get_window(self, period: str, start: datetime) -> Dict:
+        """Return the stored summary for a closed window, building it if missing"""
+        key = (period, start)
+        cached = self.collection.find_one({'period': period, 'start': start})
+        if cached:
+            self.stats["windows_reused"] += 1
+            self.stats["messages_reused"] += cached.get('message_count', 0)
+            return cached
+
+        # Coalesce concurrent builds of the same window (background job vs. /summary)
+        task = self._inflight.get(key)
+        if task is None:
+            builder = self._build_hour if period == 'hour' else self._build_day
+            task = asyncio.ensure_future(builder(start))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _build_hour(self, start: datetime) -> Dict:
+        texts = self._message_texts(start, start + HOUR)
+        summary = ""
+        if texts:
+            summary = await self.groq_service.summarize_messages(texts)
+            self.stats["messages_summarized"] += len(texts)
+        self.stats["hours_built"] += 1
+        return self._save('hour', start, start + HOUR, summary, len(texts))
+
+    async def _build_day(self, start: datetime) -> Dict:
+        hour_starts = [start + HOUR * i for i in range(24)]
+        if 24 - len(self._stored_hours(hour_starts)) > MAX_SYNC_HOUR_BUILDS:
+            # A cold day: one pass over its messages instead of up to 24 hourly builds
+            summary, message_count = await self._summarize_direct(start, start + DAY)
+            self.stats["days_built"] += 1
+            return self._save('day', start, start + DAY, summary, message_count)
+
+        hours = await self._gather_windows([('hour', hour_start) for hour_start in hour_starts])
+        parts = [doc['summary'] for doc in hours if _has_content(doc)]
+        summary = await self.groq_service.summarizer.reduce(parts) if parts else ""
+        self.stats["days_built"] += 1
+        # Don't persist a rollup with missing hours; it is rebuilt on the next request
+        return self._save('day', start, start + DAY, summary, sum(doc.get('message_count', 0) for doc in hours),
+                          persist=len(hours) == 24)
+
+    def _save(self, period: str, start: datetime, end: datetime, summary: str, message_count: int,
+              persist: bool = True) -> Dict:
+        doc = {
+            'period': period,
+            'start': start,
+            'end': end,
+            'summary': summary,
+            'message_count': message_count,
+            'created_at': datetime.now(timezone.utc)
+        }
+        if persist:
+            self.collection.update_one({'period': period, 'start': start}, {'$set': doc}, upsert=True)
+        return doc
+
+    async def _gather_windows(self, windows: List[Tuple[str, datetime]]) -> List[Dict]:
+        results = await asyncio.gather(
+            *(self.get_window(period, start) for period, start in windows),
+            return_exceptions=True
+        )
+        docs = []
+        for (period, start), result in zip(windows, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Could not summarize {period} window starting {start}: {result}")
+            else:
+                docs.append(result)
+        return docs
+
+    async def build_closed_windows(self, now: Optional[datetime] = None) -> None:
+        """Background job: summarize recently closed hours and yesterday's rollup"""
+        now = now or datetime.now(timezone.utc)
+        open_hour = _floor_hour(now)
+        windows = [('hour', open_hour - HOUR * i) for i in range(BACKFILL_HOURS, 0, -1)]
+        windows.append(('day', _floor_day(now) - DAY))
+        await self._gather_windows(windows)
+        logger.info(f"Chat summary store updated: {self.stats}")
+
+    async def summarize_range(self, span: timedelta) -> Optional[str]:
+        """Summarize the last `span` of chat from cached windows plus the open hour.
+
+        The range is aligned down to a full hour. Whole days inside it use daily
+        rollups, remaining closed hours use hourly summaries.
+        """
+        span = min(span, MAX_SUMMARY_RANGE)
+        now = datetime.now(timezone.utc)
+        open_hour = _floor_hour(now)
+
+        windows = []
+        cursor = _floor_hour(now - span)
+        while cursor < open_hour:
+            if cursor == _floor_day(cursor) and cursor + DAY <= open_hour:
+                windows.append(('day', cursor))
+                cursor += DAY
+            else:
+                windows.append(('hour', cursor))
+                cursor += HOUR
+
+        # Build a few missing hours individually (they are stored for next time);
+        # with larger gaps, e.g. a cold /summary 7d, each run of missing hours is
+        # summarized in a single pass and placed at its own start
+        hour_starts = [start for period, start in windows if period == 'hour']
+        stored = self._stored_hours(hour_starts)
+        missing = [start for start in hour_starts if start not in stored]
+        direct = []
+        if len(missing) > MAX_SYNC_HOUR_BUILDS:
+            windows = [(period, start) for period, start in windows if period != 'hour' or start in stored]
+            spans = _runs(missing)
+            results = await asyncio.gather(*(self._summarize_direct(start, end) for start, end in spans))
+            direct = [(start, summary) for (start, _), (summary, _) in zip(spans, results) if summary]
+
+        docs = await self._gather_windows(windows)
+        timeline = [(doc['start'], doc['summary']) for doc in docs if _has_content(doc)]
+        timeline.extend(direct)
+        # Stored docs carry naive datetimes
+        timeline.sort(key=lambda item: item[0].replace(tzinfo=timezone.utc))
+        parts = [summary for _, summary in timeline]
+
+        open_texts = self._message_texts(open_hour, now)
+        if open_texts:
+            open_summary = await self.groq_service.summarize_messages(open_texts)
+            if open_summary:
+                parts.append(open_summary)
+            self.stats["messages_summarized"] += len(open_texts)
+
+        if not parts:
+            return None
+        if len(parts) == 1:
+            return parts[0]
+        return await self.groq_service.summarizer.reduce(parts) or None
+
+    def get_stats(self) -> Dict:
+        return dict(self.stats)
@@ -1,11 +1,28 @@
-import os
-import uuid
+import asyncio
+import hashlib
+import io
+import time
+from collections import deque
+from typing import Dict, List, Tuple
 from elevenlabs import VoiceSettings
-from elevenlabs.client import ElevenLabs
+from elevenlabs.client import AsyncElevenLabs
 import logging
+from ..utils.audio_utils import concat_mp3
+from ..utils.cache import TTLCache
+from ..utils.text_utils import split_sentences
 
 logger = logging.getLogger(__name__)
 
+TTS_VOICE_ID = "pqHfZKP75CvOlQylNhV4"  # Bill voice
+TTS_MODEL_ID = "eleven_turbo_v2_5"
+TTS_OUTPUT_FORMAT = "mp3_22050_32"
+TTS_CACHE_SIZE = 256  # Clips kept in memory; mp3_22050_32 is about 4 KB per second of speech
+TTS_CACHE_TTL = 24 * 3600
+TTS_CHUNK_CHARS = 400  # Longer texts are split at sentence boundaries and synthesized in parallel
+TTS_MAX_CONCURRENCY = 3  # Simultaneous ElevenLabs requests across all /audio calls
+TTS_TIMING_SAMPLES = 200  # Recent chunk timings kept for /metrics
+
+
 class TextToSpeechService:
     def __init__(self, api_key_file: str):
         try:
@@ -15,45 +32,111 @@ class TextToSpeechService:
         except Exception as e:
             logger.error(f"Failed to read API key from {api_key_file}: {e}")
             self.api_key = None
-        self.client = ElevenLabs(api_key=self.api_key)
-        
-    async def generate_speech(self, text: str, output_path: str) -> str:
+        self.client = AsyncElevenLabs(api_key=self.api_key)
+        self.voice_settings = VoiceSettings(
+            stability=0.0,
+            similarity_boost=1.0,
+            style=0.0,
+            use_speaker_boost=True,
+        )
+        # Repeated phrases are served from memory instead of being synthesized again
+        self.cache = TTLCache(maxsize=TTS_CACHE_SIZE, ttl=TTS_CACHE_TTL)
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self._semaphore = asyncio.Semaphore(TTS_MAX_CONCURRENCY)
+        # (characters, seconds) of recently synthesized chunks
+        self.chunk_timings = deque(maxlen=TTS_TIMING_SAMPLES)
+        self.stats = {"synthesized": 0, "characters": 0, "bytes": 0, "chunked_requests": 0}
+
+    @staticmethod
+    def cache_key(text: str, voice_id: str = TTS_VOICE_ID, model_id: str = TTS_MODEL_ID) -> Tuple[str, str, str]:
+        return voice_id, model_id, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def _synthesize(self, text: str, voice_id: str, model_id: str) -> bytes:
+        """Stream one ElevenLabs request into memory"""
+        buffer = io.BytesIO()
+        async with self._semaphore:
+            started = time.perf_counter()
+            async for chunk in self.client.text_to_speech.convert(
+                voice_id=voice_id,
+                output_format=TTS_OUTPUT_FORMAT,
+                text=text,
+                model_id=model_id,
+                voice_settings=self.voice_settings
+            ):
+                if chunk:
+                    buffer.write(chunk)
+            elapsed = time.perf_counter() - started
+        audio = buffer.getvalue()
+        self.chunk_timings.append((len(text), elapsed))
+        logger.info(f"Synthesized {len(text)} characters in {elapsed:.2f}s")
+        self.stats["synthesized"] += 1
+        self.stats["characters"] += len(text)
+        self.stats["bytes"] += len(audio)
+        return audio
+
+    async def _speech_segment(self, text: str, voice_id: str, model_id: str) -> bytes:
+        """Cached synthesis of a single chunk"""
+        key = self.cache_key(text, voice_id, model_id)
+        audio = self.cache.get(key)
+        if audio is not None:
+            return audio
+
+        # Coalesce identical requests that arrive while the first is still synthesizing
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._synthesize(text, voice_id, model_id))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        audio = await asyncio.shield(task)
+        self.cache.set(key, audio)
+        return audio
+
+    async def generate_speech(self, text: str, voice_id: str = TTS_VOICE_ID, model_id: str = TTS_MODEL_ID) -> bytes:
         """
         Generate speech from text using ElevenLabs API
-        
+
+        Long texts are split at sentence boundaries, the chunks are synthesized
+        concurrently (at most TTS_MAX_CONCURRENCY requests at a time) and the
+        MP3 segments are joined without re-encoding.
+
         Args:
             text (str): Text to convert to speech
-            output_path (str): Path to save the audio file
-            
+            voice_id (str): ElevenLabs voice
+            model_id (str): ElevenLabs model
+
         Returns:
-            str: Path to the generated audio file
+            bytes: MP3 audio
         """
         try:
-            # Generate audio using ElevenLabs
-            response = self.client.text_to_speech.convert(
-                voice_id="pqHfZKP75CvOlQylNhV4",  # Bill voice
-                output_format="mp3_22050_32",
-                text=text,
-                model_id="eleven_turbo_v2_5",
-                voice_settings=VoiceSettings(
-                    stability=0.0,
-                    similarity_boost=1.0,
-                    style=0.0,
-                    use_speaker_boost=True,
-                )
+            chunks = split_sentences(text, TTS_CHUNK_CHARS) if len(text) > TTS_CHUNK_CHARS else [text]
+            if len(chunks) == 1:
+                return await self._speech_segment(chunks[0], voice_id, model_id)
+
+            self.stats["chunked_requests"] += 1
+            started = time.perf_counter()
+            segments: List[bytes] = await asyncio.gather(
+                *(self._speech_segment(chunk, voice_id, model_id) for chunk in chunks)
+            )
+            logger.info(
+                f"Synthesized {len(text)} characters as {len(chunks)} chunks "
+                f"in {time.perf_counter() - started:.2f}s"
             )
-            
-            # Ensure the directory exists
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            # Save the audio file
-            with open(output_path, "wb") as f:
-                for chunk in response:
-                    if chunk:
-                        f.write(chunk)
-                        
-            return output_path
-            
+            return concat_mp3(segments)
+
         except Exception as e:
             logger.error(f"Error generating speech: {str(e)}")
             raise
+
+    def get_stats(self) -> Dict:
+        seconds = sorted(elapsed for _, elapsed in self.chunk_timings)
+        characters = sum(chars for chars, _ in self.chunk_timings)
+        return {
+            **self.stats,
+            "cache": self.cache.get_stats(),
+            "chunks": {
+                "count": len(seconds),
+                "p50": seconds[len(seconds) // 2] if seconds else 0.0,
+                "p95": seconds[min(len(seconds) - 1, int(0.95 * len(seconds)))] if seconds else 0.0,
+                "seconds_per_100_chars": 100 * sum(seconds) / characters if characters else 0.0,
+            }
+        }
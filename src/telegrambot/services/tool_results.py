@@ -0,0 +1,111 @@
+import json
+from collections import Counter
+from typing import Any, Callable, Dict, Tuple
+from ..utils.token_utils import count_tokens
+
+WIKI_SUMMARY_CHARS = 1500  # Article intro characters sent back to the model
+MAX_TEXT_CHARS = 2000  # Cap for any other string in a tool result
+AQI_LABELS = {1: "Good", 2: "Fair", 3: "Moderate", 4: "Poor", 5: "Very Poor"}
+
+
+def _cap(value: Any, limit: int = MAX_TEXT_CHARS) -> Any:
+    """Recursively truncate long strings"""
+    if isinstance(value, str):
+        return value if len(value) <= limit else value[:limit] + "..."
+    if isinstance(value, dict):
+        return {key: _cap(item, limit) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_cap(item, limit) for item in value]
+    return value
+
+
+def _compact_weather(result: Dict) -> Dict:
+    return {
+        "location": result.get("location"),
+        "temp_c": result["temperature"]["celsius"],
+        "temp_f": result["temperature"]["fahrenheit"],
+        "feels_like_c": result["feels_like"]["celsius"],
+        "feels_like_f": result["feels_like"]["fahrenheit"],
+        "humidity_pct": result["humidity"],
+        "wind_ms": result["wind_speed"],
+        "conditions": result["description"],
+        "emoji": result["emoji"],
+    }
+
+
+def _compact_forecast(result: Dict) -> Dict:
+    """One entry per day instead of every 3-hour period"""
+    days = []
+    for day in result["days"]:
+        periods = day["periods"]
+        celsius = [period["temperature"]["celsius"] for period in periods]
+        fahrenheit = [period["temperature"]["fahrenheit"] for period in periods]
+        conditions = Counter((period["description"], period["weather_emoji"]) for period in periods)
+        (description, emoji), _ = conditions.most_common(1)[0]
+        days.append({
+            "date": day["date"],
+            "conditions": description,
+            "emoji": emoji,
+            "min_c": min(celsius), "max_c": max(celsius),
+            "min_f": min(fahrenheit), "max_f": max(fahrenheit),
+            "max_precip_pct": round(max(period["precipitation"] for period in periods)),
+            "max_wind_ms": max(period["wind_speed"] for period in periods),
+        })
+    return {"city": result["city"], "country": result["country"], "days": days}
+
+
+def _compact_air_quality(result: Dict) -> Dict:
+    current = result["list"][0]
+    aqi = current["main"]["aqi"]
+    return {
+        "aqi": aqi,
+        "aqi_label": AQI_LABELS.get(aqi, "Unknown"),
+        "components_ug_m3": {name: round(value, 1) for name, value in current["components"].items()},
+    }
+
+
+def _compact_wiki(result: Dict) -> Dict:
+    if result.get("status") == "success":
+        article = result["result"]
+        return {
+            "status": "success",
+            "result": {
+                **{key: article[key] for key in ("title", "url", "is_recent", "last_modified") if key in article},
+                "summary": _cap(article["summary"], WIKI_SUMMARY_CHARS),
+            }
+        }
+    return _cap(result)
+
+
+# Per-tool reducers: keep only what the model needs to write the answer
+TOOL_RESULT_SCHEMAS: Dict[str, Callable[[Dict], Dict]] = {
+    "get_weather": _compact_weather,
+    "get_forecast": _compact_forecast,
+    "get_air_quality": _compact_air_quality,
+    "wiki_search": _compact_wiki,
+}
+
+
+def compact_tool_result(name: str, result: Any) -> Tuple[str, int, int]:
+    """
+    Serialize a tool result for the follow-up completion, reduced to its schema.
+
+    Error results and tools without a schema only have their strings capped.
+
+    Args:
+        name (str): Tool name
+        result (Any): Raw tool result
+
+    Returns:
+        Tuple[str, int, int]: Compact JSON, tokens before and tokens after compaction
+    """
+    raw = json.dumps(result, ensure_ascii=False)
+    reducer = TOOL_RESULT_SCHEMAS.get(name)
+    try:
+        is_error = isinstance(result, dict) and result.get("status") == "error"
+        compacted = reducer(result) if reducer and not is_error else _cap(result)
+    except (KeyError, IndexError, TypeError, ValueError):
+        # Unexpected shape; fall back to the capped raw result
+        compacted = _cap(result)
+    compact = json.dumps(compacted, ensure_ascii=False, separators=(",", ":"))
+    return compact, count_tokens(raw), count_tokens(compact)
@@ -1,13 +1,109 @@
 import os
-import aiohttp
+import re
+import asyncio
 import logging
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from typing import Dict
+from .http_client import HttpClient
+from .mongodb_service import MongoDBService
+from ..utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
+GEOCODE_CACHE_SIZE = 512
+GEOCODE_NEGATIVE_TTL = 3600  # Unknown place names are retried after an hour
+# Seconds an OpenWeather response stays fresh, matching how often each endpoint updates
+WEATHER_CACHE_TTLS = {
+    "weather": 10 * 60,
+    "forecast": 60 * 60,
+    "air_pollution": 60 * 60,
+}
+WEATHER_CACHE_SIZE = 256
+COORDINATES_PATTERN = re.compile(r"^\s*(-?\d+(?:\.\d+)?)\s*,\s*(-?\d+(?:\.\d+)?)\s*$")
+
+
+class GeocodingCache:
+    """Resolves place names to coordinates once and remembers them.
+
+    Lookups go through an in-memory LRU, then the geocoding collection in
+    Mongo, and only then OpenWeather's geocoding API.
+    """
+
+    def __init__(self, mongodb_service: MongoDBService, http_client: HttpClient, api_key: str):
+        self.collection = mongodb_service.get_collection('geocoding')
+        self.http = http_client
+        self.api_key = api_key
+        self.memory = TTLCache(maxsize=GEOCODE_CACHE_SIZE)
+        self.stats = {"memory_hits": 0, "mongo_hits": 0, "api_lookups": 0, "not_found": 0}
+
+    @staticmethod
+    def normalize(location: str) -> str:
+        return re.sub(r"\s+", " ", location or "").strip().lower()
+
+    async def resolve(self, location: str) -> Dict:
+        """
+        Return name, country, lat and lon for a place name or "lat,lon" string.
+
+        Args:
+            location (str): City name (optionally with country) or coordinates
+
+        Returns:
+            Dict: Resolved place
+
+        Raises:
+            Exception: If the place is unknown
+        """
+        match = COORDINATES_PATTERN.match(location or "")
+        if match:
+            lat, lon = float(match.group(1)), float(match.group(2))
+            return {"name": f"{lat:.2f},{lon:.2f}", "country": "", "lat": lat, "lon": lon}
+
+        key = self.normalize(location)
+        place = self.memory.get(key)
+        if place is not None:
+            self.stats["memory_hits"] += 1
+            if not place:
+                raise Exception(f"Location not found: {location}")
+            return place
+
+        doc = self.collection.find_one({'_id': key})
+        if doc:
+            self.stats["mongo_hits"] += 1
+            place = {field: doc[field] for field in ("name", "country", "lat", "lon")}
+            self.memory.set(key, place)
+            return place
+
+        self.stats["api_lookups"] += 1
+        params = {"q": location, "limit": 1, "appid": self.api_key}
+        async with self.http.session.get("https://api.openweathermap.org/geo/1.0/direct", params=params) as response:
+            if response.status != 200:
+                error_data = await response.json()
+                raise Exception(f"Geocoding API error: {error_data.get('message', response.status)}")
+            results = await response.json()
+
+        if not results:
+            self.stats["not_found"] += 1
+            self.memory.set(key, {}, ttl=GEOCODE_NEGATIVE_TTL)
+            raise Exception(f"Location not found: {location}")
+
+        result = results[0]
+        place = {"name": result["name"], "country": result.get("country", ""), "lat": result["lat"], "lon": result["lon"]}
+        self.memory.set(key, place)
+        self.collection.update_one(
+            {'_id': key},
+            {'$set': {**place, 'updated_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+        return place
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "memory": self.memory.get_stats()}
+
+
 class WeatherService:
-    def __init__(self, api_key_file: str):
+    def __init__(self, api_key_file: str, http_client: HttpClient, mongodb_service: MongoDBService):
+        self.http = http_client
         try:
             with open(api_key_file, 'r') as f:
                 self.api_key = f.read().strip()
@@ -16,7 +112,13 @@ class WeatherService:
             logger.error(f"Failed to read API key from {api_key_file}: {e}")
             self.api_key = None
 
-        self.base_url = "http://api.openweathermap.org/data/2.5"
+        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.geocoder = GeocodingCache(mongodb_service, http_client, self.api_key)
+        self.response_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE)
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        self.fetch_stats = {
+            endpoint: {"hits": 0, "misses": 0, "coalesced": 0} for endpoint in WEATHER_CACHE_TTLS
+        }
         self.weather_emoji_map = {
             # Clear
             "01d": "☀️",  # clear sky (day)
@@ -120,110 +222,109 @@ class WeatherService:
             logger.error(f"Error formatting forecast data: {e}")
             raise
 
+    async def _fetch(self, endpoint: str, place: Dict, units: str = "metric") -> Dict:
+        """GET an OpenWeather endpoint for a place, served from cache when fresh"""
+        key = (endpoint, round(place["lat"], 2), round(place["lon"], 2), units)
+        data = self.response_cache.get(key)
+        if data is not None:
+            self.fetch_stats[endpoint]["hits"] += 1
+            return data
+
+        # Concurrent misses for the same key share one request
+        task = self._inflight.get(key)
+        if task is None:
+            self.fetch_stats[endpoint]["misses"] += 1
+            task = asyncio.ensure_future(self._request(endpoint, place, units))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.fetch_stats[endpoint]["coalesced"] += 1
+        data = await asyncio.shield(task)
+        self.response_cache.set(key, data, ttl=WEATHER_CACHE_TTLS[endpoint])
+        return data
+
+    async def _request(self, endpoint: str, place: Dict, units: str) -> Dict:
+        params = {
+            "lat": place["lat"],
+            "lon": place["lon"],
+            "appid": self.api_key,
+            "units": units
+        }
+        async with self.http.session.get(f"{self.base_url}/{endpoint}", params=params) as response:
+            if response.status == 200:
+                return await response.json()
+            error_data = await response.json()
+            label = "Air quality" if endpoint == "air_pollution" else "Weather"
+            raise Exception(f"{label} API error: {error_data['message']}")
+
     async def get_current_weather(self, location: str, units: str = "metric"):
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/weather"
-                # Always get metric units first
-                params = {
-                    "q": location,
-                    "appid": self.api_key,
-                    "units": "metric"
+            place = await self.geocoder.resolve(location)
+            # Always get metric units first
+            data = await self._fetch("weather", place, units="metric")
+            temp_c = data["main"]["temp"]
+            feels_like_c = data["main"]["feels_like"]
+            temp_f = self.celsius_to_fahrenheit(temp_c)
+            feels_like_f = self.celsius_to_fahrenheit(feels_like_c)
+            
+            return {
+                "location": ", ".join(filter(None, (place["name"], place["country"]))),
+                "temperature": {
+                    "celsius": round(temp_c, 1),
+                    "fahrenheit": round(temp_f, 1)
+                },
+                "feels_like": {
+                    "celsius": round(feels_like_c, 1),
+                    "fahrenheit": round(feels_like_f, 1)
+                },
+                "humidity": data["main"]["humidity"],
+                "wind_speed": data["wind"]["speed"],
+                "description": data["weather"][0]["description"],
+                "icon": data["weather"][0]["icon"],
+                "emoji": self.weather_emoji_map.get(data["weather"][0]["icon"], "❓"),
+                "condition_emojis": {
+                    "temp": self.temperature_emoji,
+                    "feels_like": self.feels_like_emoji,
+                    "humidity": self.humidity_emoji,
+                    "wind": self.wind_speed_emoji
                 }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        temp_c = data["main"]["temp"]
-                        feels_like_c = data["main"]["feels_like"]
-                        temp_f = self.celsius_to_fahrenheit(temp_c)
-                        feels_like_f = self.celsius_to_fahrenheit(feels_like_c)
-                        
-                        return {
-                            "temperature": {
-                                "celsius": round(temp_c, 1),
-                                "fahrenheit": round(temp_f, 1)
-                            },
-                            "feels_like": {
-                                "celsius": round(feels_like_c, 1),
-                                "fahrenheit": round(feels_like_f, 1)
-                            },
-                            "humidity": data["main"]["humidity"],
-                            "wind_speed": data["wind"]["speed"],
-                            "description": data["weather"][0]["description"],
-                            "icon": data["weather"][0]["icon"],
-                            "emoji": self.weather_emoji_map.get(data["weather"][0]["icon"], "❓"),
-                            "condition_emojis": {
-                                "temp": self.temperature_emoji,
-                                "feels_like": self.feels_like_emoji,
-                                "humidity": self.humidity_emoji,
-                                "wind": self.wind_speed_emoji
-                            }
-                        }
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Weather API error: {error_data['message']}")
-                        
+            }
+                    
         except Exception as e:
             logger.error(f"Error fetching weather: {e}")
             raise
 
     async def get_forecast(self, location: str, units: str = "metric"):
         try:
-            async with aiohttp.ClientSession() as session:
-                url = f"{self.base_url}/forecast"
-                params = {
-                    "q": location,
-                    "appid": self.api_key,
-                    "units": "metric"  # Always get metric and convert as needed
-                }
-                
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return self.format_forecast_data(data, units)
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Weather API error: {error_data['message']}")
-                        
+            place = await self.geocoder.resolve(location)
+            # Always get metric and convert as needed
+            data = await self._fetch("forecast", place, units="metric")
+            return self.format_forecast_data(data, units)
+                    
         except Exception as e:
             logger.error(f"Error fetching forecast: {e}")
             raise
 
     async def get_air_quality(self, location: str):
         try:
-            # First get coordinates for the location
-            async with aiohttp.ClientSession() as session:
-                geo_url = f"{self.base_url}/weather"
-                params = {
-                    "q": location,
-                    "appid": self.api_key
-                }
-                
-                async with session.get(geo_url, params=params) as response:
-                    if response.status != 200:
-                        error_data = await response.json()
-                        raise Exception(f"Weather API error: {error_data['message']}")
-                        
-                    weather_data = await response.json()
-                    lat = weather_data["coord"]["lat"]
-                    lon = weather_data["coord"]["lon"]
-                
-                # Now get air quality using coordinates
-                air_url = f"{self.base_url}/air_pollution"
-                params = {
-                    "lat": lat,
-                    "lon": lon,
-                    "appid": self.api_key
-                }
-                
-                async with session.get(air_url, params=params) as response:
-                    if response.status == 200:
-                        return await response.json()
-                    else:
-                        error_data = await response.json()
-                        raise Exception(f"Air quality API error: {error_data['message']}")
-                        
+            # Coordinates come from the geocoding cache, not an extra weather call
+            place = await self.geocoder.resolve(location)
+            return await self._fetch("air_pollution", place)
+                    
         except Exception as e:
             logger.error(f"Error fetching air quality: {e}")
             raise
+
+    def get_stats(self):
+        fetches = {}
+        for endpoint, counters in self.fetch_stats.items():
+            lookups = counters["hits"] + counters["misses"] + counters["coalesced"]
+            fetches[endpoint] = {
+                **counters,
+                "hit_rate": (counters["hits"] + counters["coalesced"]) / lookups if lookups else 0.0
+            }
+        return {
+            "geocoding": self.geocoder.get_stats(),
+            "responses": fetches,
+            "response_cache": self.response_cache.get_stats()
+        }
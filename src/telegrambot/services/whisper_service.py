@@ -7,26 +7,170 @@ from pydub import AudioSegment
 import glob
 import time
 import numpy as np
+import asyncio
+import logging
+import multiprocessing
+import multiprocessing.forkserver
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from ..utils.file_utils import cleanup_files
+
+logger = logging.getLogger(__name__)
+
+# Whisper quality thresholds, reused to decide whether a hinted decode looks wrong
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+
+# Environment variable telling the fork server which model to preload
+ZYGOTE_MODEL_ENV = "WHISPER_ZYGOTE_MODEL"
+
+# The loaded model. With inference workers it only exists in the fork server
+# (see whisper_zygote) and the workers forked from it, which share the weights
+# copy-on-write; otherwise it is loaded in the bot process itself.
+_MODEL = None
+
+
+def _configure_torch(device: str) -> None:
+    # aggressive torch optimizations
+    torch.set_num_threads(2)
+    torch.set_float32_matmul_precision('medium')
+    if device == "cpu":
+        torch.set_num_interop_threads(1)
+        torch.backends.mkl.num_threads = 2
+
+
+def load_zygote_model() -> None:
+    """Load the model in the fork server without starting any torch thread pools"""
+    global _MODEL
+    # A single thread keeps the fork server single-threaded, so forking it is safe
+    torch.set_num_threads(1)
+    torch.set_num_interop_threads(1)
+    _MODEL = whisper.load_model(os.environ[ZYGOTE_MODEL_ENV], device="cpu")
+
+
+def _init_worker() -> None:
+    """Inference worker initializer; the model is already inherited from the fork server"""
+    # Interop threads were fixed to one in the fork server and can't be changed again
+    torch.set_num_threads(2)
+
+
+def _run_transcribe(audio_file, language) -> Dict:
+    result = _MODEL.transcribe(
+        audio_file,
+        language=language,
+        fp16=False,
+        beam_size=1,
+        best_of=1,
+        temperature=0.0,
+        condition_on_previous_text=False,
+        compression_ratio_threshold=COMPRESSION_RATIO_THRESHOLD,
+        logprob_threshold=LOGPROB_THRESHOLD,
+        no_speech_threshold=0.6
+    )
+    # Only ship back what the caller needs across the process boundary
+    return {
+        "text": result["text"],
+        "segments": [
+            {"avg_logprob": seg["avg_logprob"], "compression_ratio": seg["compression_ratio"]}
+            for seg in result["segments"]
+        ]
+    }
+
+
+def _run_detect_language(audio_file) -> Tuple[str, float]:
+    audio = whisper.pad_or_trim(whisper.load_audio(audio_file))
+    mel = whisper.log_mel_spectrogram(audio, n_mels=_MODEL.dims.n_mels).to(_MODEL.device)
+    _, probs = _MODEL.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, probs[language]
+
+
+def _run_warmup() -> Tuple[int, float]:
+    """Run one tiny inference so lazy kernels and allocator pools are initialised"""
+    started = time.perf_counter()
+    _MODEL.transcribe(np.zeros(16000, dtype=np.float32), language="en", fp16=False, beam_size=1, best_of=1)
+    return os.getpid(), time.perf_counter() - started
+
+
+def _read_memory_kb(pid: int) -> Dict[str, int]:
+    """Read RSS/PSS/shared memory of a process from /proc (Linux only)"""
+    memory = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                if key in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"):
+                    memory[key.lower()] = int(value.split()[0])
+    except OSError:
+        pass
+    if memory:
+        # Unique set size: what the process would free on exit
+        memory["uss"] = memory.get("private_clean", 0) + memory.get("private_dirty", 0)
+    return memory
+
+
+def _forkserver_pid() -> Optional[int]:
+    """PID of the running multiprocessing fork server, if any (a CPython internal)"""
+    return getattr(multiprocessing.forkserver._forkserver, "_forkserver_pid", None)
+
+
+class LanguageHintCache:
+    """Per-user language statistics learned from previous transcriptions"""
+
+    def __init__(self, default_language: Optional[str] = None, min_samples: int = 3,
+                 min_confidence: float = 0.8, history_size: int = 20):
+        self.default_language = default_language or None
+        self.min_samples = min_samples
+        self.min_confidence = min_confidence
+        self._history = defaultdict(lambda: deque(maxlen=history_size))
+
+    def get_hint(self, user_id) -> Optional[str]:
+        """Return a language hint for the user, or None when detection should run"""
+        history = self._history.get(user_id)
+        if not history:
+            # Unknown speaker: fall back to the configured WHISPER_LANGUAGE, if any
+            return self.default_language
+
+        if len(history) < self.min_samples:
+            return None
+
+        language, count = Counter(history).most_common(1)[0]
+        if count / len(history) >= self.min_confidence:
+            return language
+        return None
+
+    def record(self, user_id, language: str) -> None:
+        """Record the language of a successful transcription"""
+        if user_id is not None and language:
+            self._history[user_id].append(language)
+
 
 class WhisperService:
-    def __init__(self, model="base", device=None):
+    def __init__(self, model="base", device=None, language=None, workers=1):
+        self.model_name = model
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
-        
-        # aggressive torch optimizations
-        torch.set_num_threads(2)
-        torch.set_float32_matmul_precision('medium')
-        if self.device == "cpu":
-            torch.set_num_interop_threads(1)
-            torch.backends.mkl.num_threads = 2
-        
-        # Load the model
-        self.model = whisper.load_model(
-            model,
-            device=self.device,
-            download_root=None,
-            in_memory=True
-        )
+        # CUDA contexts do not survive fork, so GPU inference stays in-process
+        self.workers = workers if self.device == "cpu" else 0
+        self.language_hints = LanguageHintCache(default_language=language)
+        # Transcriptions run on executor threads; guards stats and language_hints
+        self._lock = threading.Lock()
+        self.stats = {
+            "hint_hits": 0,
+            "hint_misses": 0,
+            "hint_fallbacks": 0,
+            "detection_runs": 0,
+            "detection_seconds": 0.0,
+        }
+
+        # The model is loaded lazily by start_background_load() once the bot is online
+        self._pool = None
+        self._loaded = False
+        self._ready = threading.Event()
+        self._loader_thread = None
+        self.startup_stats = {}
         
         # Set up audio folder in project root
         root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
@@ -36,6 +180,96 @@ class WhisperService:
         self.temp_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), "src", "audio")
         os.makedirs(self.temp_dir, exist_ok=True)
 
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start_background_load(self) -> None:
+        """Load and warm up the model (or start the inference workers) in a background thread"""
+        if self._loader_thread is None:
+            self._loader_thread = threading.Thread(target=self._load, name="whisper-loader", daemon=True)
+            self._loader_thread.start()
+
+    def _start_workers(self) -> float:
+        """Start the inference workers and return their slowest warmup time"""
+        # Forking the bot itself is unsafe: by now it runs the event loop, the
+        # scheduler, pymongo and aiohttp threads. Workers are instead forked from
+        # a fresh, single-threaded fork server that preloads the model once, so
+        # they still share its weights copy-on-write.
+        os.environ[ZYGOTE_MODEL_ENV] = self.model_name
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([f"{__package__}.whisper_zygote"])
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker
+        )
+        # The fork server (and the model load) starts on the first submit; each
+        # submit that finds no idle worker spawns another, up to max_workers
+        warmups = [future.result() for future in [self._pool.submit(_run_warmup) for _ in range(self.workers)]]
+        return max(seconds for _, seconds in warmups)
+
+    def _load(self) -> None:
+        global _MODEL
+        try:
+            started = time.perf_counter()
+            if self.workers > 0:
+                warmup_seconds = self._start_workers()
+            else:
+                _configure_torch(self.device)
+                _MODEL = whisper.load_model(self.model_name, device=self.device)
+                _, warmup_seconds = _run_warmup()
+            finished = time.perf_counter()
+            self._loaded = True
+
+            self.startup_stats = {
+                "load_seconds": finished - started - warmup_seconds,
+                "warmup_seconds": warmup_seconds,
+                "total_seconds": finished - started,
+                "workers": self.workers,
+            }
+            logger.info(
+                f"Whisper '{self.model_name}' ready in {self.startup_stats['total_seconds']:.2f}s "
+                f"(load {self.startup_stats['load_seconds']:.2f}s, warmup {warmup_seconds:.2f}s)"
+            )
+            for worker in self.get_memory_stats():
+                logger.info(f"Whisper process memory: {worker}")
+        except Exception as e:
+            logger.error(f"Failed to load Whisper model: {e}", exc_info=True)
+            self.shutdown()
+        finally:
+            self._ready.set()
+
+    def get_memory_stats(self) -> List[Dict]:
+        """RSS, PSS, USS and shared memory of the parent, the fork server and each inference worker
+
+        The fork server holds the preloaded weights. Workers share them
+        copy-on-write, so their USS stays well below their RSS, and their
+        PSS only counts a share of the weights.
+        """
+        processes = [("parent", os.getpid())]
+        if self._pool is not None:
+            forkserver_pid = _forkserver_pid()
+            if forkserver_pid:
+                processes.append(("forkserver", forkserver_pid))
+            processes += [("worker", child.pid) for child in multiprocessing.active_children()]
+        return [
+            {"role": role, "pid": pid, **_read_memory_kb(pid)}
+            for role, pid in processes
+        ]
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    async def transcribe_async(self, audio_file, user_id=None):
+        """Transcribe without blocking the event loop, waiting for the model if still loading"""
+        loop = asyncio.get_running_loop()
+        if not self.is_ready:
+            await loop.run_in_executor(None, self._ready.wait)
+        return await loop.run_in_executor(None, self.transcribe, audio_file, user_id)
+
     def detect_voice_activity(self, audio_data, sample_rate=16000, threshold=0.01):
         """Simple Voice Activity Detection"""
         if isinstance(audio_data, str):  # If path provided
@@ -69,34 +303,93 @@ class WhisperService:
         except Exception as e:
             raise
 
-    def _transcribe(self, audio_file):
-        return self.model.transcribe(
-            audio_file,
-            language=None,  # Set to None to enable auto-detection
-            fp16=False,
-            beam_size=1,
-            best_of=1,
-            temperature=0.0,
-            condition_on_previous_text=False,
-            compression_ratio_threshold=2.4,
-            logprob_threshold=-1.0,
-            no_speech_threshold=0.6
-        )["text"].strip()
-
-    def transcribe(self, audio_file):
+    def _detect_language(self, audio_file) -> Tuple[str, float]:
+        """Run Whisper's language detection pass on the first 30 seconds of audio"""
+        started = time.perf_counter()
+        language, probability = self._run(_run_detect_language, audio_file)
+        with self._lock:
+            self.stats["detection_runs"] += 1
+            self.stats["detection_seconds"] += time.perf_counter() - started
+        return language, probability
+
+    def _transcribe(self, audio_file, language):
+        return self._run(_run_transcribe, audio_file, language)
+
+    def _run(self, func, *args):
+        """Run an inference function in a forked worker, or in-process without a pool"""
+        if self._pool is not None:
+            return self._pool.submit(func, *args).result()
+        return func(*args)
+
+    def _looks_wrong(self, result) -> bool:
+        """Check whether a decode forced to a hinted language produced garbage"""
+        segments = result.get("segments") or []
+        if not result.get("text", "").strip() or not segments:
+            return True
+        avg_logprob = sum(seg["avg_logprob"] for seg in segments) / len(segments)
+        max_compression = max(seg["compression_ratio"] for seg in segments)
+        return avg_logprob < LOGPROB_THRESHOLD or max_compression > COMPRESSION_RATIO_THRESHOLD
+
+    def _transcribe_with_hint(self, audio_file, user_id=None) -> str:
+        with self._lock:
+            hint = self.language_hints.get_hint(user_id)
+
+        if hint:
+            result = self._transcribe(audio_file, hint)
+            if not self._looks_wrong(result):
+                with self._lock:
+                    self.stats["hint_hits"] += 1
+                    self.language_hints.record(user_id, hint)
+                return result["text"].strip()
+            logger.debug(f"Hinted language '{hint}' produced a poor transcript, falling back to detection")
+            with self._lock:
+                self.stats["hint_fallbacks"] += 1
+        else:
+            with self._lock:
+                self.stats["hint_misses"] += 1
+
+        language, probability = self._detect_language(audio_file)
+        result = self._transcribe(audio_file, language)
+        # Only learn from detections the model is reasonably sure about
+        if probability >= 0.5:
+            with self._lock:
+                self.language_hints.record(user_id, language)
+        return result["text"].strip()
+
+    def get_stats(self) -> Dict:
+        """Language hint hit rate and estimated detection latency saved"""
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hint_hits"] + stats["hint_misses"] + stats["hint_fallbacks"]
+        avg_detection = stats["detection_seconds"] / stats["detection_runs"] if stats["detection_runs"] else 0.0
+        stats["hint_hit_rate"] = stats["hint_hits"] / lookups if lookups else 0.0
+        stats["avg_detection_seconds"] = avg_detection
+        stats["latency_saved_seconds"] = stats["hint_hits"] * avg_detection
+        stats["startup"] = self.startup_stats
+        return stats
+
+    def transcribe(self, audio_file, user_id=None):
+        # Registered first so the downloaded file is removed even if the model failed to load
+        files_to_remove = [audio_file]
         try:
+            if not self._loaded:
+                raise RuntimeError("Whisper model is not loaded")
+
             if audio_file.endswith('.ogg'):
                 audio_file = self.convert_ogg_to_wav(audio_file)
+                files_to_remove.append(audio_file)
             
             if not self.detect_voice_activity(audio_file):
                 return ""
             
-            result = self._transcribe(audio_file)
+            result = self._transcribe_with_hint(audio_file, user_id)
+            logger.debug(f"Language hint stats: {self.get_stats()}")
             return result
         except Exception as e:
             raise
         finally:
-            self.cleanup_audio_files()
+            # Only remove this call's files; other transcriptions may be in flight
+            cleanup_files(files_to_remove)
 
     def cleanup_audio_files(self):
         for ext in ['*.ogg', '*.wav']:
@@ -0,0 +1,9 @@
+"""Preloaded by the Whisper fork server only; never import this in the bot process.
+
+The fork server is a fresh interpreter started by WhisperService, so loading
+the model here lets every inference worker forked from it share the weights
+copy-on-write without forking the multi-threaded bot process.
+"""
+from .whisper_service import load_zygote_model
+
+load_zygote_model()
@@ -1,16 +1,163 @@
-import wikipediaapi
+import re
+import time
+import asyncio
 import logging
 from typing import Dict, List, Optional
+from .http_client import HttpClient
+from ..utils.cache import TTLCache
 
 logger = logging.getLogger(__name__)
 
-class WikiService:
-    def __init__(self):
-        self.wiki = wikipediaapi.Wikipedia(
-            language='en',
-            extract_format=wikipediaapi.ExtractFormat.WIKI,
-            user_agent='TelegramBot/1.0'
+WIKI_API_URL = "https://en.wikipedia.org/w/api.php"
+WIKI_USER_AGENT = "TelegramBot/1.0"
+WIKI_BATCH_SIZE = 20  # Titles per query; the extracts module returns at most 20 intros
+WIKI_CACHE_TTL = 6 * 3600
+WIKI_NEGATIVE_TTL = 15 * 60  # Missing pages are rechecked sooner
+WIKI_CACHE_SIZE = 1024
+SECTION_PATTERN = re.compile(r"^(={2,})\s*(.+?)\s*\1\s*$", re.MULTILINE)
+
+
+class MediaWikiClient:
+    """Minimal async client for the MediaWiki action API.
+
+    Title lookups are batched into multi-title prop=extracts|info queries,
+    and pages (including missing ones) are cached with a TTL.
+    """
+
+    def __init__(self, http_client: HttpClient, api_url: str = WIKI_API_URL):
+        self.http = http_client
+        self.api_url = api_url
+        self.cache = TTLCache(maxsize=WIKI_CACHE_SIZE, ttl=WIKI_CACHE_TTL)
+        self.stats = {"requests": 0, "request_seconds": 0.0}
+
+    async def _query(self, **params) -> Dict:
+        params = {"action": "query", "format": "json", "formatversion": 2, "redirects": 1, **params}
+        started = time.perf_counter()
+        try:
+            async with self.http.session.get(
+                self.api_url, params=params, headers={"User-Agent": WIKI_USER_AGENT}
+            ) as response:
+                response.raise_for_status()
+                return (await response.json()).get("query", {})
+        finally:
+            self.stats["requests"] += 1
+            self.stats["request_seconds"] += time.perf_counter() - started
+
+    @staticmethod
+    def _page(data: Dict) -> Optional[Dict]:
+        if data.get("missing") or data.get("invalid"):
+            return None
+        return {
+            "title": data["title"],
+            "summary": data.get("extract", ""),
+            "url": data.get("fullurl", ""),
+            "touched": data.get("touched"),
+            "disambiguation": "disambiguation" in data.get("pageprops", {}),
+        }
+
+    async def get_pages(self, titles: List[str]) -> Dict[str, Optional[Dict]]:
+        """
+        Fetch the intro and metadata of several pages, batching uncached titles.
+
+        Args:
+            titles (List[str]): Page titles as typed by the user
+
+        Returns:
+            Dict[str, Optional[Dict]]: Page per requested title, None if it doesn't exist
+        """
+        results = {}
+        missing = []
+        for title in titles:
+            cached = self.cache.get(("intro", title), default=False)
+            if cached is False:
+                missing.append(title)
+            else:
+                results[title] = cached
+
+        batches = [missing[i:i + WIKI_BATCH_SIZE] for i in range(0, len(missing), WIKI_BATCH_SIZE)]
+        responses = await asyncio.gather(*(
+            self._query(
+                titles="|".join(batch), prop="extracts|info|pageprops", ppprop="disambiguation",
+                exintro=1, explaintext=1, exlimit="max", inprop="url"
+            ) for batch in batches
+        ))
+
+        for batch, query in zip(batches, responses):
+            # Follow title normalisation and redirects back to what was asked for
+            aliases = {item["from"]: item["to"] for item in query.get("normalized", []) + query.get("redirects", [])}
+            pages = {page["title"]: self._page(page) for page in query.get("pages", [])}
+            for title in batch:
+                resolved = title
+                while resolved in aliases and resolved not in pages:
+                    resolved = aliases[resolved]
+                page = pages.get(resolved)
+                self.cache.set(("intro", title), page, ttl=WIKI_CACHE_TTL if page else WIKI_NEGATIVE_TTL)
+                results[title] = page
+        return results
+
+    async def get_page(self, title: str) -> Optional[Dict]:
+        return (await self.get_pages([title]))[title]
+
+    async def get_linked_pages(self, title: str, limit: int = WIKI_BATCH_SIZE) -> List[Dict]:
+        """Intros of the articles a page links to, in a single generator query"""
+        cached = self.cache.get(("links", title))
+        if cached is not None:
+            return cached
+        query = await self._query(
+            titles=title, generator="links", gplnamespace=0, gpllimit=limit,
+            prop="extracts|info|pageprops", ppprop="disambiguation",
+            exintro=1, explaintext=1, exlimit="max", inprop="url"
+        )
+        pages = [page for page in map(self._page, query.get("pages", [])) if page]
+        pages.sort(key=lambda page: page["title"])
+        self.cache.set(("links", title), pages)
+        return pages
+
+    async def get_full_page(self, title: str) -> Optional[Dict]:
+        """Full plain-text article with wiki-style section headings"""
+        cached = self.cache.get(("full", title), default=False)
+        if cached is not False:
+            return cached
+        query = await self._query(
+            titles=title, prop="extracts|info|extlinks", explaintext=1,
+            exsectionformat="wiki", inprop="url", ellimit="max"
         )
+        pages = query.get("pages", [])
+        page = self._page(pages[0]) if pages else None
+        if page:
+            page["references"] = len(pages[0].get("extlinks", []))
+        self.cache.set(("full", title), page, ttl=WIKI_CACHE_TTL if page else WIKI_NEGATIVE_TTL)
+        return page
+
+    def get_stats(self) -> Dict:
+        return {**self.stats, "cache": self.cache.get_stats()}
+
+
+def split_sections(text: str) -> List[Dict]:
+    """
+    Split a plain-text extract on its "== Heading ==" lines.
+
+    Args:
+        text (str): Extract fetched with exsectionformat=wiki
+
+    Returns:
+        List[Dict]: Sections with title, level (0 for top-level) and text
+    """
+    matches = list(SECTION_PATTERN.finditer(text))
+    sections = []
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections.append({
+            "title": match.group(2),
+            "level": len(match.group(1)) - 2,
+            "text": text[match.end():end].strip()
+        })
+    return sections
+
+
+class WikiService:
+    def __init__(self, http_client: HttpClient):
+        self.client = MediaWikiClient(http_client)
         
         # Emoji mappings for different content types
         self.emojis = {
@@ -68,32 +215,33 @@ class WikiService:
                     "message": f"{self.emojis['error']} Empty search query"
                 }
                 
-            page = self.wiki.page(query)
+            page = await self.client.get_page(query)
             
-            if not page.exists():
+            if page is None:
                 return {
                     "status": "error",
                     "message": f"{self.emojis['error']} No articles found for '{query}'"
                 }
                 
             # Validate page content
-            if not page.summary or len(page.summary.strip()) == 0:
+            if not page["summary"] or len(page["summary"].strip()) == 0:
                 return {
                     "status": "error",
                     "message": f"{self.emojis['error']} Article found but content is empty"
                 }
                 
             # Fix disambiguation check
-            if "may refer to:" in page.summary.lower() or "disambiguation" in page.title.lower():
-                # Handle disambiguation pages
-                disamb_links = []
-                for link in list(page.links.keys())[:limit]:
-                    link_page = self.wiki.page(link)
-                    if link_page.exists() and "disambiguation" not in link_page.title.lower():
-                        disamb_links.append({
-                            "title": link,
-                            "summary": link_page.summary[:100] + "..."
-                        })
+            if (page["disambiguation"] or "may refer to:" in page["summary"].lower()
+                    or "disambiguation" in page["title"].lower()):
+                # Handle disambiguation pages: every candidate's intro arrives in one request
+                disamb_links = [
+                    {
+                        "title": link["title"],
+                        "summary": link["summary"][:100] + "..."
+                    }
+                    for link in await self.client.get_linked_pages(page["title"])
+                    if not link["disambiguation"] and "disambiguation" not in link["title"].lower()
+                ][:limit]
                 
                 return {
                     "status": "disambiguation",
@@ -102,24 +250,24 @@ class WikiService:
                 }
             
             # For recent/future events, check the summary for specific dates
-            if any(year in page.summary for year in ['2024', '2025']):
+            if any(year in page["summary"] for year in ['2024', '2025']):
                 return {
                     "status": "success",
                     "result": {
-                        "title": page.title,
-                        "summary": page.summary,
-                        "url": page.fullurl,
+                        "title": page["title"],
+                        "summary": page["summary"],
+                        "url": page["url"],
                         "is_recent": True,
-                        "last_modified": page.touched  # Add last modified date
+                        "last_modified": page["touched"]  # Add last modified date
                     }
                 }
             
             return {
                 "status": "success",
                 "result": {
-                    "title": page.title,
-                    "summary": page.summary,
-                    "url": page.fullurl,
+                    "title": page["title"],
+                    "summary": page["summary"],
+                    "url": page["url"],
                     "is_recent": False
                 }
             }
@@ -134,32 +282,35 @@ class WikiService:
     async def get_article_summary(self, title: str, max_length: int = 1500) -> Dict:
         """Get a concise summary of a Wikipedia article"""
         try:
-            page = self.wiki.page(title)
+            page = await self.client.get_full_page(title)
             
-            if not page.exists():
+            if page is None:
                 return {
                     "status": "error",
                     "message": f"{self.emojis['error']} Article not found: '{title}'"
                 }
             
+            sections = split_sections(page["summary"])
+            intro = SECTION_PATTERN.split(page["summary"], maxsplit=1)[0].strip()
+            
             # Format the summary with sections
-            formatted_summary = f"{self.emojis['article']} **{page.title}**\n\n"
-            formatted_summary += f"{self.emojis['summary']} **Quick Summary:**\n{page.summary[:max_length]}...\n\n"
+            formatted_summary = f"{self.emojis['article']} **{page['title']}**\n\n"
+            formatted_summary += f"{self.emojis['summary']} **Quick Summary:**\n{intro[:max_length]}...\n\n"
             
             # Add metadata
             formatted_summary += f"\n{self.emojis['reference']} **Article Info:**\n"
-            formatted_summary += f"• References: {len(page.references)}\n"
-            formatted_summary += f"• Sections: {len(page.sections)}\n"
-            formatted_summary += f"• {self.emojis['link']} Full article: {page.fullurl}\n"
+            formatted_summary += f"• References: {page['references']}\n"
+            formatted_summary += f"• Sections: {len(sections)}\n"
+            formatted_summary += f"• {self.emojis['link']} Full article: {page['url']}\n"
                 
             return {
                 "status": "success",
                 "result": {
-                    "title": page.title,
+                    "title": page["title"],
                     "formatted_content": formatted_summary,
-                    "url": page.fullurl,
-                    "references": len(page.references),
-                    "sections": len(page.sections)
+                    "url": page["url"],
+                    "references": page["references"],
+                    "sections": len(sections)
                 }
             }
             
@@ -173,41 +324,42 @@ class WikiService:
     async def get_article_sections(self, title: str) -> Dict:
         """Get the section structure of a Wikipedia article"""
         try:
-            page = self.wiki.page(title)
+            page = await self.client.get_full_page(title)
             
-            if not page.exists():
+            if page is None:
                 return {
                     "status": "error",
                     "message": f"{self.emojis['error']} Article not found: '{title}'"
                 }
                 
+            sections = split_sections(page["summary"])
             formatted_sections = []
             current_section = None
             
-            for section in page.sections:
+            for section in sections:
                 # Format section based on level
-                if section.level == 0:  # Main sections
+                if section["level"] == 0:  # Main sections
                     current_section = {
-                        "title": self._format_section_title(section.title),
-                        "content": section.text[:300] + "..." if len(section.text) > 300 else section.text,
+                        "title": self._format_section_title(section["title"]),
+                        "content": section["text"][:300] + "..." if len(section["text"]) > 300 else section["text"],
                         "subsections": []
                     }
                     formatted_sections.append(current_section)
                 else:  # Subsections
                     if current_section:
                         current_section["subsections"].append({
-                            "title": self._format_section_title(section.title),
-                            "content": section.text[:200] + "..." if len(section.text) > 200 else section.text
+                            "title": self._format_section_title(section["title"]),
+                            "content": section["text"][:200] + "..." if len(section["text"]) > 200 else section["text"]
                         })
                 
             return {
                 "status": "success",
                 "result": {
-                    "title": f"{self.emojis['article']} {page.title}",
-                    "url": page.fullurl,
+                    "title": f"{self.emojis['article']} {page['title']}",
+                    "url": page["url"],
                     "sections": formatted_sections,
-                    "total_sections": len(page.sections),
-                    "last_modified": getattr(page, "touched", "Unknown")
+                    "total_sections": len(sections),
+                    "last_modified": page["touched"] or "Unknown"
                 }
             }
             
@@ -217,3 +369,6 @@ class WikiService:
                 "status": "error",
                 "message": f"{self.emojis['error']} Error fetching article sections: {str(e)}"
             }
+
+    def get_stats(self) -> Dict:
+        return self.client.get_stats()
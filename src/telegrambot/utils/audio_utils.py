@@ -0,0 +1,77 @@
+from typing import List, Optional
+
+# Bitrates in kbps by [MPEG-1][layer III index], see the MPEG audio frame header spec
+_BITRATES_V1_L3 = [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 0]
+_BITRATES_V2_L3 = [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160, 0]
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}
+
+
+def _strip_id3v2(data: bytes) -> bytes:
+    if len(data) < 10 or data[:3] != b"ID3":
+        return data
+    # Tag size is a 28-bit synchsafe integer, excluding the 10 byte header (and footer if flagged)
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    size += 20 if data[5] & 0x10 else 10
+    return data[size:]
+
+
+def _strip_id3v1(data: bytes) -> bytes:
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        return data[:-128]
+    return data
+
+
+def _first_frame_length(data: bytes) -> Optional[int]:
+    """Byte length of the leading MPEG layer III frame, or None if it can't be parsed"""
+    if len(data) < 4 or data[0] != 0xFF or data[1] & 0xE0 != 0xE0:
+        return None
+    version = (data[1] >> 3) & 0x03  # 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+    layer = (data[1] >> 1) & 0x03  # 1 = layer III
+    bitrate_index = data[2] >> 4
+    rate_index = (data[2] >> 2) & 0x03
+    if version not in _SAMPLE_RATES or layer != 1 or rate_index == 3:
+        return None
+    bitrates = _BITRATES_V1_L3 if version == 3 else _BITRATES_V2_L3
+    bitrate = bitrates[bitrate_index] * 1000
+    if not bitrate:
+        return None
+    padding = (data[2] >> 1) & 0x01
+    samples_factor = 144 if version == 3 else 72
+    return samples_factor * bitrate // _SAMPLE_RATES[version][rate_index] + padding
+
+
+def _strip_info_frame(data: bytes) -> bytes:
+    """Drop a leading Xing/Info frame; its frame count would only cover one segment"""
+    length = _first_frame_length(data)
+    if length and (b"Xing" in data[:length] or b"Info" in data[:length]):
+        return data[length:]
+    return data
+
+
+def concat_mp3(segments: List[bytes]) -> bytes:
+    """
+    Join MP3 segments into one stream without re-encoding.
+
+    MP3 frames are self-contained, so segments of the same format can be
+    appended as-is once the per-file metadata is removed: ID3v2 tags from
+    all but the first segment, ID3v1 tags from all but the last, and every
+    Xing/Info frame, so players derive the duration from the CBR bitrate.
+
+    Args:
+        segments (List[bytes]): MP3 files with identical sample rate and channels
+
+    Returns:
+        bytes: Concatenated MP3
+    """
+    if len(segments) == 1:
+        return segments[0]
+    parts = []
+    for i, segment in enumerate(segments):
+        audio = _strip_id3v2(segment)
+        # The first segment keeps its ID3v2 tag
+        tag = segment[:len(segment) - len(audio)] if i == 0 else b""
+        audio = _strip_info_frame(audio)
+        if i < len(segments) - 1:
+            audio = _strip_id3v1(audio)
+        parts.append(tag + audio)
+    return b"".join(parts)
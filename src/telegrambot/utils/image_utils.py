@@ -1,7 +1,11 @@
 
+from io import BytesIO
 from PIL import Image
 import pytesseract
 
+VISION_MAX_SIDE = 1120  # Llama 3.2 Vision sees at most 2x2 tiles of 560px
+VISION_JPEG_QUALITY = 85
+
 def resize_image(image_path: str, max_size: tuple = (4096, 4096)) -> None:
     """
     Resize an image while maintaining aspect ratio.
@@ -14,6 +18,28 @@ def resize_image(image_path: str, max_size: tuple = (4096, 4096)) -> None:
         img.thumbnail(max_size)
         img.save(image_path)
 
+def prepare_vision_image(data: bytes, max_side: int = VISION_MAX_SIDE,
+                         quality: int = VISION_JPEG_QUALITY) -> bytes:
+    """
+    Downscale an image to the vision model's useful resolution and re-encode it as JPEG.
+    
+    Args:
+        data (bytes): Original image bytes
+        max_side (int): Maximum width and height in pixels
+        quality (int): JPEG quality of the re-encoded image
+    
+    Returns:
+        bytes: JPEG bytes, or the original bytes if they are already smaller
+    """
+    with Image.open(BytesIO(data)) as img:
+        img.thumbnail((max_side, max_side))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        buffer = BytesIO()
+        img.save(buffer, format="JPEG", quality=quality, optimize=True)
+    payload = buffer.getvalue()
+    return payload if len(payload) < len(data) else data
+
 def extract_text_from_image(image_path: str) -> str:
     """
     Extract text from an image using OCR.
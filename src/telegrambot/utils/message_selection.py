@@ -0,0 +1,130 @@
+import re
+from typing import List, NamedTuple
+import numpy as np
+from .token_utils import count_tokens
+
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+# Runs of two or more emoji, pictographs or other symbols (plus joiners/variation selectors)
+EMOJI_RUN_PATTERN = re.compile('[\U0001F000-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\uFE0F\u200D]{2,}')
+WORD_PATTERN = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+FILLER_WORDS = {
+    "lol", "lmao", "lmfao", "rofl", "haha", "hahaha", "xd", "ok", "okay", "k", "yes", "no", "ya", "yeah",
+    "yep", "nope", "ye", "nah", "thx", "thanks", "ty", "np", "wtf", "omg", "bruh", "hmm", "same", "true",
+}
+MIN_WORDS = 2  # Messages with fewer meaningful words are treated as noise
+MAX_FEATURES = 2000  # Vocabulary size of the TF-IDF matrix
+MMR_LAMBDA = 0.7  # Relevance vs. diversity trade-off
+
+
+class Selection(NamedTuple):
+    messages: List[str]
+    input_tokens: int  # Tokens of the raw messages
+    output_tokens: int  # Tokens of the selected messages
+
+
+def clean_message(text: str) -> str:
+    """
+    Strip URLs and emoji runs and collapse whitespace.
+
+    Args:
+        text (str): Raw message text
+
+    Returns:
+        str: Cleaned text, possibly empty
+    """
+    text = URL_PATTERN.sub('', text or '')
+    text = EMOJI_RUN_PATTERN.sub(' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def _is_noise(words: List[str]) -> bool:
+    meaningful = [word for word in words if word not in FILLER_WORDS]
+    return len(meaningful) < MIN_WORDS
+
+
+def _tfidf(documents: List[List[str]]) -> np.ndarray:
+    """L2-normalised TF-IDF rows over the MAX_FEATURES most common terms"""
+    doc_freq = {}
+    for words in documents:
+        for word in set(words):
+            doc_freq[word] = doc_freq.get(word, 0) + 1
+    vocab = sorted(doc_freq, key=doc_freq.get, reverse=True)[:MAX_FEATURES]
+    index = {word: i for i, word in enumerate(vocab)}
+
+    rows, cols = [], []
+    for row, words in enumerate(documents):
+        for word in words:
+            col = index.get(word)
+            if col is not None:
+                rows.append(row)
+                cols.append(col)
+
+    counts = np.zeros((len(documents), len(vocab)), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp)), 1.0)
+    df = np.array([doc_freq[word] for word in vocab], dtype=np.float32)
+    idf = np.log((1 + len(documents)) / (1 + df)) + 1
+    tf = counts / np.maximum(counts.sum(axis=1, keepdims=True), 1.0)
+    matrix = tf * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-9)
+
+
+def select_messages(messages: List[str], token_budget: int, diversity: float = 1 - MMR_LAMBDA) -> Selection:
+    """
+    Pick a representative, non-redundant subset of messages that fits a token budget.
+
+    Messages are cleaned, deduplicated and stripped of filler. If the rest still
+    exceeds the budget, they are ranked by maximal marginal relevance: similarity
+    to the TF-IDF centroid of the conversation, penalised by similarity to
+    messages already picked.
+
+    Args:
+        messages (List[str]): Messages in chronological order
+        token_budget (int): Maximum tokens of the selection (one token per separator)
+        diversity (float): Weight of the redundancy penalty, between 0 and 1
+
+    Returns:
+        Selection: Selected messages in chronological order with before/after token counts
+    """
+    input_tokens = sum(count_tokens(message) + 1 for message in messages if message)
+
+    candidates, documents, seen = [], [], set()
+    for message in messages:
+        text = clean_message(message)
+        words = _words(text)
+        key = " ".join(words)
+        if not text or key in seen or _is_noise(words):
+            continue
+        seen.add(key)
+        candidates.append(text)
+        documents.append(words)
+
+    costs = np.array([count_tokens(text) + 1 for text in candidates], dtype=np.int64)
+    if costs.sum() <= token_budget:
+        return Selection(candidates, input_tokens, int(costs.sum()))
+
+    matrix = _tfidf(documents)
+    centroid = matrix.mean(axis=0)
+    centroid /= max(float(np.linalg.norm(centroid)), 1e-9)
+    relevance = matrix @ centroid
+
+    redundancy = np.zeros(len(candidates), dtype=np.float32)
+    available = costs <= token_budget
+    remaining = token_budget
+    picked = []
+    while available.any():
+        scores = (1 - diversity) * relevance - diversity * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        picked.append(best)
+        remaining -= int(costs[best])
+        available[best] = False
+        available &= costs <= remaining
+        redundancy = np.maximum(redundancy, matrix @ matrix[best])
+
+    picked.sort()
+    return Selection([candidates[i] for i in picked], input_tokens, int(costs[picked].sum()))
@@ -0,0 +1,119 @@
+import time
+import asyncio
+import logging
+from typing import AsyncIterator, Callable
+from pyrogram.errors import FloodWait, MessageNotModified
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_MAX_LENGTH = 4096
+STREAM_EDIT_INTERVAL = 1.5  # Seconds between edits of a message; keeps us under Telegram's edit limits
+
+
+def _split_point(text: str, limit: int) -> int:
+    """Find a natural place to roll over to a new message"""
+    for separator in ("\n\n", "\n", ". ", " "):
+        index = text.rfind(separator, 0, limit)
+        if index > 0:
+            return index + len(separator)
+    return limit
+
+
+async def _safe_edit(message, text: str) -> float:
+    """Edit a message, returning how long to back off before the next edit"""
+    try:
+        await message.edit_text(text)
+    except MessageNotModified:
+        pass
+    except FloodWait as e:
+        logger.warning(f"Flood wait while streaming, pausing edits for {e.value}s")
+        return float(e.value)
+    return 0.0
+
+
+async def _safe_reply(message, text: str):
+    """Reply to a message, waiting out a flood wait instead of failing the stream"""
+    try:
+        return await message.reply_text(text, quote=True)
+    except FloodWait as e:
+        logger.warning(f"Flood wait while streaming, pausing {e.value}s before the next message")
+        await asyncio.sleep(e.value)
+        return await message.reply_text(text, quote=True)
+
+
+async def _edit_final(message, text: str, next_edit: float, interval: float) -> None:
+    """Edit a message whose text must land, waiting out any flood wait"""
+    remaining = next_edit - time.monotonic()
+    if remaining > interval:
+        await asyncio.sleep(remaining)
+    backoff = await _safe_edit(message, text)
+    if backoff:
+        await asyncio.sleep(backoff)
+        await _safe_edit(message, text)
+
+
+async def stream_to_message(placeholder, deltas: AsyncIterator[str],
+                            render: Callable[[str], str] = lambda text: text,
+                            empty_text: str = "I received an empty response. Please try again.",
+                            interval: float = STREAM_EDIT_INTERVAL) -> str:
+    """
+    Progressively edit a placeholder message with streamed text.
+
+    Edits are throttled to one per `interval` seconds. When the text outgrows
+    Telegram's message limit, the current message is finalised and streaming
+    continues in a new reply.
+
+    Args:
+        placeholder: Message to edit (e.g. the "Thinking..." reply)
+        deltas (AsyncIterator[str]): Streamed text fragments
+        render (Callable): Formats the raw text for display (prefixes, code blocks)
+        empty_text (str): Shown if the stream produced no text
+        interval (float): Minimum seconds between edits of one message
+
+    Returns:
+        str: The complete streamed text
+    """
+    limit = TELEGRAM_MAX_LENGTH - len(render(""))
+    current = placeholder
+    text = ""
+    full_text = ""
+    shown = None
+    next_edit = 0.0
+    needs_reply = False  # The last message is finished; the next text goes into a new reply
+
+    async for delta in deltas:
+        text += delta
+        full_text += delta
+
+        # Roll over to a new message once the current one is full
+        while len(text) > limit:
+            split = _split_point(text, limit)
+            head, text = text[:split].rstrip(), text[split:].lstrip()
+            if needs_reply:
+                current = await _safe_reply(current, render(head))
+            else:
+                await _edit_final(current, render(head), next_edit, interval)
+            # The next message is only sent once there is text for it
+            needs_reply = True
+            shown = None
+            next_edit = time.monotonic() + interval
+
+        now = time.monotonic()
+        if needs_reply and text.strip():
+            current = await _safe_reply(current, render(text))
+            needs_reply = False
+            shown = render(text)
+            next_edit = now + interval
+        elif text.strip() and now >= next_edit and render(text) != shown:
+            backoff = await _safe_edit(current, render(text))
+            shown = render(text)
+            next_edit = now + max(interval, backoff)
+
+    if not full_text.strip():
+        await _safe_edit(current, empty_text)
+        return ""
+
+    final = render(text.strip())
+    if not needs_reply and final != shown:
+        await _edit_final(current, final, next_edit, interval)
+    return full_text.strip()
@@ -58,4 +58,42 @@ def truncate_text(text: str, max_length: int = 4096, suffix: str = "...") -> str
     """
     if len(text) <= max_length:
         return text
-    return text[:max_length - len(suffix)] + suffix
\ No newline at end of file
+    return text[:max_length - len(suffix)] + suffix
+
+def split_sentences(text: str, max_chars: int) -> List[str]:
+    """
+    Split text at sentence boundaries into chunks of at most max_chars.
+    
+    Consecutive sentences are packed into one chunk while they fit; a single
+    sentence longer than max_chars is split at word boundaries.
+    
+    Args:
+        text (str): Text to split
+        max_chars (int): Maximum size of each chunk
+    
+    Returns:
+        List[str]: List of text chunks
+    """
+    chunks, current = [], ""
+    for sentence in re.split(r'(?<=[.!?…])\s+|\n+', text.strip()):
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            pieces, piece = [], ""
+            for word in sentence.split():
+                if piece and len(piece) + 1 + len(word) > max_chars:
+                    pieces.append(piece)
+                    piece = word
+                else:
+                    piece = f"{piece} {word}" if piece else word
+            pieces.append(piece)
+        for piece in pieces:
+            if not piece.strip():
+                continue
+            if current and len(current) + 1 + len(piece) > max_chars:
+                chunks.append(current)
+                current = piece
+            else:
+                current = f"{current} {piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,168 @@
+import logging
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character-based estimate
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Context windows (prompt + completion) of the Groq models we use
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.2-90b-vision-preview": 8192,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+CHARS_PER_TOKEN = 4  # Rough estimate used when no tokenizer is available
+MESSAGE_OVERHEAD_TOKENS = 4  # Role and separator tokens per chat message
+SAFETY_MARGIN = 0.05  # Tokenizer mismatch headroom (cl100k vs. the Llama tokenizer)
+
+
+class TokenChunk(NamedTuple):
+    text: str
+    tokens: int
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the BPE encoding once; None if tiktoken or its data is unavailable"""
+    if tiktoken is None:
+        return None
+    try:
+        # Llama 3 uses a tiktoken-style BPE; cl100k_base is a close approximation
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"Could not load tokenizer, falling back to estimates: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count (or estimate) the number of tokens in a text.
+
+    Args:
+        text (str): Text to measure
+
+    Returns:
+        int: Token count
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def count_message_tokens(messages: List[Dict]) -> int:
+    """
+    Estimate the prompt tokens of a chat completion request.
+
+    Args:
+        messages (List[Dict]): Chat messages as sent to the API
+
+    Returns:
+        int: Estimated prompt tokens
+    """
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, str):
+            total += count_tokens(content)
+        elif isinstance(content, list):
+            total += sum(count_tokens(part.get("text", "")) for part in content if isinstance(part, dict))
+        total += MESSAGE_OVERHEAD_TOKENS
+    return total
+
+
+def context_window(model: str) -> int:
+    return MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+
+
+def fit_max_tokens(model: str, messages: List[Dict], requested: int) -> int:
+    """
+    Clamp a requested completion budget so prompt + output fit the context window.
+
+    Args:
+        model (str): Model name
+        messages (List[Dict]): Chat messages of the request
+        requested (int): Desired max_tokens
+
+    Returns:
+        int: max_tokens that fits, at least 1
+    """
+    available = int(context_window(model) * (1 - SAFETY_MARGIN)) - count_message_tokens(messages)
+    return max(1, min(requested, available))
+
+
+def _split_text(text: str, max_tokens: int) -> List[str]:
+    """Split a single oversized text on token boundaries"""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+    size = max(1, max_tokens - 1) * CHARS_PER_TOKEN
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class TokenBudgetChunker:
+    """Packs whole messages into chunks sized to a model's context window.
+
+    The per-chunk budget is the context window minus the tokens reserved for
+    the prompt around the chunk and for the completion, optionally capped by
+    max_chunk_tokens (e.g. to stay under a tokens-per-minute limit).
+    """
+
+    def __init__(self, model: str, prompt_tokens: int, output_tokens: int,
+                 max_chunk_tokens: Optional[int] = None):
+        window = int(context_window(model) * (1 - SAFETY_MARGIN))
+        budget = window - prompt_tokens - output_tokens
+        if max_chunk_tokens:
+            budget = min(budget, max_chunk_tokens)
+        if budget <= 0:
+            raise ValueError(f"No room for input in {model}'s context window")
+        self.model = model
+        self.chunk_budget = budget
+
+    def chunk(self, messages: List[str], separator: str = "\n",
+              max_tokens: Optional[int] = None) -> List[TokenChunk]:
+        """
+        Pack messages into chunks without splitting a message unless it alone
+        exceeds the budget.
+
+        Args:
+            messages (List[str]): Messages in chronological order
+            separator (str): Text placed between messages in a chunk
+            max_tokens (Optional[int]): Tighter per-call budget, e.g. the current TPM limit
+
+        Returns:
+            List[TokenChunk]: Chunks with their estimated token counts
+        """
+        budget = max(1, min(self.chunk_budget, max_tokens)) if max_tokens else self.chunk_budget
+        separator_tokens = count_tokens(separator)
+        chunks = []
+        current, current_tokens = [], 0
+
+        for message in messages:
+            if not message:
+                continue
+            tokens = count_tokens(message)
+            pieces = [(message, tokens)]
+            if tokens > budget:
+                pieces = [(piece, count_tokens(piece)) for piece in _split_text(message, budget)]
+
+            for piece, piece_tokens in pieces:
+                needed = piece_tokens + (separator_tokens if current else 0)
+                if current and current_tokens + needed > budget:
+                    chunks.append(TokenChunk(separator.join(current), current_tokens))
+                    current, current_tokens = [], 0
+                    needed = piece_tokens
+                current.append(piece)
+                current_tokens += needed
+
+        if current:
+            chunks.append(TokenChunk(separator.join(current), current_tokens))
+        return chunks
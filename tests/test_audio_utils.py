@@ -0,0 +1,52 @@
+from telegrambot.utils.audio_utils import _first_frame_length, concat_mp3
+
+# MPEG-2 layer III, 32 kbps, 22050 Hz, mono, no padding: the TTS output format
+FRAME_HEADER = bytes([0xFF, 0xF3, 0x40, 0xC4])
+FRAME_LENGTH = 104
+
+
+def _frame(payload: bytes = b"") -> bytes:
+    body = payload + b"\x00" * (FRAME_LENGTH - len(FRAME_HEADER) - len(payload))
+    return FRAME_HEADER + body
+
+
+def _id3v2(size: int = 16) -> bytes:
+    return b"ID3\x04\x00\x00" + bytes([0, 0, 0, size]) + b"\x01" * size
+
+
+def _id3v1() -> bytes:
+    return b"TAG" + b"\x02" * 125
+
+
+def _segment(audio: bytes) -> bytes:
+    return _id3v2() + _frame(b"Info") + audio + _id3v1()
+
+
+def test_first_frame_length():
+    assert _first_frame_length(_frame()) == FRAME_LENGTH
+    assert _first_frame_length(bytes([0xFF, 0xF3, 0x42, 0xC4])) == FRAME_LENGTH + 1
+    assert _first_frame_length(b"not an mp3") is None
+
+
+def test_single_segment_is_unchanged():
+    segment = _segment(_frame(b"a"))
+    assert concat_mp3([segment]) == segment
+
+
+def test_concat_strips_per_file_metadata():
+    first, second, third = _frame(b"a"), _frame(b"b") * 2, _frame(b"c")
+    joined = concat_mp3([_segment(first), _segment(second), _segment(third)])
+
+    # Only the first ID3v2 tag and the last ID3v1 tag survive, and no Info frame
+    assert joined == _id3v2() + first + second + third + _id3v1()
+    assert b"Info" not in joined
+
+
+def test_concat_handles_xing_frames_and_untagged_segments():
+    first, second = _frame(b"a"), _frame(b"b")
+    joined = concat_mp3([_frame(b"\x00" * 32 + b"Xing") + first, second])
+    assert joined == first + second
+
+
+def test_concat_keeps_audio_without_a_parsable_header():
+    assert concat_mp3([b"abc", b"def"]) == b"abcdef"
@@ -0,0 +1,183 @@
+import asyncio
+import sys
+import types
+
+import pytest
+
+try:
+    import groq  # noqa: F401
+except ImportError:
+    # The client only needs the SDK's exception types; the tests never reach the network
+    groq = types.ModuleType("groq")
+    groq.AsyncGroq = object
+    groq.APIStatusError = type("APIStatusError", (Exception,), {})
+    groq.APIConnectionError = type("APIConnectionError", (Exception,), {})
+    sys.modules["groq"] = groq
+
+from telegrambot.services import groq_client
+from telegrambot.services.groq_client import (
+    PRIORITY_BATCH, PRIORITY_INTERACTIVE, RateLimitedGroqClient, RequestTooLargeError, TokenBucket, parse_reset
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeRaw:
+    def __init__(self, headers, response):
+        self.headers = headers
+        self._response = response
+
+    def parse(self):
+        return self._response
+
+
+class FakeGroq:
+    """Stands in for AsyncGroq; returns canned rate limit headers"""
+
+    def __init__(self, headers=None):
+        self.calls = []
+        self.headers = headers or {}
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(
+            with_raw_response=types.SimpleNamespace(create=self._create)
+        ))
+
+    async def _create(self, **params):
+        self.calls.append(params)
+        return FakeRaw(self.headers, types.SimpleNamespace(usage=None))
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(groq_client, "time", types.SimpleNamespace(monotonic=clock.monotonic,
+                                                                  perf_counter=clock.monotonic))
+    return clock
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("7.66s", 7.66),
+    ("2m59.56s", 179.56),
+    ("120ms", 0.12),
+    ("1h2m", 3720.0),
+    ("30", 30.0),
+])
+def test_parse_reset(value, seconds):
+    assert parse_reset(value) == pytest.approx(seconds)
+
+
+@pytest.mark.parametrize("value", [None, "", "soon"])
+def test_parse_reset_unparseable(value):
+    assert parse_reset(value) is None
+
+
+def test_bucket_debit_and_refill(clock):
+    bucket = TokenBucket(60)
+    bucket.take(45)
+    assert bucket.level == pytest.approx(15)
+    assert bucket.wait_time(10) == 0.0
+    assert bucket.wait_time(30) == pytest.approx(15.0)
+
+    clock.now += 15
+    assert bucket.wait_time(30) == 0.0
+    clock.now += 3600
+    assert bucket.level <= bucket.capacity
+    assert bucket.wait_time(60) == 0.0
+
+
+def test_bucket_give_back_is_capped(clock):
+    bucket = TokenBucket(60)
+    bucket.take(10)
+    bucket.give_back(100)
+    assert bucket.level == pytest.approx(60)
+    bucket.give_back(-90)  # Usage above the reservation is charged
+    assert bucket.level == pytest.approx(-30)
+
+
+def test_bucket_sync_and_drain(clock):
+    bucket = TokenBucket(60)
+    bucket.sync(remaining=20, limit=120)
+    assert bucket.capacity == 120
+    assert bucket.level == pytest.approx(20)
+
+    bucket.sync(remaining=0, reset_seconds=30)
+    assert bucket.wait_time(1) == pytest.approx(30.5)
+
+    bucket = TokenBucket(60)
+    bucket.drain(10)
+    assert bucket.wait_time(1) == pytest.approx(11.0)
+
+
+def test_request_larger_than_the_bucket_is_rejected_up_front():
+    fake = FakeGroq()
+    client = RateLimitedGroqClient(fake, tokens_per_minute=1000)
+    messages = [{"role": "user", "content": "word " * 5000}]
+
+    with pytest.raises(RequestTooLargeError) as info:
+        asyncio.run(client.create(model="m", messages=messages, max_tokens=100))
+    assert info.value.model == "m"
+    assert info.value.limit == 1000
+    assert fake.calls == []
+    assert client.stats["too_large"] == 1
+
+
+def test_response_headers_sync_the_buckets():
+    fake = FakeGroq(headers={
+        "x-ratelimit-limit-tokens": "12000",
+        "x-ratelimit-remaining-tokens": "500",
+        "x-ratelimit-reset-tokens": "2.5s",
+        "x-ratelimit-remaining-requests": "900",
+    })
+    client = RateLimitedGroqClient(fake)
+    timings = {}
+    asyncio.run(client.create(model="m", messages=[{"role": "user", "content": "hi"}], max_tokens=10,
+                              timings=timings))
+
+    assert len(fake.calls) == 1
+    assert "admitted" in timings
+    assert client._token_buckets["m"].capacity == 12000
+    assert client._token_buckets["m"].level <= 500
+    assert client.max_input_tokens("m", 10) == int(12000 * groq_client.TPM_HEADROOM) - 10
+
+
+def test_interactive_requests_are_admitted_before_batch():
+    async def scenario():
+        client = RateLimitedGroqClient(FakeGroq(), requests_per_minute=60000)
+        client._request_buckets["m"].drain(0.05)
+        order = []
+
+        async def acquire(priority, name):
+            await client._acquire(priority, "m", 1)
+            order.append(name)
+
+        await asyncio.gather(
+            acquire(PRIORITY_BATCH, "batch-1"),
+            acquire(PRIORITY_BATCH, "batch-2"),
+            acquire(PRIORITY_INTERACTIVE, "interactive"),
+        )
+        return order
+
+    assert asyncio.run(scenario()) == ["interactive", "batch-1", "batch-2"]
+
+
+def test_a_limited_model_does_not_block_other_models():
+    async def scenario():
+        client = RateLimitedGroqClient(FakeGroq())
+        client._token_buckets["slow"].drain(60)
+        blocked = asyncio.ensure_future(client._acquire(PRIORITY_INTERACTIVE, "slow", 100))
+        await asyncio.sleep(0)
+        # Queued behind the rate-limited model, this would otherwise wait a minute
+        await asyncio.wait_for(client._acquire(PRIORITY_INTERACTIVE, "fast", 100), timeout=1)
+        assert not blocked.done()
+        blocked.cancel()
+        await client.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,61 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from telegrambot.utils.message_selection import clean_message, select_messages
+from telegrambot.utils.token_utils import count_tokens
+
+
+def _cost(messages):
+    return sum(count_tokens(message) + 1 for message in messages)
+
+
+def test_clean_message():
+    assert clean_message("see https://example.com/x  now 😂😂😂 ok") == "see now ok"
+    assert clean_message(None) == ""
+
+
+def test_filters_noise_duplicates_and_links():
+    messages = [
+        "lol",
+        "the deploy failed again last night",
+        "The deploy failed again, last night!",
+        "https://example.com",
+        "ok yeah",
+        "someone should look at the database migration",
+    ]
+    selection = select_messages(messages, token_budget=10 ** 6)
+
+    assert selection.messages == [
+        "the deploy failed again last night",
+        "someone should look at the database migration",
+    ]
+    assert selection.output_tokens == _cost(selection.messages)
+    assert selection.input_tokens == _cost(messages)
+
+
+def test_selection_fits_the_budget_and_keeps_order():
+    topics = ["deploy pipeline broke", "database migration stuck", "lunch plans friday", "new release notes"]
+    messages = [f"{topic} message number {i}" for i in range(20) for topic in topics]
+    budget = _cost(messages[:8])
+    selection = select_messages(messages, token_budget=budget)
+
+    assert 0 < selection.output_tokens <= budget
+    assert selection.output_tokens == _cost(selection.messages)
+    positions = [messages.index(message) for message in selection.messages]
+    assert positions == sorted(positions)
+
+
+def test_diversity_spreads_the_selection_across_topics():
+    messages = [f"the build server is down again variant {i}" for i in range(10)]
+    messages += ["who wants pizza for lunch", "the football match was great"]
+    budget = _cost(messages[:3])
+    selection = select_messages(messages, token_budget=budget, diversity=0.9)
+
+    assert any("build server" not in message for message in selection.messages)
+
+
+def test_nothing_fits():
+    selection = select_messages(["a reasonably long message about nothing"], token_budget=1)
+    assert selection.messages == []
+    assert selection.output_tokens == 0
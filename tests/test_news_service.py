@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("aiohttp")
+
+from telegrambot.services.news_service import dedupe_articles
+
+
+def _article(title):
+    return {"title": title, "url": f"https://example.com/{len(title)}"}
+
+
+def test_syndicated_copies_are_dropped():
+    articles = [
+        _article("Central bank raises interest rates again - Reuters"),
+        _article("Central bank raises interest rates again | AP News"),
+        _article("Storm closes schools across the region - BBC"),
+    ]
+    kept = dedupe_articles(articles, limit=5)
+    assert [article["title"] for article in kept] == [
+        "Central bank raises interest rates again - Reuters",
+        "Storm closes schools across the region - BBC",
+    ]
+
+
+def test_removed_and_untitled_articles_are_skipped():
+    articles = [_article("[Removed]"), {"url": "https://example.com"}, _article("Actual story here")]
+    assert dedupe_articles(articles, limit=5) == [articles[2]]
+
+
+def test_limit_applies_after_deduplication():
+    articles = [_article("Same story today")] * 3 + [_article(f"Different story {word}") for word in ["a", "b", "c"]]
+    kept = dedupe_articles(articles, limit=3)
+    assert len(kept) == 3
+    assert kept[0]["title"] == "Same story today"
@@ -0,0 +1,26 @@
+from telegrambot.utils.text_utils import split_sentences
+
+
+def test_short_text_is_one_chunk():
+    assert split_sentences("Hello there. How are you?", 100) == ["Hello there. How are you?"]
+
+
+def test_sentences_are_packed_up_to_the_limit():
+    text = "One two. Three four. Five six. Seven eight."
+    chunks = split_sentences(text, 20)
+    assert chunks == ["One two. Three four.", "Five six.", "Seven eight."]
+
+
+def test_long_sentence_is_split_at_words():
+    text = "word " * 30
+    chunks = split_sentences(text, 24)
+    assert all(len(chunk) <= 24 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_newlines_and_blank_lines_are_boundaries():
+    assert split_sentences("First line\n\nSecond line!  Third?", 12) == ["First line", "Second line!", "Third?"]
+
+
+def test_empty_text():
+    assert split_sentences("   ", 10) == []
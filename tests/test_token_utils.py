@@ -0,0 +1,68 @@
+import pytest
+
+from telegrambot.utils import token_utils
+from telegrambot.utils.token_utils import (
+    CHARS_PER_TOKEN, TokenBudgetChunker, count_tokens, fit_max_tokens
+)
+
+MODEL = "llama-3.1-8b-instant"
+
+
+@pytest.fixture(autouse=True)
+def no_tiktoken(monkeypatch):
+    """Use the character-based estimate so counts don't depend on tiktoken"""
+    monkeypatch.setattr(token_utils, "tiktoken", None)
+    token_utils._get_encoding.cache_clear()
+    yield
+    token_utils._get_encoding.cache_clear()
+
+
+def test_count_tokens_fallback():
+    assert count_tokens("") == 0
+    assert count_tokens("a" * 40) == 40 // CHARS_PER_TOKEN + 1
+
+
+def test_fit_max_tokens_clamps_to_the_context_window():
+    messages = [{"role": "user", "content": "x" * 4000}]
+    assert fit_max_tokens(MODEL, messages, 100) == 100
+    assert fit_max_tokens("llama-3.2-90b-vision-preview", [{"role": "user", "content": "x" * 40000}], 1000) == 1
+
+
+def test_chunker_budget_is_capped():
+    chunker = TokenBudgetChunker(MODEL, prompt_tokens=100, output_tokens=100, max_chunk_tokens=50)
+    assert chunker.chunk_budget == 50
+
+
+def test_chunker_rejects_models_without_room():
+    with pytest.raises(ValueError):
+        TokenBudgetChunker("unknown-model", prompt_tokens=8000, output_tokens=1000)
+
+
+def test_chunker_packs_whole_messages():
+    chunker = TokenBudgetChunker(MODEL, prompt_tokens=0, output_tokens=0, max_chunk_tokens=12)
+    messages = ["a" * 16, "b" * 16, "c" * 16, "", "d" * 16]  # 5 tokens each, separator 1 token
+    chunks = chunker.chunk(messages)
+
+    assert [chunk.text for chunk in chunks] == ["a" * 16 + "\n" + "b" * 16, "c" * 16 + "\n" + "d" * 16]
+    assert all(chunk.tokens <= chunker.chunk_budget for chunk in chunks)
+
+
+def test_chunker_splits_oversized_messages():
+    chunker = TokenBudgetChunker(MODEL, prompt_tokens=0, output_tokens=0, max_chunk_tokens=10)
+    chunks = chunker.chunk(["x" * 200])
+
+    assert len(chunks) > 1
+    assert "".join(chunk.text for chunk in chunks) == "x" * 200
+    assert all(chunk.tokens <= chunker.chunk_budget for chunk in chunks)
+
+
+def test_chunk_max_tokens_tightens_the_budget():
+    chunker = TokenBudgetChunker(MODEL, prompt_tokens=0, output_tokens=0, max_chunk_tokens=1000)
+    messages = ["m" * 16] * 10
+
+    assert len(chunker.chunk(messages)) == 1
+    narrow = chunker.chunk(messages, max_tokens=12)
+    assert len(narrow) == 5
+    assert all(chunk.tokens <= 12 for chunk in narrow)
+    # A looser per-call limit never widens the chunker's own budget
+    assert chunker.chunk(messages, max_tokens=10 ** 6) == chunker.chunk(messages)
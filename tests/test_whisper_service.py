@@ -0,0 +1,47 @@
+import pytest
+
+pytest.importorskip("torch")
+pytest.importorskip("whisper")
+
+from telegrambot.services.whisper_service import LanguageHintCache
+
+
+def test_unknown_user_gets_the_default_language():
+    assert LanguageHintCache().get_hint(1) is None
+    assert LanguageHintCache(default_language="fi").get_hint(1) == "fi"
+    assert LanguageHintCache(default_language="").get_hint(1) is None
+
+
+def test_hint_needs_enough_samples():
+    cache = LanguageHintCache(default_language="fi", min_samples=3)
+    cache.record(1, "en")
+    cache.record(1, "en")
+    # Known speaker with too little history: detect rather than use the default
+    assert cache.get_hint(1) is None
+    cache.record(1, "en")
+    assert cache.get_hint(1) == "en"
+
+
+def test_mixed_languages_fall_back_to_detection():
+    cache = LanguageHintCache(min_samples=3, min_confidence=0.8)
+    for language in ["en", "en", "fi", "en", "fi"]:
+        cache.record(1, language)
+    assert cache.get_hint(1) is None
+
+
+def test_history_is_bounded():
+    cache = LanguageHintCache(min_samples=3, history_size=5)
+    for language in ["fi"] * 10 + ["en"] * 5:
+        cache.record(1, language)
+    assert cache.get_hint(1) == "en"
+
+
+def test_users_are_independent_and_empty_records_ignored():
+    cache = LanguageHintCache(min_samples=1)
+    cache.record(1, "en")
+    cache.record(2, "sv")
+    cache.record(3, "")
+    cache.record(None, "de")
+    assert cache.get_hint(1) == "en"
+    assert cache.get_hint(2) == "sv"
+    assert cache.get_hint(3) is None